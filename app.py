@@ -1,22 +1,35 @@
 # app.py
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, Response, stream_with_context
 from config import Config
-from models import db, Word
-from services import get_translation, generate_story, generate_sentence_challenge
+from models import db, Word, User, Deck, DEFAULT_DECK_ID, ensure_default_deck
+from services import (
+    get_translation, agenerate_story, stream_story, StoryStreamError, bold_story_words,
+    agenerate_sentence_challenge, is_translation_fallback, is_sentence_fallback, is_story_fallback
+)
+from importer import import_stream, ImportFormatError
+from translator import TranslationWorker
+from sentence_pool import SentencePool, sentence_digest
+from dedup_store import create_dedup_store
+from events import EventBroker, TooManySubscribers
+from story_cache import StoryCache
+from story_pool import StoryPool
+from sampling import WordSampler
+from versioning import record_changes, changes_since, current_version
+from word_query import list_words, words_by_ids, parse_fields, parse_statuses, DEFAULT_PAGE_SIZE
+import translation_cache
+import offline_dict
+import llm_client
+import services
+import json
 import os
-import re # 引入正则表达式库
 import sys
-import chardet # 引入字符编码检测库
+import time
 
 # 判断是否在测试环境中
 TESTING = 'pytest' in sys.modules or 'unittest' in sys.modules or os.getenv('TESTING') == 'true'
 
-# 定义一个正则表达式来匹配大部分中文字符
-CHINESE_CHAR_PATTERN = re.compile(r'[\u4e00-\u9fff]')
-
-# 引入一个简单的全局缓存，存储最近的句子挑战，用于避免重复
-RECENT_SENTENCE_CHALLENGES = []
-MAX_CACHE_SIZE = 5
+# 实时生成句子时，遇到重复最多重新生成的次数
+MAX_SENTENCE_ATTEMPTS = 3
 
 app = Flask(__name__)
 
@@ -39,6 +52,57 @@ else:
 
 db.init_app(app)
 
+# 服务端批量翻译队列（导入时不启动，见 start_background_tasks；测试直接调用 run_once）
+translation_worker = TranslationWorker(
+    app,
+    batch_size=Config.TRANSLATION_BATCH_SIZE,
+    interval=Config.TRANSLATION_POLL_INTERVAL
+)
+
+# 已下发句子的去重存储（环形缓冲区 + 哈希集合），预生成池和实时生成共用
+sentence_dedup = create_dedup_store(
+    'memory' if TESTING else Config.SENTENCE_DEDUP_BACKEND,
+    capacity=Config.SENTENCE_DEDUP_CAPACITY,
+    path=Config.SENTENCE_DEDUP_PATH
+)
+
+# 造句题目预生成池（导入时不启动，见 start_background_tasks）
+sentence_pool = SentencePool(
+    app,
+    size=Config.SENTENCE_POOL_SIZE,
+    batch_size=Config.SENTENCE_POOL_BATCH,
+    dedup_store=sentence_dedup
+)
+
+# 随机抽词（按熟悉程度加权），取代 ORDER BY RAND()
+word_sampler = WordSampler()
+
+# 故事缓存，以及低峰时段的故事预生成（导入时不启动，见 start_background_tasks）
+story_cache = StoryCache(
+    max_bytes=Config.STORY_CACHE_MAX_BYTES,
+    ttl=Config.STORY_CACHE_TTL,
+    min_overlap=Config.STORY_CACHE_MIN_OVERLAP
+)
+story_pool = StoryPool(
+    app,
+    story_cache,
+    word_sampler,
+    size=Config.STORY_POOL_SIZE,
+    hours=Config.STORY_POOL_HOURS
+)
+
+# 翻译进度推送，第一个 SSE 订阅者到来时才开始轮询（测试环境中不启动）；
+# 每个进程只推给自己的订阅者，所以每个 web 进程各有一路轮询，这是预期的
+event_broker = EventBroker(
+    app,
+    interval=Config.EVENTS_POLL_INTERVAL,
+    max_subscribers=Config.EVENTS_MAX_SUBSCRIBERS,
+    autostart=not TESTING
+)
+
+# SSE 连接空闲时发送心跳的间隔（秒），防止代理断开连接
+SSE_KEEPALIVE = 15
+
 # 初始化数据库
 # with app.app_context():
 #     db.create_all()
@@ -53,133 +117,261 @@ def admin():
 
 # --- API 接口 ---
 
+def current_deck_id():
+    """本次请求操作的词库：?deck_id= 或 X-Deck-Id 请求头，都没有时使用默认词库；词库不存在时返回 404"""
+    deck_id = request.args.get('deck_id', type=int) or request.headers.get('X-Deck-Id', type=int)
+    if not deck_id or deck_id == DEFAULT_DECK_ID:
+        return DEFAULT_DECK_ID
+    db.get_or_404(Deck, deck_id)
+    return deck_id
+
+@app.route('/api/decks', methods=['GET'])
+def get_decks():
+    user = request.args.get('user')
+    query = Deck.query.order_by(Deck.id)
+    if user:
+        query = query.join(User, Deck.user_id == User.id).filter(User.name == user)
+    return jsonify([deck.to_dict() for deck in query])
+
+@app.route('/api/decks', methods=['POST'])
+def create_deck():
+    """新建词库：{"name": "...", "user": "可选，所属用户名，不存在时自动创建"}"""
+    data = request.get_json(silent=True) or {}
+    name = (data.get('name') or '').strip()
+    if not name:
+        return jsonify({'error': '缺少词库名称'}), 400
+
+    # 默认词库固定占用 id 1，先保证它已存在，新词库不会拿到这个 id
+    ensure_default_deck()
+    deck = Deck(name=name)
+    user_name = (data.get('user') or '').strip()
+    if user_name:
+        user = User.query.filter_by(name=user_name).first()
+        if user is None:
+            user = User(name=user_name)
+            db.session.add(user)
+            db.session.flush()
+        deck.user_id = user.id
+    db.session.add(deck)
+    db.session.commit()
+    return jsonify(deck.to_dict()), 201
+
 @app.route('/api/words', methods=['GET'])
 def get_words():
-    words = Word.query.all()
-    return jsonify([w.to_dict() for w in words])
+    # keyset 分页：?after_id=上一页最后一个 id&limit=每页条数，下一页的游标放在 X-Next-After-Id 响应头里；
+    # 两个参数都不带时不分页，返回整个词库（旧客户端只发 GET /api/words，不能悄悄只拿到第一页）
+    # 过滤：?status=0,1 按熟悉程度，?pending=true/false 按是否待翻译；?fields=english,chinese 只返回需要的列
+    try:
+        after_id = request.args.get('after_id', 0, type=int)
+        paged = 'limit' in request.args or 'after_id' in request.args
+        limit = request.args.get('limit', DEFAULT_PAGE_SIZE, type=int) if paged else None
+        fields = parse_fields(request.args.get('fields'))
+        statuses = parse_statuses(request.args.get('status'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    deck_id = current_deck_id()
+
+    # 词库没有变化时直接返回 304，不查询单词表；版本号全局共用，ETag 里再带上词库 id
+    version = current_version()
+    etag = f'v{version}-d{deck_id}'
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+        response.set_etag(etag)
+        response.headers['Vary'] = 'X-Deck-Id'
+        return response
+
+    pending = request.args.get('pending')
+    if pending is not None:
+        pending = pending.lower() in ('1', 'true', 'yes')
+
+    words, next_after_id = list_words(after_id, limit, fields, statuses, pending, deck_id=deck_id)
+    response = jsonify(words)
+    if next_after_id is not None:
+        response.headers['X-Next-After-Id'] = str(next_after_id)
+    response.set_etag(etag)
+    response.headers['X-Vocab-Version'] = str(version)
+    # 允许浏览器缓存，但每次使用前都带 If-None-Match 重新验证
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['Vary'] = 'X-Deck-Id'
+    return response
+
+@app.route('/api/words/changes', methods=['GET'])
+def word_changes():
+    """增量同步：返回 since 版本之后新增、修改和删除的单词"""
+    since = request.args.get('since', type=int)
+    if since is None:
+        return jsonify({'error': '缺少 since 参数'}), 400
+
+    deck_id = current_deck_id()
+    changes = changes_since(since, deck_id)
+    upserted = changes['upserted']
+    words = words_by_ids(upserted, deck_id=deck_id)
+    return jsonify({
+        'version': changes['version'],
+        'full_resync': changes['full_resync'],
+        'inserted': [w for w in words if upserted[w['id']] == 'insert'],
+        'updated': [w for w in words if upserted[w['id']] == 'update'],
+        'deleted': changes['deleted']
+    })
 
 @app.route('/api/upload', methods=['POST'])
 def upload_file():
     if 'file' not in request.files:
         return jsonify({'error': 'No file part'}), 400
     file = request.files['file']
+    deck_id = current_deck_id()
     
-    # 1. 读取原始二进制数据
-    raw_data = file.read()
-    if not raw_data:
-        return jsonify({'message': '成功导入 0 个新单词', 'new_words': []}), 200
-
-    # 2. 自动检测编码
-    result = chardet.detect(raw_data)
-    encoding = result['encoding'] or 'utf-8'
-    confidence = result['confidence']
-
-    if confidence < 0.3:
-        encoding = 'utf-8' # 兜底策略
-
+    # 流式读取：按块解码、按批写库，大文件也不会整体读入内存
     try:
-        content = raw_data.decode(encoding)
-    except Exception:
-        # 如果自动识别的编码解码失败，尝试用 utf-8 强制解码
-        try:
-            content = raw_data.decode('utf-8')
-
-        except Exception:
-            return jsonify({'error': '无法识别该文件编码'}), 400
+        new_words_list = import_stream(file.stream, deck_id)
+    except ImportFormatError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
 
-    if raw_data and content is None:
-        return jsonify({'error': '文件解码失败'}), 400
-
-    # 情况 2：检测是否是二进制乱码（比如图片）
-    if '\x00' in content:
-        return jsonify({'error': '文件内容非法：检测到二进制流'}), 400
-
-    # 4. 初始化变量 (必须在循环前)
-    lines = content.splitlines()
-    count = 0
-    new_words_list = [] 
-    
-    # 5. 核心业务处理 
-    for line in lines:
-        line = line.strip()
-        if not line:
-            continue
-
-        eng = ""
-        cn = '待翻译...'
-        needs_translation = True
-        
-        parts = line.split() 
-        if not parts:
-            continue
-            
-        eng = parts[0].strip()
-        
-        # 检查是否包含中文或有多部分内容
-        if CHINESE_CHAR_PATTERN.search(line) or len(parts) > 1:
-            if len(parts) > 1:
-                # 使用 maxsplit 确保只拆分第一个空格，保留完整的中文描述
-                _, cn_raw = line.split(maxsplit=1) 
-                cn = cn_raw.strip()
-                needs_translation = False 
-        
-        # 查重并存入数据库
-        if eng and not Word.query.filter_by(english=eng).first():
-            new_word = Word()
-            new_word.english = eng 
-            new_word.chinese = cn 
-            db.session.add(new_word)
-            db.session.flush() # 获取生成的 ID
-            new_words_list.append(new_word.to_dict())
-            count += 1
-            
-    # 6. 提交事务并返回
+    # 提交事务并返回
+    if new_words_list:
+        record_changes('insert', [w['id'] for w in new_words_list], deck_id)
     db.session.commit()
+    if new_words_list:
+        translation_worker.wake()
     return jsonify({
-        'message': f'成功导入 {count} 个新单词。',
+        'message': f'成功导入 {len(new_words_list)} 个新单词。',
         'new_words': new_words_list
     })
 
+# 翻译服务不可用时建议客户端等待的秒数
+TRANSLATE_RETRY_AFTER = 30
+
 # --- 增加一个专门用于触发翻译的 API ---
 @app.route('/api/translate_word/<int:word_id>', methods=['POST'])
 def translate_word_api(word_id):
-    word = Word.query.get(word_id)
-    if not word or word.chinese != "待翻译...":
+    word = Word.query.filter_by(id=word_id, deck_id=current_deck_id()).first()
+    if not word or not word.pending:
         return jsonify({'message': '单词已翻译或不存在'}), 200
         
     try:
-        # 调用 AI 翻译
-        cn = get_translation(word.english) 
-        
+        # 先查全局词典，其它词库已经翻译过的单词不再调用 AI
+        lexeme_id, cn = translation_cache.resolve([word.english]).get(word.english, (None, None))
+        if cn is None:
+            cn = offline_dict.lookup(word.english)
+        if cn is None:
+            # 调用 AI 翻译
+            cn = get_translation(word.english)
+            if is_translation_fallback(cn):
+                # 失败提示（限流、熔断、接口错误）不写入单词，保持待翻译，后台队列之后还会重试
+                response = jsonify({'error': '翻译服务暂时不可用，请稍后再试', 'details': cn})
+                response.headers['Retry-After'] = str(TRANSLATE_RETRY_AFTER)
+                return response, 503
+            translation_cache.store_many({word.english: cn})
+
+        word.lexeme_id = lexeme_id
         word.chinese = cn
+        record_changes('update', [word.id], word.deck_id)
         db.session.commit()
         return jsonify({'message': '翻译成功', 'chinese': cn}), 200
     except Exception as e:
         # 如果速率限制触发，返回特定的错误代码
         return jsonify({'error': '翻译失败，可能是速率限制', 'details': str(e)}), 500
 
+@app.route('/api/translator/status', methods=['GET'])
+def translator_status():
+    """后台翻译队列的积压数量、吞吐量与翻译缓存命中情况"""
+    stats = translation_worker.stats()
+    stats['cache'] = translation_cache.stats()
+    stats['offline_dict'] = offline_dict.stats()
+    return jsonify(stats)
+
+@app.route('/api/translator/retry', methods=['POST'])
+def retry_failed_translations():
+    """当前词库里翻译失败过的单词（包括已经不再自动重试的）清零失败次数，立即重新翻译"""
+    reset = translation_worker.reset_failed(current_deck_id())
+    db.session.commit()
+    if reset:
+        translation_worker.wake()
+    return jsonify({'message': f'已重新排队 {reset} 个单词。', 'reset': reset})
+
+def _sse(event, data):
+    """一条 SSE 消息"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.route('/api/translator/events', methods=['GET'])
+def translator_events():
+    """SSE：翻译完成时推送 {id, chinese}；队列溢出时推送 resync，客户端应重新同步列表"""
+    try:
+        subscription = event_broker.subscribe(current_deck_id())
+    except TooManySubscribers:
+        return jsonify({'error': '订阅数已满，请改用轮询'}), 503
+
+    def stream():
+        try:
+            yield 'retry: 3000\n\n'
+            while True:
+                event = subscription.get(timeout=SSE_KEEPALIVE)
+                if event is None:
+                    yield ': keep-alive\n\n'
+                    continue
+                yield _sse(event['event'], event.get('data', {}))
+        finally:
+            event_broker.unsubscribe(subscription)
+
+    response = Response(stream_with_context(stream()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # 关闭 nginx 的响应缓冲，事件才能立即送达
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/api/translator/events/stats', methods=['GET'])
+def translator_events_stats():
+    return jsonify(event_broker.stats())
+
+@app.route('/api/llm/stats', methods=['GET'])
+def llm_stats():
+    """大模型调用的连接复用、限流、请求合并与各服务商的延迟统计"""
+    return jsonify(dict(
+        llm_client.stats(),
+        singleflight=services.singleflight.stats(),
+        providers=services.provider_registry.stats()
+    ))
+
+@app.route('/api/story/cache', methods=['GET'])
+def story_cache_status():
+    """故事缓存命中情况和预生成进度"""
+    return jsonify(dict(story_cache.stats(), pool=story_pool.stats()))
+
+@app.route('/api/sentence/pool', methods=['GET'])
+def sentence_pool_status():
+    """造句题目预生成池的库存与去重情况"""
+    return jsonify(sentence_pool.stats())
+
 @app.route('/api/words/<int:id>', methods=['DELETE'])
 def delete_word(id):
-    word = Word.query.get_or_404(id)
+    word = Word.query.filter_by(id=id, deck_id=current_deck_id()).first_or_404()
     db.session.delete(word)
+    record_changes('delete', [id], word.deck_id)
     db.session.commit()
     return jsonify({'message': 'Deleted'}),200
 
+# 故事和句子接口耗时长（最多 60 秒），使用异步视图 + 共享异步客户端调用模型
 @app.route('/api/story', methods=['POST'])
-def get_story():
+async def get_story():
     try:
-        # 获取随机 10 个单词生成故事
-        words = Word.query.order_by(db.func.random()).limit(10).all()
-        word_list = [w.english for w in words]
+        word_list = _story_words()
         
         if not word_list:
             return jsonify({'story': '词库为空，请先上传单词。'})
+
+        # 相同或重合度足够高的单词组合直接用缓存的故事
+        cached = story_cache.get(word_list)
+        if cached is not None:
+            return jsonify({'story': cached[0]})
         
-        story = generate_story(word_list)
+        story = await agenerate_story(word_list)
         
         if story and isinstance(story, str):
             if "limit exceeded" in story.lower():
                 return jsonify({'story': '操作太快啦！请 30 秒后再试。'}), 429
+            # 失败提示由缓存自己拒绝
+            story_cache.put(word_list, story)
             return jsonify({'story': story})
         else:
             # 如果 story 是 None 或其他非字符串
@@ -195,26 +387,111 @@ def get_story():
         # 其他异常
         return jsonify({'story': f'生成失败: {str(e)}'}), 500
 
+def _story_words():
+    # 从当前词库随机获取 10 个单词生成故事，未学的单词更容易被抽到
+    return word_sampler.sample_words(10, current_deck_id())
+
+# 流式故事：模型每生成一段就通过 SSE 推给浏览器，首字节不必等完整故事生成完
+@app.route('/api/story/stream', methods=['POST'])
+def stream_story_api():
+    word_list = _story_words()
+
+    def stream():
+        # 先发一个注释行，让响应头和首字节立即送达
+        yield ': stream start\n\n'
+        if not word_list:
+            yield _sse('done', {'story': '词库为空，请先上传单词。'})
+            return
+        cached = story_cache.get(word_list)
+        if cached is not None:
+            yield _sse('done', {'story': cached[0]})
+            return
+
+        parts = []
+        try:
+            for chunk in stream_story(word_list):
+                parts.append(chunk)
+                yield _sse('chunk', {'text': chunk})
+        except StoryStreamError as e:
+            # 中途断开时已推送的片段不完整，不能当作故事缓存
+            if e.status == 429:
+                yield _sse('error', {'story': '操作太快啦！请 30 秒后再试。', 'status': 429})
+            else:
+                yield _sse('error', {'story': str(e), 'status': e.status})
+            return
+
+        # 生成结束后和 /api/story 一样检查限流和失败提示，并补上漏掉的加粗
+        story = ''.join(parts)
+        if "limit exceeded" in story.lower():
+            yield _sse('error', {'story': '操作太快啦！请 30 秒后再试。', 'status': 429})
+        elif is_story_fallback(story):
+            yield _sse('error', {'story': story or '生成故事出错: 模型没有返回内容', 'status': 500})
+        else:
+            story = bold_story_words(story, word_list)
+            story_cache.put(word_list, story)
+            yield _sse('done', {'story': story})
+
+    response = Response(stream_with_context(stream()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 @app.route('/api/sentence', methods=['GET'])
-def get_sentence():
-   # 传递缓存中的句子，要求AI避开它们
-    recent_cn_sentences = [item['chinese'] for item in RECENT_SENTENCE_CHALLENGES]
-    
-    # 修改 generate_sentence_challenge 函数，让它接受一个排除列表
-    data = generate_sentence_challenge(exclude_sentences=recent_cn_sentences)
-    
-    if data:
-        # 更新缓存
-        RECENT_SENTENCE_CHALLENGES.append(data)
-        if len(RECENT_SENTENCE_CHALLENGES) > MAX_CACHE_SIZE:
-            RECENT_SENTENCE_CHALLENGES.pop(0) # 移除最旧的句子
-            
+async def get_sentence():
+    # 优先从预生成池中直接取题，毫秒级返回
+    data = sentence_pool.take()
+    if data is not None:
+        return jsonify(data)
+
+    # 池空时退回实时生成；生成后再和已下发的句子比对，重复就重新生成（不再把历史句子塞进提示词）
+    for _ in range(MAX_SENTENCE_ATTEMPTS):
+        data = await agenerate_sentence_challenge()
+        if is_sentence_fallback(data) or sentence_dedup.add(sentence_digest(data['chinese'])):
+            break
+
     return jsonify(data)
 
 
 
+def start_background_tasks(with_story_pool=True):
+    """
+    启动后台任务。导入 app 时不会自动启动，否则 debug 模式下 reloader 的父进程、
+    gunicorn 的每个 worker 都会各跑一份，同一批待翻译单词和题目池被重复调用模型。
+
+    每个部署只运行一份：
+    - python app.py（单进程）：在处理请求的进程里启动全部任务
+    - gunicorn 等多进程部署：web 进程不启动，另起一个进程运行 flask --app app background，
+      只运行翻译队列和造句池（两者都读写数据库，所有 web 进程共享）。故事预生成写的是进程内缓存，
+      单独的进程里生成了 web 进程也用不上，所以只在单进程部署时启用
+    """
+    if Config.TRANSLATION_WORKER_ENABLED:
+        translation_worker.start()
+    if Config.SENTENCE_POOL_ENABLED:
+        sentence_pool.start()
+    if with_story_pool and Config.STORY_POOL_ENABLED:
+        story_pool.start()
+
+@app.cli.command('background')
+def run_background():
+    """多进程部署时在独立进程里运行翻译队列和造句池，整个部署只运行一个"""
+    start_background_tasks(with_story_pool=False)
+    print('后台任务已启动：翻译队列、造句池，Ctrl+C 退出')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        translation_worker.stop(5)
+        sentence_pool.stop(5)
+
+
 if __name__ == '__main__':
     with app.app_context():
         db.create_all()  # 只有手动运行 app.py 时才会连接真实数据库
-    app.run(host='0.0.0.0', port=5000, debug=True)
+        ensure_default_deck()
+        db.session.commit()
+    debug = True
+    # debug 模式下 reloader 的父进程只负责监视文件变化，后台任务只在实际处理请求的子进程里启动
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_tasks()
+    app.run(host='0.0.0.0', port=5000, debug=debug)
 
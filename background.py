@@ -0,0 +1,63 @@
+# background.py
+"""后台线程基类：翻译队列等需要在服务端持续运行的任务共用"""
+import threading
+import rate_limit
+
+
+class BackgroundWorker:
+    """
+    循环调用 run_once()：
+    - run_once() 返回 True 表示还有积压，立即进行下一轮
+    - 返回 False 表示暂时空闲，等待 interval 秒或被 wake() 唤醒
+    """
+    name = 'background-worker'
+
+    def __init__(self, interval=5.0):
+        self.interval = interval
+        self.last_error = None
+        self._wake_event = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop_event.set()
+        self._wake_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def wake(self):
+        """有新任务时提前唤醒，不必等到下一个轮询周期"""
+        self._wake_event.set()
+
+    def run_once(self):
+        raise NotImplementedError
+
+    def _loop(self):
+        # 后台任务发出的模型调用都按批量任务排队，让交互请求优先
+        with rate_limit.bulk():
+            self._run_loop()
+
+    def _run_loop(self):
+        while not self._stop_event.is_set():
+            try:
+                busy = self.run_once()
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"{self.name} Error: {e}")
+                busy = False
+
+            if not busy:
+                self._wake_event.wait(self.interval)
+                self._wake_event.clear()
@@ -0,0 +1,250 @@
+# benchmarks/load_test.py
+"""
+接口压测：按固定并发驱动 /api/upload、/api/words、/api/translate_word、/api/story、/api/sentence，
+输出每个场景的 p50 / p95 / p99 延迟和吞吐量（JSON），用于在不同提交之间对比性能回退。
+
+默认在本进程内启动一切：临时 SQLite 库 + mock_llm_server + 应用（werkzeug 多线程服务器），
+后台翻译队列和各种预生成池都关闭，模型调用全部打到本地假服务上：
+    python benchmarks/load_test.py
+    python benchmarks/load_test.py --concurrency 16 --requests 400 --latency 0.5 --rate-429 0.05
+    python benchmarks/load_test.py --scenarios story,sentence -o after.json --baseline before.json
+
+也可以压一个已经在运行的实例（不会启动假服务，模型调用走该实例自己的配置）：
+    python benchmarks/load_test.py --url http://127.0.0.1:5000
+
+每次运行都新建一个词库，压测数据不会混进已有的词库。应用自己的限流参数（LLM_RATE_LIMIT 等）
+照常生效，需要时通过环境变量调整。--baseline 指定上一次的结果文件时，输出里带上各场景的变化比例。
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import mock_llm_server  # noqa: E402
+
+SCENARIOS = ('upload', 'words', 'translate_word', 'story', 'sentence')
+
+
+def percentile(samples, pct):
+    """最近秩法：samples 已排序"""
+    if not samples:
+        return None
+    rank = math.ceil(pct / 100 * len(samples))
+    return samples[min(max(rank, 1), len(samples)) - 1]
+
+
+class LoadTest:
+
+    def __init__(self, base_url, concurrency, total, upload_words, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.concurrency = concurrency
+        self.total = total
+        self.upload_words = upload_words
+        self.timeout = timeout
+        self._local = threading.local()
+        self.deck_id = None
+        self.pending_ids = []
+
+    def _session(self):
+        # 每个压测线程一个 Session，连接保持 keep-alive
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+            session.headers['X-Deck-Id'] = str(self.deck_id)
+        return session
+
+    def _upload(self, session, words):
+        content = '\n'.join(words).encode('utf-8')
+        return session.post(f'{self.base_url}/api/upload', files={'file': ('bench.txt', content)},
+                            timeout=self.timeout)
+
+    def setup(self, scenarios):
+        """新建词库；翻译场景需要足够多的待翻译单词，每个请求翻译不同的单词"""
+        name = f'bench-{int(time.time())}'
+        response = requests.post(f'{self.base_url}/api/decks', json={'name': name}, timeout=self.timeout)
+        response.raise_for_status()
+        self.deck_id = response.json()['id']
+
+        session = requests.Session()
+        session.headers['X-Deck-Id'] = str(self.deck_id)
+        count = self.total if 'translate_word' in scenarios else 100
+        for start in range(0, count, 1000):
+            words = [f'seed{self.deck_id}x{i}' for i in range(start, min(count, start + 1000))]
+            self._upload(session, words).raise_for_status()
+
+        after_id = 0
+        while len(self.pending_ids) < count:
+            response = session.get(f'{self.base_url}/api/words', timeout=self.timeout,
+                                   params={'pending': 'true', 'fields': 'id', 'after_id': after_id, 'limit': 500})
+            response.raise_for_status()
+            page = response.json()
+            if not page:
+                break
+            self.pending_ids.extend(word['id'] for word in page)
+            after_id = page[-1]['id']
+
+    def request(self, scenario, i):
+        session = self._session()
+        url = self.base_url
+        if scenario == 'upload':
+            words = [f'up{self.deck_id}x{i}x{j}' for j in range(self.upload_words)]
+            return self._upload(session, words)
+        if scenario == 'words':
+            return session.get(f'{url}/api/words', timeout=self.timeout)
+        if scenario == 'translate_word':
+            word_id = self.pending_ids[i % len(self.pending_ids)] if self.pending_ids else 0
+            return session.post(f'{url}/api/translate_word/{word_id}', timeout=self.timeout)
+        if scenario == 'story':
+            return session.post(f'{url}/api/story', timeout=self.timeout)
+        if scenario == 'sentence':
+            return session.get(f'{url}/api/sentence', timeout=self.timeout)
+        raise ValueError(f'未知的场景: {scenario}')
+
+    def _timed(self, scenario, i):
+        started = time.perf_counter()
+        try:
+            response = self.request(scenario, i)
+            status = response.status_code
+        except requests.RequestException as e:
+            status = type(e).__name__
+        return time.perf_counter() - started, status
+
+    def run(self, scenario):
+        started = time.perf_counter()
+        with ThreadPoolExecutor(self.concurrency, thread_name_prefix=f'bench-{scenario}') as pool:
+            results = list(pool.map(lambda i: self._timed(scenario, i), range(self.total)))
+        duration = time.perf_counter() - started
+
+        latencies = sorted(elapsed * 1000 for elapsed, _ in results)
+        statuses = {}
+        for _, status in results:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        errors = sum(1 for _, status in results if not isinstance(status, int) or status >= 400)
+        return {
+            'requests': len(results),
+            'errors': errors,
+            'statuses': statuses,
+            'p50_ms': round(percentile(latencies, 50), 2),
+            'p95_ms': round(percentile(latencies, 95), 2),
+            'p99_ms': round(percentile(latencies, 99), 2),
+            'mean_ms': round(sum(latencies) / len(latencies), 2),
+            'max_ms': round(latencies[-1], 2),
+            'throughput_rps': round(len(results) / duration, 2),
+            'duration_s': round(duration, 3)
+        }
+
+
+def start_local_app(llm_url):
+    """本进程内启动应用：临时 SQLite 库，模型调用指向假服务，后台任务全部关闭"""
+    os.environ.setdefault('DB_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.sqlite3'))
+    os.environ['LLM_PROVIDERS'] = json.dumps([{'name': 'mock', 'base_url': llm_url, 'api_key': 'bench'}])
+    for name in ('TRANSLATION_WORKER_ENABLED', 'SENTENCE_POOL_ENABLED', 'STORY_POOL_ENABLED'):
+        os.environ[name] = 'false'
+
+    from werkzeug.serving import make_server
+    from app import app
+    from models import db, ensure_default_deck
+
+    with app.app_context():
+        db.create_all()
+        ensure_default_deck()
+        db.session.commit()
+    # 不逐条打印访问日志，避免日志输出本身影响测得的延迟
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, name='bench-app', daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}'
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(result, baseline):
+    """各场景相对基线的变化比例：延迟为正表示变慢，吞吐量为负表示变慢"""
+    delta = {}
+    for name, current in result['scenarios'].items():
+        before = baseline.get('scenarios', {}).get(name)
+        if not before:
+            continue
+        delta[name] = {
+            key: round((current[key] - before[key]) / before[key], 3) if before.get(key) else None
+            for key in ('p50_ms', 'p95_ms', 'p99_ms', 'throughput_rps')
+        }
+    return {'baseline_commit': baseline.get('commit'), 'scenarios': delta}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='压测已在运行的实例；不指定时在本进程内启动应用和假服务')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='逗号分隔，可选: ' + ', '.join(SCENARIOS))
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=200, help='每个场景的请求数')
+    parser.add_argument('--upload-words', type=int, default=200, help='每次上传的单词数')
+    parser.add_argument('--timeout', type=float, default=120)
+    parser.add_argument('-o', '--output', help='结果另存为 JSON 文件')
+    parser.add_argument('--baseline', help='上一次的结果文件，用于对比')
+    mock_llm_server.add_arguments(parser)
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f'未知的场景: {", ".join(sorted(unknown))}')
+
+    mock, app_server, base_url = None, None, args.url
+    if not base_url:
+        mock = mock_llm_server.from_args(args)
+        app_server, base_url = start_local_app(mock.start())
+
+    try:
+        test = LoadTest(base_url, args.concurrency, args.requests, args.upload_words, args.timeout)
+        test.setup(scenarios)
+        result = {
+            'commit': _git_commit(),
+            'target': args.url or 'local',
+            'concurrency': args.concurrency,
+            'requests_per_scenario': args.requests,
+            'mock_llm': None if mock is None else {
+                'latency': args.latency, 'jitter': args.jitter, 'rate_429': args.rate_429
+            },
+            'scenarios': {name: test.run(name) for name in scenarios}
+        }
+        if mock is not None:
+            result['mock_llm']['calls'] = mock.stats()
+    finally:
+        if app_server is not None:
+            app_server.shutdown()
+        if mock is not None:
+            mock.stop()
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            result['compare'] = compare(result, json.load(f))
+
+    output = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    print(output)
+
+
+if __name__ == '__main__':
+    main()
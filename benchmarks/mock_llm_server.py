@@ -0,0 +1,179 @@
+# benchmarks/mock_llm_server.py
+"""
+本地假的 OpenAI 兼容服务：POST /v1/chat/completions，响应内容与 stub 服务商相同
+（翻译、故事、造句都能被 services 正常解析），用于压测时替代真实的大模型接口。
+
+可以配置延迟、抖动和 429 的比例：
+    python benchmarks/mock_llm_server.py --port 8001 --latency 0.5 --jitter 0.2 --rate-429 0.05
+
+应用指向它：
+    LLM_PROVIDERS='[{"name": "mock", "base_url": "http://127.0.0.1:8001", "api_key": "bench"}]' python app.py
+
+每次请求的延迟在 [latency - jitter, latency + jitter] 内均匀分布；被选中返回 429 的请求立即返回，
+带 Retry-After。stream: true 的请求按 SSE 分段返回，段与段之间间隔 --chunk-delay 秒。
+GET /stats 返回收到的请求数和返回 429 的次数。
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from providers import StubProvider  # noqa: E402
+
+
+class MockLLMServer:
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.2, jitter=0.05, rate_429=0.0,
+                 retry_after='1', chunk_delay=0.02, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.chunk_delay = chunk_delay
+        self._random = random.Random(seed)
+        self._stub = StubProvider('mock')
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.throttled = 0
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def _decide(self):
+        """返回 (是否返回 429, 本次延迟秒数)"""
+        with self._lock:
+            self.requests += 1
+            throttle = self._random.random() < self.rate_429
+            if throttle:
+                self.throttled += 1
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+        return throttle, delay
+
+    def stats(self):
+        with self._lock:
+            return {'requests': self.requests, 'throttled': self.throttled}
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def _json(self, status, body, headers=None):
+                data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if self.path == '/stats':
+                    self._json(200, server.stats())
+                else:
+                    self._json(404, {'error': {'message': 'not found'}})
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                try:
+                    payload = json.loads(self.rfile.read(length) or b'{}')
+                except ValueError:
+                    self._json(400, {'error': {'message': 'invalid json'}})
+                    return
+                if not self.path.endswith('/chat/completions'):
+                    self._json(404, {'error': {'message': 'not found'}})
+                    return
+
+                throttle, delay = server._decide()
+                if throttle:
+                    self._json(429, {'error': {'message': 'Rate limit exceeded'}},
+                               {'Retry-After': server.retry_after})
+                    return
+                time.sleep(delay)
+                content = server._stub.reply(payload)
+                if payload.get('stream'):
+                    self._stream(content)
+                    return
+                self._json(200, {
+                    'id': f'mock-{time.time_ns()}',
+                    'object': 'chat.completion',
+                    'model': payload.get('model'),
+                    'choices': [{'index': 0, 'finish_reason': 'stop',
+                                 'message': {'role': 'assistant', 'content': content}}]
+                })
+
+            def _stream(self, content):
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Connection', 'close')
+                self.end_headers()
+                self.close_connection = True
+                for start in range(0, len(content), 16):
+                    chunk = {'choices': [{'index': 0, 'delta': {'content': content[start:start + 16]}}]}
+                    self.wfile.write(f'data: {json.dumps(chunk, ensure_ascii=False)}\n\n'.encode('utf-8'))
+                    self.wfile.flush()
+                    time.sleep(server.chunk_delay)
+                self.wfile.write(b'data: [DONE]\n\n')
+
+        return Handler
+
+    def start(self):
+        """在后台线程里运行，返回服务地址"""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='mock-llm', daemon=True)
+        self._thread.start()
+        return self.url
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def add_arguments(parser):
+    parser.add_argument('--latency', type=float, default=0.2, help='平均延迟（秒）')
+    parser.add_argument('--jitter', type=float, default=0.05, help='延迟抖动幅度（秒）')
+    parser.add_argument('--rate-429', type=float, default=0.0, help='返回 429 的比例，0~1')
+    parser.add_argument('--retry-after', default='1', help='429 响应的 Retry-After')
+    parser.add_argument('--chunk-delay', type=float, default=0.02, help='流式响应每段的间隔（秒）')
+    parser.add_argument('--seed', type=int, help='随机种子，便于复现')
+
+
+def from_args(args, host='127.0.0.1', port=0):
+    return MockLLMServer(host, port, args.latency, args.jitter, args.rate_429,
+                         args.retry_after, args.chunk_delay, args.seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8001)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    server = from_args(args, args.host, args.port)
+    print(f'mock LLM server listening on {server.url}')
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+# circuit_breaker.py
+"""
+大模型接口熔断器：上游持续出错时直接快速失败，不再让工作线程卡满超时时间。
+
+- closed：正常放行，连续 failure_threshold 次失败（网络错误、超时、5xx）后打开
+- open：所有调用立即抛出 CircuitOpen，调用方按各自的失败提示返回；reset_timeout 秒后转为半开
+- half_open：只放行 half_open_probes 个探测请求，成功则关闭，失败则重新打开
+429 属于限流，由 rate_limit 处理，不计入失败。
+"""
+import threading
+import time
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpen(Exception):
+    """熔断器打开，本次调用没有发出"""
+
+
+class CircuitBreaker:
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, half_open_probes=1):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.half_open_probes = max(1, half_open_probes)
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self._stats = {'rejected': 0, 'opened': 0, 'failures': 0, 'successes': 0}
+
+    @property
+    def state(self):
+        with self._lock:
+            self._maybe_half_open(time.monotonic())
+            return self._state
+
+    def _maybe_half_open(self, now):
+        if self._state == OPEN and now - self._opened_at >= self.reset_timeout:
+            self._state = HALF_OPEN
+            self._probes = 0
+
+    def _open(self, now):
+        self._state = OPEN
+        self._opened_at = now
+        self._probes = 0
+        self._stats['opened'] += 1
+        print(f"大模型接口连续失败 {self._failures} 次，熔断 {self.reset_timeout} 秒")
+
+    def before(self):
+        """调用前检查；不允许调用时抛出 CircuitOpen。返回本次是否为半开状态下的探测请求"""
+        with self._lock:
+            self._maybe_half_open(time.monotonic())
+            if self._state == CLOSED:
+                return False
+            if self._state == HALF_OPEN and self._probes < self.half_open_probes:
+                self._probes += 1
+                return True
+            self._stats['rejected'] += 1
+        raise CircuitOpen('AI 服务暂时不可用（熔断中），请稍后再试')
+
+    def record_success(self, probe=False):
+        with self._lock:
+            self._stats['successes'] += 1
+            self._failures = 0
+            if probe or self._state == HALF_OPEN:
+                self._state = CLOSED
+                self._probes = 0
+
+    def record_failure(self, probe=False):
+        with self._lock:
+            self._stats['failures'] += 1
+            self._failures += 1
+            now = time.monotonic()
+            if probe or self._state == HALF_OPEN:
+                self._open(now)
+            elif self._state == CLOSED and self._failures >= self.failure_threshold:
+                self._open(now)
+
+    def cancel(self, probe=False):
+        """放行后调用没有真正发出（例如排队超时）：归还探测名额，不影响状态"""
+        if probe:
+            with self._lock:
+                if self._state == HALF_OPEN:
+                    self._probes = max(0, self._probes - 1)
+
+    def reset(self):
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._probes = 0
+
+    def stats(self):
+        with self._lock:
+            now = time.monotonic()
+            self._maybe_half_open(now)
+            retry_in = self.reset_timeout - (now - self._opened_at) if self._state == OPEN else 0.0
+            return dict(
+                self._stats,
+                state=self._state,
+                consecutive_failures=self._failures,
+                failure_threshold=self.failure_threshold,
+                retry_in=round(max(retry_in, 0.0), 1)
+            )
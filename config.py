@@ -9,4 +9,42 @@ class Config:
     
     # AI 配置 
     DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY", "")
-    SILICONFLOW_BASE_URL = "https://api.deepseek.com"
\ No newline at end of file
+    # 多个 OpenAI 兼容服务商（JSON 数组，格式见 providers.py），为空时只用 DeepSeek
+    LLM_PROVIDERS = os.getenv("LLM_PROVIDERS", "")
+    # 交互请求超过 p95 延迟还没返回时，向另一个服务商再发一次（会多消耗调用额度，默认关闭）
+    LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "false").lower() == "true"
+
+    # 服务端批量翻译队列
+    TRANSLATION_WORKER_ENABLED = os.getenv("TRANSLATION_WORKER_ENABLED", "true").lower() == "true"
+    TRANSLATION_BATCH_SIZE = int(os.getenv("TRANSLATION_BATCH_SIZE", "50"))
+    TRANSLATION_POLL_INTERVAL = float(os.getenv("TRANSLATION_POLL_INTERVAL", "5"))
+
+    # 离线词典文件（python offline_dict.py build 生成），常用单词直接查本地，不调用模型；为空时不启用
+    OFFLINE_DICT_PATH = os.getenv("OFFLINE_DICT_PATH", "")
+
+    # 造句题目预生成池
+    SENTENCE_POOL_ENABLED = os.getenv("SENTENCE_POOL_ENABLED", "true").lower() == "true"
+    SENTENCE_POOL_SIZE = int(os.getenv("SENTENCE_POOL_SIZE", "20"))
+    SENTENCE_POOL_BATCH = int(os.getenv("SENTENCE_POOL_BATCH", "5"))
+
+    # 已下发句子的去重存储：memory（进程内）或 sqlite（同机多个 worker 共享一个文件）
+    SENTENCE_DEDUP_BACKEND = os.getenv("SENTENCE_DEDUP_BACKEND", "memory")
+    SENTENCE_DEDUP_PATH = os.getenv("SENTENCE_DEDUP_PATH", "instance/sentence_dedup.sqlite3")
+    SENTENCE_DEDUP_CAPACITY = int(os.getenv("SENTENCE_DEDUP_CAPACITY", "1000"))
+
+    # 相同模型请求合并：memory（进程内）或 sqlite（同机多个 worker 通过一个文件合并）
+    SINGLEFLIGHT_BACKEND = os.getenv("SINGLEFLIGHT_BACKEND", "memory")
+    SINGLEFLIGHT_PATH = os.getenv("SINGLEFLIGHT_PATH", "instance/singleflight.sqlite3")
+
+    # 翻译进度推送（SSE）：每个进程一路轮询，广播给所有订阅者
+    EVENTS_POLL_INTERVAL = float(os.getenv("EVENTS_POLL_INTERVAL", "1"))
+    EVENTS_MAX_SUBSCRIBERS = int(os.getenv("EVENTS_MAX_SUBSCRIBERS", "100"))
+
+    # 故事缓存：按单词组合缓存，重合度足够高的请求也直接复用
+    STORY_CACHE_MAX_BYTES = int(os.getenv("STORY_CACHE_MAX_BYTES", str(2 * 1024 * 1024)))
+    STORY_CACHE_TTL = float(os.getenv("STORY_CACHE_TTL", "86400"))
+    STORY_CACHE_MIN_OVERLAP = float(os.getenv("STORY_CACHE_MIN_OVERLAP", "0.6"))
+    # 故事预生成（默认关闭）：在 STORY_POOL_HOURS 时段内为热门单词组合提前生成
+    STORY_POOL_ENABLED = os.getenv("STORY_POOL_ENABLED", "false").lower() == "true"
+    STORY_POOL_SIZE = int(os.getenv("STORY_POOL_SIZE", "20"))
+    STORY_POOL_HOURS = os.getenv("STORY_POOL_HOURS", "1-6")
@@ -0,0 +1,97 @@
+# dedup_store.py
+"""
+有界去重存储：记住最近 capacity 个键（环形缓冲区 + 哈希集合），add / 查询都是 O(1)。
+- MemoryDedupStore：进程内
+- SQLiteDedupStore：本地 SQLite 文件，同一台机器上的多个 gunicorn worker 共享
+"""
+import os
+import sqlite3
+import threading
+
+
+class MemoryDedupStore:
+
+    def __init__(self, capacity=1000):
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._ring = [None] * capacity
+        self._pos = 0
+        self._keys = set()
+
+    def add(self, key):
+        """记录 key；已存在时返回 False，否则返回 True（必要时淘汰最早的键）"""
+        with self._lock:
+            if key in self._keys:
+                return False
+            oldest = self._ring[self._pos]
+            if oldest is not None:
+                self._keys.discard(oldest)
+            self._ring[self._pos] = key
+            self._keys.add(key)
+            self._pos = (self._pos + 1) % self.capacity
+            return True
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._keys
+
+    def __len__(self):
+        with self._lock:
+            return len(self._keys)
+
+    def clear(self):
+        with self._lock:
+            self._ring = [None] * self.capacity
+            self._pos = 0
+            self._keys.clear()
+
+
+class SQLiteDedupStore:
+    """
+    seq 自增主键充当环形缓冲区的位置，key 上的唯一索引充当哈希集合：
+    新键插入后删除 seq 落在窗口之外的行，始终只保留最近 capacity 个。
+    """
+
+    def __init__(self, path, capacity=1000):
+        self.capacity = capacity
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS dedup_keys ('
+            'seq INTEGER PRIMARY KEY AUTOINCREMENT, '
+            'key TEXT NOT NULL UNIQUE)'
+        )
+
+    def add(self, key):
+        with self._lock:
+            cursor = self._conn.execute('INSERT OR IGNORE INTO dedup_keys (key) VALUES (?)', (key,))
+            if cursor.rowcount == 0:
+                return False
+            self._conn.execute('DELETE FROM dedup_keys WHERE seq <= ?', (cursor.lastrowid - self.capacity,))
+            return True
+
+    def __contains__(self, key):
+        with self._lock:
+            row = self._conn.execute('SELECT 1 FROM dedup_keys WHERE key = ?', (key,)).fetchone()
+            return row is not None
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM dedup_keys').fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute('DELETE FROM dedup_keys')
+
+
+def create_dedup_store(backend='memory', capacity=1000, path=None):
+    if backend == 'sqlite':
+        return SQLiteDedupStore(path or 'instance/dedup.sqlite3', capacity)
+    if backend == 'memory':
+        return MemoryDedupStore(capacity)
+    raise ValueError(f"未知的去重存储类型: {backend}")
@@ -0,0 +1,125 @@
+# events.py
+"""
+翻译进度推送：每个进程只有一个线程按版本号轮询变更日志，
+把新完成的翻译以 {id, chinese} 事件分发给订阅了该词库的 SSE 连接。
+订阅者再多，数据库上也只有这一路轮询。
+"""
+import queue
+import threading
+from background import BackgroundWorker
+from models import PENDING_TRANSLATION, DEFAULT_DECK_ID
+from versioning import changes_since, current_version
+from word_query import words_by_ids
+
+
+class TooManySubscribers(Exception):
+    pass
+
+
+class Subscription:
+    """一个订阅者（只关心 deck_id 词库）的有界队列；消费太慢导致队列溢出时，只通知它重新同步"""
+
+    def __init__(self, queue_size, deck_id=DEFAULT_DECK_ID):
+        self.deck_id = deck_id
+        self._queue = queue.Queue(maxsize=queue_size)
+        self.overflowed = False
+
+    def put(self, event):
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.overflowed = True
+
+    def get(self, timeout):
+        """取下一个事件；超时返回 None"""
+        if self.overflowed:
+            self.overflowed = False
+            with self._queue.mutex:
+                self._queue.queue.clear()
+            return {'event': 'resync'}
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class EventBroker(BackgroundWorker):
+    """
+    - subscribe() / unsubscribe()：SSE 连接注册、注销自己的队列，订阅数有上限
+    - run_once()：有订阅者时检查词库版本号，变化后取增量，把新翻译广播出去
+    第一个订阅者到来时才启动轮询线程。
+    """
+    name = 'event-broker'
+
+    def __init__(self, app, interval=1.0, max_subscribers=100, queue_size=1000, autostart=True):
+        super().__init__(interval)
+        self.app = app
+        self.max_subscribers = max_subscribers
+        self.queue_size = queue_size
+        self.autostart = autostart
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._version = None
+        self.published_total = 0
+
+    def subscribe(self, deck_id=DEFAULT_DECK_ID):
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                raise TooManySubscribers()
+            subscription = Subscription(self.queue_size, deck_id)
+            self._subscribers.add(subscription)
+        if self.autostart:
+            self.start()
+            self.wake()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(self, event, deck_id=None):
+        """deck_id 为 None 时发给所有订阅者"""
+        with self._lock:
+            subscribers = [s for s in self._subscribers if deck_id is None or s.deck_id == deck_id]
+            self.published_total += 1
+        for subscription in subscribers:
+            subscription.put(event)
+
+    def run_once(self):
+        with self._lock:
+            idle = not self._subscribers
+        if idle:
+            # 没人订阅时不查数据库，下次有人订阅再从当时的版本开始
+            self._version = None
+            return False
+
+        with self.app.app_context():
+            if self._version is None:
+                self._version = current_version()
+                return False
+            changes = changes_since(self._version)
+            if changes['version'] == self._version:
+                return False
+            self._version = changes['version']
+            if changes['full_resync']:
+                self.publish({'event': 'resync'})
+                return False
+            # 一个轮询周期内先新增后翻译的单词会合并成 insert，所以新增的也要看
+            words = words_by_ids(changes['upserted'], fields=('id', 'chinese', 'deck_id'))
+
+        for word in words:
+            if word['chinese'] != PENDING_TRANSLATION:
+                data = {'id': word['id'], 'chinese': word['chinese']}
+                self.publish({'event': 'translation', 'data': data}, deck_id=word['deck_id'])
+        return False
+
+    def stats(self):
+        with self._lock:
+            return {
+                'running': self.running,
+                'subscribers': len(self._subscribers),
+                'max_subscribers': self.max_subscribers,
+                'published_total': self.published_total,
+                'version': self._version,
+                'last_error': self.last_error
+            }
@@ -0,0 +1,224 @@
+# importer.py
+"""词库导入：流式解析上传文件的每一行，并以批量方式写入数据库"""
+import codecs
+import re
+import chardet # 引入字符编码检测库
+from sqlalchemy import select
+from models import db, Word, PENDING_TRANSLATION, DEFAULT_DECK_ID, collation_key, insert_ignore
+import translation_cache
+import offline_dict
+
+# 定义一个正则表达式来匹配大部分中文字符
+CHINESE_CHAR_PATTERN = re.compile(r'[\u4e00-\u9fff]')
+
+# 每批 IN (...) 查询 / 多行 INSERT 的行数，控制在 MySQL 单条语句的合理大小内
+IMPORT_CHUNK_SIZE = 1000
+
+# 编码检测只看文件开头的一段样本，之后按固定大小分块读取
+ENCODING_SAMPLE_SIZE = 64 * 1024
+READ_CHUNK_SIZE = 64 * 1024
+# 检测出的编码换成兼容它的超集：开头全是 ASCII 的文件后面可能有中文，GB2312 文件里可能有 GBK 才有的字
+SUPERSET_ENCODINGS = {'ascii': 'utf-8', 'gb2312': 'gb18030', 'gbk': 'gb18030'}
+# 解码失败时依次再试的编码
+FALLBACK_ENCODINGS = ('utf-8', 'gb18030')
+
+
+class ImportFormatError(Exception):
+    """上传文件无法解码或内容非法，message 直接返回给前端"""
+
+
+def parse_line(line):
+    """解析单行内容，返回 (english, chinese)；空行返回 None"""
+    line = line.strip()
+    if not line:
+        return None
+
+    parts = line.split()
+    if not parts:
+        return None
+
+    eng = parts[0].strip()
+    cn = PENDING_TRANSLATION
+
+    # 检查是否包含中文或有多部分内容
+    if CHINESE_CHAR_PATTERN.search(line) or len(parts) > 1:
+        if len(parts) > 1:
+            # 使用 maxsplit 确保只拆分第一个空格，保留完整的中文描述
+            _, cn_raw = line.split(maxsplit=1)
+            cn = cn_raw.strip()
+
+    if not eng:
+        return None
+    return eng, cn
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def import_words(pairs, chunk_size=None, deck_id=DEFAULT_DECK_ID):
+    """
+    批量导入 (english, chinese) 列表到 deck_id 词库，返回新插入单词的 dict 列表（按文件顺序）。
+
+    1. 在内存中去重（同一个英文以第一次出现为准；按 collation_key 比较，
+       与 MySQL 不区分大小写的排序规则一致，"Apple" 和 "apple" 算同一个单词）
+    2. 分块 IN (...) 查询已存在的单词，并在全局词典里取出（或建出）对应的词条；
+       文件没带中文、词条已有翻译或离线词典里有的单词直接用现成的翻译，不再进入翻译队列
+    3. 分块多行 INSERT IGNORE 新单词（兜底：比较键没覆盖到的排序规则差异不会让整个上传失败），
+       再按块回查生成的 ID；被忽略的行（数据库里是另一个写法、插入前就有，或者按 rowcount
+       判断是查重之后别的上传抢先插入的）不算新单词，不出现在返回值里，也不会记成新增
+    数据库往返次数只与块数有关，与行数无关。调用方负责 commit。
+    """
+    chunk_size = chunk_size or IMPORT_CHUNK_SIZE
+    unique = {}
+    seen = set()
+    for eng, cn in pairs:
+        key = collation_key(eng)
+        if key not in seen:
+            seen.add(key)
+            unique[eng] = cn
+
+    new_words = []
+    for chunk in _chunks(list(unique), chunk_size):
+        existing_rows = db.session.execute(
+            select(Word.english, Word.id).where(Word.deck_id == deck_id, Word.english.in_(chunk))
+        ).all()
+        existing = {collation_key(english) for english, _ in existing_rows}
+        existing_ids = {id for _, id in existing_rows}
+
+        fresh = [eng for eng in chunk if collation_key(eng) not in existing]
+        if not fresh:
+            continue
+        lexemes = translation_cache.resolve(fresh)
+        offline = offline_dict.lookup_many(
+            [eng for eng in fresh if unique[eng] == PENDING_TRANSLATION and lexemes.get(eng, (None, None))[1] is None]
+        )
+        rows = []
+        for eng in fresh:
+            lexeme_id, translation = lexemes.get(eng, (None, None))
+            translation = translation or offline.get(eng)
+            chinese = unique[eng]
+            if chinese == PENDING_TRANSLATION and translation is not None:
+                chinese = translation
+            rows.append({'deck_id': deck_id, 'english': eng, 'lexeme_id': lexeme_id, 'chinese': chinese})
+
+        inserted = db.session.execute(insert_ignore(Word.__table__), rows).rowcount
+
+        # 按原样的英文对回 ID：冲突被忽略的行在数据库里是另一个写法，或者插入前就存在，不能当作新单词
+        found = sorted((id, english) for english, id in db.session.execute(
+            select(Word.english, Word.id).where(Word.deck_id == deck_id, Word.english.in_([row['english'] for row in rows]))
+        ).all() if id not in existing_ids)
+        if 0 <= inserted < len(found):
+            # 查重之后别的上传抢先插入了同样的单词：它们的 ID 更早分配，只保留本次插入的最后 inserted 行
+            found = found[len(found) - inserted:]
+        ids = {english: id for id, english in found}
+        for row in rows:
+            if row['english'] not in ids:
+                continue
+            new_words.append({
+                'id': ids.pop(row['english']),
+                'english': row['english'],
+                'chinese': row['chinese'],
+                'status': 0
+            })
+    return new_words
+
+
+def detect_encoding(sample):
+    """根据文件开头的样本检测编码，置信度过低时兜底为 utf-8；ASCII、GB2312 换成兼容的超集"""
+    result = chardet.detect(sample)
+    encoding = result['encoding'] or 'utf-8'
+    if result['confidence'] < 0.3:
+        encoding = 'utf-8' # 兜底策略
+    return SUPERSET_ENCODINGS.get(encoding.lower(), encoding)
+
+
+def _codec_name(encoding):
+    try:
+        return codecs.lookup(encoding).name
+    except LookupError:
+        return None
+
+
+def iter_lines(stream, encoding, head=b''):
+    """
+    用 codecs 增量解码器逐块解码，逐行产出文本。
+    head 是已经读出的样本，会先于 stream 剩余部分被解码。
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    pending = ''
+    chunk = head or stream.read(READ_CHUNK_SIZE)
+    while chunk:
+        text = decoder.decode(chunk)
+        # 情况 2：检测是否是二进制乱码（比如图片）
+        if '\x00' in text:
+            raise ImportFormatError('文件内容非法：检测到二进制流')
+        lines = (pending + text).splitlines(keepends=True)
+        # 最后一行可能被块边界截断（包括 \r\n 被拆开），留到下一块再处理
+        pending = lines.pop() if lines else ''
+        yield from lines
+        chunk = stream.read(READ_CHUNK_SIZE)
+
+    pending += decoder.decode(b'', final=True)
+    if '\x00' in pending:
+        raise ImportFormatError('文件内容非法：检测到二进制流')
+    yield from pending.splitlines()
+
+
+def iter_batches(lines, batch_size=None):
+    """把文本行解析为 (english, chinese)，按固定大小分批产出"""
+    batch_size = batch_size or IMPORT_CHUNK_SIZE
+    batch = []
+    for line in lines:
+        parsed = parse_line(line)
+        if parsed:
+            batch.append(parsed)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def _import_with_encoding(stream, encoding, head, deck_id):
+    new_words = []
+    for batch in iter_batches(iter_lines(stream, encoding, head)):
+        # 之前批次写入的单词已在同一事务中，IN 查询能查到，跨批次的重复同样会被过滤
+        new_words.extend(import_words(batch, deck_id=deck_id))
+    return new_words
+
+
+def import_stream(stream, deck_id=DEFAULT_DECK_ID):
+    """
+    流式导入上传文件：只读取开头样本检测编码，之后边解码边分批写库，
+    文件内容只在内存中保留一个读取块和一个写入批次。
+    返回新插入单词的 dict 列表（上传接口要把它们返回给前端），这个列表随新单词数增长，
+    不是常数内存；调用方负责 commit，出错时负责 rollback。
+    """
+    head = stream.read(ENCODING_SAMPLE_SIZE)
+    if not head:
+        return []
+
+    # 开头的样本可能不代表整个文件：解码失败时按失败处附近的字节重新检测，
+    # 再依次试 FALLBACK_ENCODINGS，每次都从头重新导入
+    candidates = [detect_encoding(head)]
+    tried = set()
+    while candidates:
+        encoding = candidates.pop(0)
+        name = _codec_name(encoding)
+        if name is None or name in tried:
+            continue
+        if tried:
+            if not stream.seekable():
+                break
+            stream.seek(0)
+            head = stream.read(ENCODING_SAMPLE_SIZE)
+        tried.add(name)
+        try:
+            return _import_with_encoding(stream, encoding, head, deck_id)
+        except UnicodeDecodeError as e:
+            db.session.rollback()
+            around = e.object[max(e.start - 64, 0):e.start + ENCODING_SAMPLE_SIZE // 16]
+            candidates = [detect_encoding(around)] + candidates + list(FALLBACK_ENCODINGS)
+    raise ImportFormatError('无法识别该文件编码')
@@ -0,0 +1,319 @@
+# llm_client.py
+"""
+大模型接口共享的 HTTP 客户端：一个进程内复用同一个 requests.Session，
+连接池保持 keep-alive，避免每次调用都重新做 TCP + TLS 握手。
+
+异步调用（apost）统一跑在一个常驻的事件循环线程上，共用一个 httpx.AsyncClient：
+在途的异步模型请求只占用这一个循环线程和连接池，数量上限由 ASYNC_MAX_CONNECTIONS 决定。
+
+同步和异步调用都先经过 rate_limit 的自适应限流器；429 由这里按 Retry-After 等待后重试，
+不再交给连接池的自动重试，限流器才能看到每一次限流并随之降速。
+上游持续出错时 circuit_breaker 熔断，调用直接抛出 CircuitOpen，不再排队、不再等超时。
+限流器和熔断器成对组成一个 Gate：providers 里每个服务商各有一个，一个服务商限流或熔断不影响其它服务商；
+不指定 gate 的调用使用模块级的默认 gate。
+"""
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+import time
+from collections import deque
+from concurrent import futures
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import rate_limit
+from circuit_breaker import CircuitBreaker
+
+# 每个 host 最多保持的空闲连接数，应不小于并发调用数（gunicorn 线程数 + 后台任务）
+POOL_MAXSIZE = int(os.getenv("LLM_POOL_MAXSIZE", "20"))
+# 只重试服务端明确没有处理的情况（限流、网关错误）；读超时不重试，避免重复计费
+RETRY_TOTAL = int(os.getenv("LLM_RETRY_TOTAL", "2"))
+RETRY_STATUS_CODES = (502, 503, 504)
+# 429 的重试次数（每次都先等限流器放行）
+THROTTLE_RETRIES = int(os.getenv("LLM_THROTTLE_RETRIES", "2"))
+
+# 客户端限流：每秒请求数（0 表示不限）、突发上限、自适应并发的初始值与上限
+RATE_LIMIT = float(os.getenv("LLM_RATE_LIMIT", "10"))
+RATE_BURST = int(os.getenv("LLM_RATE_BURST", "10"))
+INITIAL_CONCURRENCY = int(os.getenv("LLM_INITIAL_CONCURRENCY", "4"))
+MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", os.getenv("LLM_POOL_MAXSIZE", "20")))
+# 排队等待配额的最长时间，超过后按调用失败处理（各接口返回自己的失败提示）
+ACQUIRE_TIMEOUT = {
+    rate_limit.INTERACTIVE: float(os.getenv("LLM_INTERACTIVE_WAIT", "20")),
+    rate_limit.BULK: float(os.getenv("LLM_BULK_WAIT", "120"))
+}
+
+# 异步客户端的连接上限，决定一个进程内同时在途的异步模型请求数
+ASYNC_MAX_CONNECTIONS = int(os.getenv("LLM_ASYNC_MAX_CONNECTIONS", "200"))
+
+# 熔断：连续失败多少次后打开、打开多少秒后放行探测请求、半开时的探测请求数
+BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+BREAKER_RESET_TIMEOUT = float(os.getenv("LLM_BREAKER_RESET_TIMEOUT", "30"))
+BREAKER_PROBES = int(os.getenv("LLM_BREAKER_PROBES", "1"))
+
+# 最近若干次调用的明细
+RECENT_CALLS_SIZE = 50
+
+
+def _build_session():
+    retry = Retry(
+        total=RETRY_TOTAL,
+        connect=RETRY_TOTAL,
+        read=0,
+        status=RETRY_TOTAL,
+        backoff_factor=0.5,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=frozenset(['POST']),
+        # Retry-After 交给限流器处理；否则 urllib3 会自己等待并重试 429，限流器看不到
+        respect_retry_after_header=False,
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_MAXSIZE, max_retries=retry)
+    http = requests.Session()
+    http.mount('https://', adapter)
+    http.mount('http://', adapter)
+    return http, adapter
+
+
+session, adapter = _build_session()
+
+_lock = threading.Lock()
+_stats = {
+    'calls': 0, 'new_connections': 0, 'reused_connections': 0, 'errors': 0,
+    'async_calls': 0, 'async_errors': 0, 'async_in_flight': 0
+}
+_recent_calls = deque(maxlen=RECENT_CALLS_SIZE)
+
+
+def _connection_count(url):
+    """连接池为该 host 累计新建的连接数"""
+    try:
+        return adapter.poolmanager.connection_from_url(url).num_connections
+    except Exception:
+        return 0
+
+
+def _status(response):
+    status = getattr(response, 'status_code', None)
+    return status if isinstance(status, int) else None
+
+
+def _retry_after(response):
+    headers = getattr(response, 'headers', None)
+    try:
+        return headers.get('Retry-After') if headers is not None else None
+    except Exception:
+        return None
+
+
+class Gate:
+    """一个上游的限流器和熔断器，参数都取自上面的环境变量"""
+
+    def __init__(self):
+        self.limiter = rate_limit.AdaptiveLimiter(
+            rate=RATE_LIMIT, burst=RATE_BURST,
+            initial_concurrency=INITIAL_CONCURRENCY, max_concurrency=MAX_CONCURRENCY
+        )
+        self.breaker = CircuitBreaker(BREAKER_FAILURES, BREAKER_RESET_TIMEOUT, BREAKER_PROBES)
+
+    def admit(self, priority):
+        """熔断器和限流器都放行后返回本次是否为探测请求；熔断时立即抛出 CircuitOpen，不去排队"""
+        probe = self.breaker.before()
+        try:
+            self.limiter.acquire(priority, ACQUIRE_TIMEOUT[priority])
+        except BaseException:
+            self.breaker.cancel(probe)
+            raise
+        return probe
+
+    def finish(self, probe, response):
+        """收到响应：429 只交给限流器，5xx 计入熔断器的失败"""
+        status = _status(response)
+        self.limiter.release(status, _retry_after(response))
+        if status is not None and status >= 500:
+            self.breaker.record_failure(probe)
+        else:
+            self.breaker.record_success(probe)
+        return status
+
+    def fail(self, probe):
+        """请求没有拿到响应（网络错误、超时）"""
+        self.limiter.release()
+        self.breaker.record_failure(probe)
+
+    def cancel(self, probe):
+        """调用方取消，不算上游失败"""
+        self.limiter.release()
+        self.breaker.cancel(probe)
+
+    def stats(self):
+        return {'limiter': self.limiter.stats(), 'breaker': self.breaker.stats()}
+
+
+# 不经过 providers 的直接调用使用的默认 gate
+default_gate = Gate()
+limiter = default_gate.limiter
+breaker = default_gate.breaker
+
+
+def post(url, gate=None, **kwargs):
+    """
+    经 gate 的熔断器和限流器放行后通过共享 Session 发送 POST，遇到 429 时等待后重试。
+    返回的 response 上附带 connection_reused 和 elapsed_ms 两个属性。
+    stream=True 时拿到响应头就释放并发名额。
+    """
+    gate = gate or default_gate
+    priority = rate_limit.current_priority()
+    for attempt in range(THROTTLE_RETRIES + 1):
+        probe = gate.admit(priority)
+        try:
+            response = _post_once(url, kwargs)
+        except Exception:
+            gate.fail(probe)
+            raise
+        if gate.finish(probe, response) != 429 or attempt == THROTTLE_RETRIES:
+            return response
+        response.close()
+
+
+def _post_once(url, kwargs):
+    """发送一次请求，并记录是否复用了已有连接"""
+    before = _connection_count(url)
+    started = time.perf_counter()
+    try:
+        response = session.post(url, **kwargs)
+    except Exception:
+        with _lock:
+            _stats['calls'] += 1
+            _stats['errors'] += 1
+        raise
+    elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+
+    # 并发调用时两次计数之间可能夹杂其它调用新建的连接，这里只是近似统计
+    new_connections = max(_connection_count(url) - before, 0)
+    reused = new_connections == 0
+    with _lock:
+        _stats['calls'] += 1
+        _stats['new_connections'] += new_connections
+        if reused:
+            _stats['reused_connections'] += 1
+        _recent_calls.append({
+            'at': time.time(),
+            'status': getattr(response, 'status_code', None),
+            'elapsed_ms': elapsed_ms,
+            'reused': reused
+        })
+
+    response.connection_reused = reused
+    response.elapsed_ms = elapsed_ms
+    return response
+
+
+class _AsyncRuntime:
+    """常驻事件循环线程 + 绑定在该循环上的 httpx.AsyncClient"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.loop = None
+        self.client = None
+
+    def ensure(self):
+        with self._lock:
+            if self.loop is None:
+                self.loop = asyncio.new_event_loop()
+                self.client = httpx.AsyncClient(
+                    limits=httpx.Limits(
+                        max_connections=ASYNC_MAX_CONNECTIONS,
+                        max_keepalive_connections=POOL_MAXSIZE
+                    ),
+                    # 只重试连接错误，与同步客户端保持一致
+                    transport=httpx.AsyncHTTPTransport(retries=RETRY_TOTAL)
+                )
+                threading.Thread(
+                    target=self.loop.run_forever, name='llm-async-loop', daemon=True
+                ).start()
+            return self.loop
+
+
+_runtime = _AsyncRuntime()
+
+
+async def _send(url, kwargs):
+    with _lock:
+        _stats['async_in_flight'] += 1
+    try:
+        return await _runtime.client.post(url, **kwargs)
+    except Exception:
+        with _lock:
+            _stats['async_errors'] += 1
+        raise
+    finally:
+        with _lock:
+            _stats['async_calls'] += 1
+            _stats['async_in_flight'] -= 1
+
+
+# 异步调用排队等待放行用的线程；不用调用方事件循环的默认线程池，调用方的循环关掉后名额照样能还回去
+_admit_executor = futures.ThreadPoolExecutor(thread_name_prefix='llm-admit')
+
+
+def _release_admitted(gate, future):
+    if not future.cancelled() and future.exception() is None:
+        gate.cancel(future.result())
+
+
+async def _admit(gate, priority):
+    """
+    在线程里排队等待放行，不阻塞调用方的事件循环。排队的线程没法中断：
+    调用方在排队时被取消，就等 admit 返回后把拿到的名额和半开探测还回去
+    """
+    future = _admit_executor.submit(contextvars.copy_context().run, gate.admit, priority)
+    try:
+        return await asyncio.wrap_future(future)
+    except asyncio.CancelledError:
+        future.add_done_callback(functools.partial(_release_admitted, gate))
+        raise
+
+
+async def apost(url, gate=None, **kwargs):
+    """
+    异步 POST。请求在常驻事件循环上执行，调用方可以来自任意事件循环
+    （Flask 的 async 视图每个请求都有自己的循环），连接池因此能跨请求复用。
+    返回 httpx.Response，其 status_code / json() / text 与 requests 一致。
+    """
+    gate = gate or default_gate
+    loop = _runtime.ensure()
+    priority = rate_limit.current_priority()
+    for attempt in range(THROTTLE_RETRIES + 1):
+        probe = await _admit(gate, priority)
+        started = time.perf_counter()
+        try:
+            future = asyncio.run_coroutine_threadsafe(_send(url, kwargs), loop)
+            response = await asyncio.wrap_future(future)
+        except Exception:
+            gate.fail(probe)
+            raise
+        except BaseException:
+            # 调用方被取消（例如浏览器断开）不算上游失败
+            gate.cancel(probe)
+            raise
+        response.elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+        if gate.finish(probe, response) != 429 or attempt == THROTTLE_RETRIES:
+            return response
+
+
+def stats():
+    """连接复用统计，以及最近调用的明细；limiter / breaker 是默认 gate 的，各服务商的见 providers"""
+    with _lock:
+        result = dict(_stats)
+        result['recent_calls'] = list(_recent_calls)
+    calls = result['calls'] - result['errors']
+    result['reuse_rate'] = round(result['reused_connections'] / calls, 3) if calls else 0.0
+    result['pool_maxsize'] = POOL_MAXSIZE
+    result.update(default_gate.stats())
+    return result
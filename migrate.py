@@ -0,0 +1,232 @@
+# migrate.py
+"""
+内置数据库迁移：给已有数据库补上新增的列和索引，可以重复执行。
+用法：python migrate.py      （使用 Config 里的 DB_URL）
+
+新表由 db.create_all() 创建；这里只处理 create_all 不会修改的已有表：
+- words.pending：待翻译标记，按 id 分批回填，避免长时间锁表
+- words.deck_id / word_changes.deck_id：已有单词和变更日志都归入默认词库
+- words.english 的唯一约束改为 (deck_id, english)，不同词库可以有相同的单词
+- words.lexeme_id：指向全局词典 lexemes，按 id 分批回填；旧 translation_cache 表里的翻译导入词典
+- words.translate_attempts / next_attempt_at / translate_error：后台翻译失败次数、退避时间和失败原因
+- words 上的 (pending, id)、(deck_id, status, id) 索引，去掉被取代的 (status, id) 索引
+"""
+from sqlalchemy import bindparam, inspect, text
+from models import db, Word, Deck, Lexeme, WordChange, PENDING_TRANSLATION, DEFAULT_DECK_ID, insert_ignore, collation_key
+from translation_cache import normalize
+
+# 被 (deck_id, status, id) 取代的旧索引
+OBSOLETE_INDEXES = ('ix_words_status_id',)
+DECK_UNIQUE = 'uq_words_deck_english'
+
+BACKFILL_BATCH = 5000
+
+
+def _add_pending_column(conn):
+    conn.execute(text("ALTER TABLE words ADD COLUMN pending BOOLEAN NOT NULL DEFAULT 0"))
+
+
+def _backfill_pending(conn):
+    """按 id 区间分批回填，每批单独提交"""
+    max_id = conn.execute(text("SELECT MAX(id) FROM words")).scalar() or 0
+    updated = 0
+    for start in range(0, max_id, BACKFILL_BATCH):
+        result = conn.execute(
+            text("UPDATE words SET pending = 1 WHERE id > :start AND id <= :end AND chinese = :pending"),
+            {'start': start, 'end': start + BACKFILL_BATCH, 'pending': PENDING_TRANSLATION}
+        )
+        conn.commit()
+        updated += result.rowcount
+    return updated
+
+
+def _add_deck_column(conn, table):
+    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN deck_id INTEGER NOT NULL DEFAULT {DEFAULT_DECK_ID}"))
+    if table == 'words' and conn.dialect.name == 'mysql':
+        conn.execute(text("ALTER TABLE words ADD CONSTRAINT fk_words_deck_id FOREIGN KEY (deck_id) REFERENCES decks (id)"))
+
+
+def _add_lexeme_column(conn):
+    conn.execute(text("ALTER TABLE words ADD COLUMN lexeme_id INTEGER NULL"))
+    if conn.dialect.name == 'mysql':
+        conn.execute(text("ALTER TABLE words ADD CONSTRAINT fk_words_lexeme_id FOREIGN KEY (lexeme_id) REFERENCES lexemes (id)"))
+
+
+def _add_retry_columns(conn, columns):
+    """补上翻译重试相关的列，返回补了哪些"""
+    added = []
+    for name, ddl in (('translate_attempts', 'INTEGER NOT NULL DEFAULT 0'),
+                      ('next_attempt_at', 'DATETIME NULL'),
+                      ('translate_error', 'VARCHAR(255) NULL')):
+        if name not in columns:
+            conn.execute(text(f"ALTER TABLE words ADD COLUMN {name} {ddl}"))
+            added.append(name)
+    return added
+
+
+def _import_translation_cache(conn):
+    """把旧 translation_cache 表里每个单词最新的一条翻译导入词典（词典为空时才导入）"""
+    if 'translation_cache' not in inspect(conn).get_table_names():
+        return 0
+    if conn.execute(text("SELECT COUNT(*) FROM lexemes")).scalar():
+        return 0
+    result = conn.execute(text(
+        "INSERT INTO lexemes (headword, translation, model, prompt_version, translated_at, created_at) "
+        "SELECT headword, translation, model, prompt_version, created_at, created_at FROM translation_cache "
+        "WHERE id IN (SELECT MAX(id) FROM translation_cache GROUP BY headword)"
+    ))
+    conn.commit()
+    return result.rowcount
+
+
+def _backfill_lexemes(conn):
+    """
+    按 id 区间分批给单词建词条并写回 lexeme_id，每批单独提交。
+    和 translation_cache.resolve 一样按 collation_key 对应词条：MySQL 下 "café" 和 "cafe" 是同一个词条
+    """
+    max_id = conn.execute(text("SELECT MAX(id) FROM words")).scalar() or 0
+    updated = 0
+    for start in range(0, max_id, BACKFILL_BATCH):
+        rows = conn.execute(
+            text("SELECT id, english FROM words WHERE id > :start AND id <= :end AND lexeme_id IS NULL"),
+            {'start': start, 'end': start + BACKFILL_BATCH}
+        ).all()
+        headwords = {row.id: normalize(row.english) for row in rows if normalize(row.english)}
+        if not headwords:
+            continue
+        keys = {}
+        for key in headwords.values():
+            keys.setdefault(collation_key(key), key)
+        select_ids = text("SELECT headword, id FROM lexemes WHERE headword IN :keys").bindparams(
+            bindparam('keys', expanding=True))
+        ids = {collation_key(headword): id for headword, id in conn.execute(select_ids, {'keys': list(keys.values())})}
+        missing = [key for ck, key in keys.items() if ck not in ids]
+        if missing:
+            # 并发的上传或翻译可能已经建出同一个词条，冲突时忽略，再按排序规则回查
+            conn.execute(insert_ignore(Lexeme.__table__, conn), [{'headword': key} for key in missing])
+            ids.update((collation_key(headword), id) for headword, id in conn.execute(select_ids, {'keys': missing}))
+        updates = [{'id': word_id, 'lexeme_id': ids[collation_key(key)]}
+                   for word_id, key in headwords.items() if collation_key(key) in ids]
+        if len(updates) < len(headwords):
+            # 理论上不会发生；这些单词留着 lexeme_id 为空，下次迁移再补
+            print(f"词条创建后仍查不到: {len(headwords) - len(updates)} 个单词")
+        if updates:
+            conn.execute(text("UPDATE words SET lexeme_id = :lexeme_id WHERE id = :id"), updates)
+        conn.commit()
+        updated += len(updates)
+    return updated
+
+
+def _legacy_english_unique(conn):
+    """只包含 english 一列的旧唯一约束 / 唯一索引的名字（SQLite 建表时内联的约束没有名字）"""
+    inspector = inspect(conn)
+    names = [c['name'] for c in inspector.get_unique_constraints('words') if c['column_names'] == ['english']]
+    names += [i['name'] for i in inspector.get_indexes('words') if i['unique'] and i['column_names'] == ['english']]
+    # MySQL 的唯一约束同时也会作为唯一索引列出来
+    return list(dict.fromkeys(names))
+
+
+def _rebuild_words_sqlite(conn):
+    """SQLite 不能删除内联的唯一约束，只能按新表结构重建 words 表再拷回数据"""
+    old_columns = {c['name'] for c in inspect(conn).get_columns('words')}
+    columns = ', '.join(c.name for c in Word.__table__.columns if c.name in old_columns)
+    # 索引名在 SQLite 里全库唯一，先删掉旧表上的索引，新表建好后会重新创建
+    for index in inspect(conn).get_indexes('words'):
+        conn.execute(text(f'DROP INDEX IF EXISTS "{index["name"]}"'))
+    conn.execute(text("ALTER TABLE words RENAME TO words_old"))
+    Word.__table__.create(conn)
+    conn.execute(text(f"INSERT INTO words ({columns}) SELECT {columns} FROM words_old"))
+    conn.execute(text("DROP TABLE words_old"))
+
+
+def _split_english_unique(conn):
+    """把 english 上的唯一约束换成 (deck_id, english)，返回是否做了改动"""
+    legacy = _legacy_english_unique(conn)
+    has_deck_unique = any(c['name'] == DECK_UNIQUE for c in inspect(conn).get_unique_constraints('words'))
+    if not legacy and has_deck_unique:
+        return False
+    if conn.dialect.name == 'sqlite':
+        _rebuild_words_sqlite(conn)
+        return True
+    for name in legacy:
+        conn.execute(text(f"ALTER TABLE words DROP INDEX {name}"))
+    if not has_deck_unique:
+        conn.execute(text(f"ALTER TABLE words ADD CONSTRAINT {DECK_UNIQUE} UNIQUE (deck_id, english)"))
+    return True
+
+
+def _create_missing_indexes(conn, model, done):
+    table = model.__tablename__
+    existing = {index['name'] for index in inspect(conn).get_indexes(table)}
+    for index in model.__table__.indexes:
+        if index.name not in existing:
+            index.create(conn)
+            conn.commit()
+            done.append(f'create index {index.name}')
+
+
+def upgrade(engine):
+    """执行全部迁移，返回做了哪些改动"""
+    done = []
+    db.metadata.create_all(engine)
+
+    with engine.connect() as conn:
+        columns = {c['name'] for c in inspect(conn).get_columns('words')}
+        if 'pending' not in columns:
+            _add_pending_column(conn)
+            conn.commit()
+            done.append('add column words.pending')
+            done.append(f'backfill words.pending: {_backfill_pending(conn)} rows')
+
+        if conn.execute(text("SELECT COUNT(*) FROM decks WHERE id = :id"), {'id': DEFAULT_DECK_ID}).scalar() == 0:
+            conn.execute(Deck.__table__.insert(), [{'id': DEFAULT_DECK_ID, 'name': '默认词库'}])
+            conn.commit()
+            done.append('create default deck')
+
+        for table in ('words', 'word_changes'):
+            if 'deck_id' not in {c['name'] for c in inspect(conn).get_columns(table)}:
+                _add_deck_column(conn, table)
+                conn.commit()
+                done.append(f'add column {table}.deck_id')
+
+        if 'lexeme_id' not in {c['name'] for c in inspect(conn).get_columns('words')}:
+            _add_lexeme_column(conn)
+            conn.commit()
+            done.append('add column words.lexeme_id')
+            done.append(f'import translation_cache into lexemes: {_import_translation_cache(conn)} rows')
+            done.append(f'backfill words.lexeme_id: {_backfill_lexemes(conn)} rows')
+
+        added = _add_retry_columns(conn, {c['name'] for c in inspect(conn).get_columns('words')})
+        if added:
+            conn.commit()
+            done.extend(f'add column words.{name}' for name in added)
+
+        if _split_english_unique(conn):
+            conn.commit()
+            done.append(f'replace unique words.english with {DECK_UNIQUE}')
+
+        existing = {index['name'] for index in inspect(conn).get_indexes('words')}
+        for name in OBSOLETE_INDEXES:
+            if name in existing:
+                conn.execute(text(f"DROP INDEX {name}" if conn.dialect.name == 'sqlite'
+                                  else f"ALTER TABLE words DROP INDEX {name}"))
+                conn.commit()
+                done.append(f'drop index {name}')
+
+        _create_missing_indexes(conn, Word, done)
+        _create_missing_indexes(conn, WordChange, done)
+    return done
+
+
+if __name__ == '__main__':
+    # 不导入 app.py，避免启动后台线程去查询还没迁移的表
+    from flask import Flask
+    from config import Config
+
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    db.init_app(app)
+    with app.app_context():
+        changes = upgrade(db.engine)
+    for change in changes or ['数据库已是最新，无需迁移']:
+        print(change)
@@ -1,15 +1,105 @@
 # models.py
+import unicodedata
+from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import insert
+from sqlalchemy.orm import validates
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 
 db = SQLAlchemy()
 
+# 新上传、尚未翻译的单词的占位中文
+PENDING_TRANSLATION = '待翻译...'
+# 不指定词库时使用的默认词库
+DEFAULT_DECK_ID = 1
+
+
+def insert_ignore(model, bind=None):
+    """
+    生成忽略唯一键冲突的 INSERT（MySQL: INSERT IGNORE，SQLite: ON CONFLICT DO NOTHING）。
+    不在 db.session 里执行（例如迁移脚本直接用连接）时传入 bind 判断方言
+    """
+    dialect = (bind if bind is not None else db.session.get_bind()).dialect.name
+    if dialect == 'mysql':
+        return mysql_insert(model).prefix_with('IGNORE')
+    if dialect == 'sqlite':
+        return sqlite_insert(model).on_conflict_do_nothing()
+    return insert(model)
+
+def collation_key(text):
+    """
+    近似 MySQL 默认排序规则（utf8mb4_general_ci / 0900_ai_ci）下的比较键：忽略大小写、重音和末尾空格。
+    在 Python 里去重时用它，数据库认为相同的字符串在这里也相同，不会撞唯一键
+    """
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return text.casefold().rstrip(' ')
+
+def _pending_default(context):
+    """INSERT 时根据 chinese 推出 pending，Core 批量插入也适用"""
+    return context.get_current_parameters().get('chinese') == PENDING_TRANSLATION
+
+class User(db.Model):
+    __tablename__ = 'users'
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(64), unique=True, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class Deck(db.Model):
+    """词库：一个班级或一个用户的一套单词，所有单词查询都限定在一个词库内"""
+    __tablename__ = 'decks'
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {'id': self.id, 'name': self.name, 'user_id': self.user_id}
+
+
 class Word(db.Model):
     __tablename__ = 'words'
+    __table_args__ = (
+        # 同一个词库内英文唯一，不同词库可以有相同的单词
+        db.UniqueConstraint('deck_id', 'english', name='uq_words_deck_english'),
+        # 翻译队列（跨词库）按 id 顺序扫描待翻译单词：WHERE pending = 1 AND id > ? ORDER BY id，
+        # 以及队列长度 WHERE pending = 1。不是覆盖索引：translate_attempts / next_attempt_at
+        # 在定位到的待翻译行上过滤，只多读 pending 的那一小部分行
+        db.Index('ix_words_pending_id', 'pending', 'id'),
+        # 词库内按熟悉程度过滤 / 分页，以及抽词时加载 (status, id)
+        db.Index('ix_words_deck_status_id', 'deck_id', 'status', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
-    english = db.Column(db.String(100), unique=True, nullable=False)
+    # 单列索引在 InnoDB / SQLite 中都隐含主键，即 (deck_id, id)，用于词库内的 keyset 分页
+    deck_id = db.Column(db.Integer, db.ForeignKey('decks.id'), nullable=False, default=DEFAULT_DECK_ID,
+                        server_default=str(DEFAULT_DECK_ID), index=True)
+    english = db.Column(db.String(100), nullable=False)
+    # 对应的全局词条；旧数据和直接插入的行可以为空，翻译时补上
+    lexeme_id = db.Column(db.Integer, db.ForeignKey('lexemes.id'), nullable=True, index=True)
+    # 词库里显示的释义：上传文件自带的中文，或翻译完成时从词条复制过来，列表查询不必 join 词典
     chinese = db.Column(db.String(255), nullable=True)
     # 熟悉程度: 0=未学, 1=模糊, 2=已掌握
     status = db.Column(db.Integer, default=0) 
+    # 是否待翻译（chinese 为占位文字）。ORM 修改 chinese 时自动同步；
+    # 用 Core UPDATE 批量改 chinese 的地方需要同时写 pending
+    pending = db.Column(db.Boolean, nullable=False, default=_pending_default, server_default=db.false())
+    # 后台翻译失败的次数和下次重试时间（指数退避），超过上限后不再自动重试
+    translate_attempts = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    next_attempt_at = db.Column(db.DateTime, nullable=True)
+    # 最近一次翻译失败的原因
+    translate_error = db.Column(db.String(255), nullable=True)
+
+    @validates('chinese')
+    def _sync_pending(self, key, value):
+        self.pending = value == PENDING_TRANSLATION
+        if self.pending:
+            # 重新标记为待翻译时重新计数
+            self.translate_attempts = 0
+            self.next_attempt_at = None
+            self.translate_error = None
+        return value
 
     def to_dict(self):
         return {
@@ -17,4 +107,57 @@ class Word(db.Model):
             'english': self.english,
             'chinese': self.chinese,
             'status': self.status
-        }
\ No newline at end of file
+        }
+
+
+def ensure_default_deck():
+    """默认词库不存在时创建；需要调用方提交事务"""
+    db.session.execute(insert_ignore(Deck), [{'id': DEFAULT_DECK_ID, 'name': '默认词库'}])
+
+class Lexeme(db.Model):
+    """
+    全局词典：每个归一化后的英文单词一行，所有词库共用。
+    模型翻译只在这里保存一份，各词库的单词通过 lexeme_id 指向它；
+    model / prompt_version 与当前配置不一致的翻译视为未翻译，会重新翻译。
+    """
+    __tablename__ = 'lexemes'
+    id = db.Column(db.Integer, primary_key=True)
+    # 归一化后的单词（小写、去首尾空白）
+    headword = db.Column(db.String(100), unique=True, nullable=False)
+    translation = db.Column(db.String(255), nullable=True)
+    model = db.Column(db.String(64), nullable=True)
+    prompt_version = db.Column(db.String(16), nullable=True)
+    translated_at = db.Column(db.DateTime, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class PooledSentence(db.Model):
+    """预先生成、等待下发的造句题目"""
+    __tablename__ = 'sentence_pool'
+    id = db.Column(db.Integer, primary_key=True)
+    chinese = db.Column(db.String(255), nullable=False)
+    answer = db.Column(db.String(500), nullable=False)
+    # 中文句子的哈希，用于去重
+    digest = db.Column(db.String(40), unique=True, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class VocabVersion(db.Model):
+    """词库版本号：单词每次增删改都加一，用作 /api/words 的 ETag"""
+    __tablename__ = 'vocab_version'
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+
+
+class WordChange(db.Model):
+    """单词变更日志：客户端按版本号增量同步"""
+    __tablename__ = 'word_changes'
+    __table_args__ = (
+        db.Index('ix_word_changes_deck_version', 'deck_id', 'version'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, index=True)
+    deck_id = db.Column(db.Integer, nullable=False, default=DEFAULT_DECK_ID, server_default=str(DEFAULT_DECK_ID))
+    word_id = db.Column(db.Integer, nullable=False)
+    # insert / update / delete
+    op = db.Column(db.String(8), nullable=False)
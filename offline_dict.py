@@ -0,0 +1,248 @@
+# offline_dict.py
+"""
+离线词典：常用单词直接查本地文件，不调用模型。
+
+文件格式（小端）：
+    魔数 b'VMDICT1\\0' | 词条数 n (uint32)
+    键偏移表   (n + 1) 个 uint32
+    释义偏移表 (n + 1) 个 uint32
+    键区：按 UTF-8 字节序排好的归一化单词首尾相接
+    释义区：对应的中文释义首尾相接
+
+文件用 mmap 只读映射，启动时不解析、不占用额外内存，多个进程共享同一份页缓存；
+查找在偏移表上二分，每次只比较 log2(n) 个键。
+
+用法：
+    python offline_dict.py build words.tsv -o instance/offline_dict.bin   # TSV：英文<Tab>中文
+    python offline_dict.py lookup instance/offline_dict.bin apple banana
+"""
+import argparse
+import mmap
+import os
+import struct
+import sys
+import threading
+from array import array
+from config import Config
+from services import MAX_TRANSLATION_LENGTH
+from translation_cache import normalize
+
+MAGIC = b'VMDICT1\0'
+HEADER = struct.Struct('<8sI')
+
+
+class OfflineDictFormatError(Exception):
+    pass
+
+
+def _offsets(items):
+    offsets = array('I', [0])
+    for item in items:
+        offsets.append(offsets[-1] + len(item))
+    return offsets
+
+
+def build(pairs, path):
+    """
+    把 (英文, 中文) 写成词典文件，同一个单词以第一次出现为准；返回词条数。
+    释义要写进 Word.chinese（255 字），与模型翻译的校验一样，超长的释义直接跳过。
+    """
+    entries = {}
+    too_long = 0
+    for english, chinese in pairs:
+        key = normalize(english)
+        chinese = (chinese or '').strip()
+        if len(chinese) > MAX_TRANSLATION_LENGTH:
+            too_long += 1
+            continue
+        if key and chinese and key not in entries:
+            entries[key] = chinese
+    if too_long:
+        print(f"跳过 {too_long} 个超过 {MAX_TRANSLATION_LENGTH} 字的释义")
+
+    keys = sorted(key.encode('utf-8') for key in entries)
+    values = [entries[key.decode('utf-8')].encode('utf-8') for key in keys]
+    key_offsets, value_offsets = _offsets(keys), _offsets(values)
+    if sys.byteorder != 'little':
+        key_offsets.byteswap()
+        value_offsets.byteswap()
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, len(keys)))
+        f.write(key_offsets.tobytes())
+        f.write(value_offsets.tobytes())
+        f.write(b''.join(keys))
+        f.write(b''.join(values))
+    # 先写临时文件再改名，正在映射旧文件的进程不受影响
+    os.replace(tmp_path, path)
+    return len(keys)
+
+
+def read_tsv(path):
+    """逐行读取 TSV（英文<Tab>中文），跳过空行、# 注释和没有释义的行"""
+    with open(path, encoding='utf-8-sig') as f:
+        for line in f:
+            if not line.strip() or line.startswith('#'):
+                continue
+            english, _, chinese = line.rstrip('\r\n').partition('\t')
+            if chinese.strip():
+                yield english, chinese
+
+
+class OfflineDictionary:
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mm) < HEADER.size:
+            raise OfflineDictFormatError(f'词典文件不完整: {path}')
+        magic, self._count = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise OfflineDictFormatError(f'不是离线词典文件: {path}')
+
+        table = (self._count + 1) * 4
+        start = HEADER.size
+        view = memoryview(self._mm)
+        if sys.byteorder == 'little':
+            # 直接在映射上按 uint32 读取，不拷贝偏移表
+            self._key_offsets = view[start:start + table].cast('I')
+            self._value_offsets = view[start + table:start + 2 * table].cast('I')
+        else:
+            self._key_offsets = array('I', view[start:start + table].tobytes())
+            self._value_offsets = array('I', view[start + table:start + 2 * table].tobytes())
+            self._key_offsets.byteswap()
+            self._value_offsets.byteswap()
+        self._keys_start = start + 2 * table
+        self._values_start = self._keys_start + self._key_offsets[self._count]
+
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return self._count
+
+    def _key(self, i):
+        return self._mm[self._keys_start + self._key_offsets[i]:self._keys_start + self._key_offsets[i + 1]]
+
+    def _find(self, key):
+        target = key.encode('utf-8')
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(mid) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self._count and self._key(lo) == target:
+            return lo
+        return None
+
+    def get(self, word):
+        """查一个单词（先归一化），没有时返回 None"""
+        key = normalize(word)
+        i = self._find(key) if key else None
+        with self._lock:
+            if i is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        start = self._values_start + self._value_offsets[i]
+        return self._mm[start:self._values_start + self._value_offsets[i + 1]].decode('utf-8')
+
+    def __contains__(self, word):
+        key = normalize(word)
+        return bool(key) and self._find(key) is not None
+
+    def lookup_many(self, words):
+        """批量查找，返回 {原单词: 释义}，只包含查到的单词"""
+        result = {}
+        for word in words:
+            translation = self.get(word)
+            if translation is not None:
+                result[word] = translation
+        return result
+
+    def close(self):
+        # 先释放映射上的 memoryview，否则 mmap 不能关闭
+        for offsets in (self._key_offsets, self._value_offsets):
+            if isinstance(offsets, memoryview):
+                offsets.release()
+        self._mm.close()
+
+    def stats(self):
+        with self._lock:
+            return {'path': self.path, 'entries': self._count, 'hits': self.hits, 'misses': self.misses}
+
+
+# 进程内共享的词典；第一次使用时按 Config.OFFLINE_DICT_PATH 加载，没有配置时不启用
+_dictionary = None
+_loaded = False
+_load_lock = threading.Lock()
+
+
+def load(path):
+    """加载（或替换）进程内使用的词典；path 为空时停用"""
+    global _dictionary, _loaded
+    dictionary = OfflineDictionary(path) if path else None
+    with _load_lock:
+        _dictionary, _loaded = dictionary, True
+    return dictionary
+
+
+def get_dictionary():
+    global _dictionary, _loaded
+    with _load_lock:
+        if _loaded:
+            return _dictionary
+        _loaded = True
+        path = Config.OFFLINE_DICT_PATH
+        if path:
+            try:
+                _dictionary = OfflineDictionary(path)
+            except (OSError, ValueError, OfflineDictFormatError) as e:
+                print(f"离线词典加载失败，已停用: {e}")
+        return _dictionary
+
+
+def lookup_many(words):
+    """离线词典里查到的单词，返回 {原单词: 释义}；没有启用词典时返回空字典"""
+    dictionary = get_dictionary()
+    return dictionary.lookup_many(words) if dictionary is not None and words else {}
+
+
+def lookup(word):
+    return lookup_many([word]).get(word)
+
+
+def stats():
+    dictionary = get_dictionary()
+    return dictionary.stats() if dictionary is not None else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+    build_parser = commands.add_parser('build', help='从 TSV 生成词典文件')
+    build_parser.add_argument('tsv')
+    build_parser.add_argument('-o', '--output', default=Config.OFFLINE_DICT_PATH or 'instance/offline_dict.bin')
+    lookup_parser = commands.add_parser('lookup', help='查询词典文件')
+    lookup_parser.add_argument('path')
+    lookup_parser.add_argument('words', nargs='+')
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        count = build(read_tsv(args.tsv), args.output)
+        print(f'已写入 {count} 个词条: {args.output}')
+    else:
+        dictionary = OfflineDictionary(args.path)
+        for word in args.words:
+            print(f'{word}\t{dictionary.get(word) or "-"}')
+        dictionary.close()
+
+
+if __name__ == '__main__':
+    main()
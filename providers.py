@@ -0,0 +1,427 @@
+# providers.py
+"""
+大模型服务商注册表：可以配置多个 OpenAI 兼容的 chat completions 接口，每次调用路由到最快的健康服务商。
+
+- 每个服务商按 EWMA 跟踪响应延迟和错误率；错误率超过 MAX_ERROR_RATE 的服务商暂时不用，
+  最近一次失败 UNHEALTHY_COOLDOWN 秒后再放请求试探（所有服务商都不健康时仍按排序选第一个）
+- 每个服务商有自己的限流器和熔断器（llm_client.Gate）：一个服务商熔断时排到最后，
+  在它那里本地快速失败（熔断、排队超时）的请求改发给下一个服务商
+- 还没有调用记录的服务商排在最前，先拿到一份延迟数据
+- 对冲（可选）：交互请求超过该服务商 p95 延迟还没返回时，向排第二的健康服务商
+  （只有一个时向同一个）再发一次，用先成功返回的结果；流式请求和后台批量任务不对冲
+- 返回的响应上附带 served_model：实际生成回答的模型（服务商配置的 model 覆盖请求里的）
+- type 为 stub 的服务商不发网络请求，按提示词在本地生成格式正确的假数据，用于本地开发和测试
+
+环境变量 LLM_PROVIDERS（JSON 数组）配置服务商，不配置时只用 DeepSeek：
+    [{"name": "deepseek", "base_url": "https://api.deepseek.com", "api_key_env": "DEEPSEEK_API_KEY",
+      "model": "deepseek-chat"},
+     {"name": "siliconflow", "base_url": "https://api.siliconflow.cn", "api_key_env": "SILICONFLOW_API_KEY",
+      "model": "deepseek-ai/DeepSeek-V3"},
+     {"name": "stub", "type": "stub", "delay": 0.05}]
+"""
+import asyncio
+import contextvars
+import itertools
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+from concurrent import futures
+
+import llm_client
+import rate_limit
+from circuit_breaker import CircuitOpen, OPEN
+
+# EWMA 平滑系数：越大越看重最近的调用
+EWMA_ALPHA = 0.2
+# 错误率（EWMA）超过该值的服务商暂时不参与路由
+MAX_ERROR_RATE = 0.5
+# 不健康的服务商最近一次失败多少秒后再试探
+UNHEALTHY_COOLDOWN = 30.0
+# 计算 p95 用的最近成功调用的样本数，以及开始对冲前至少需要的样本数
+LATENCY_WINDOW = 100
+HEDGE_MIN_SAMPLES = 20
+
+# 本地产生的失败（熔断、排队超时）与服务商无关，不计入它的错误率
+LOCAL_ERRORS = (CircuitOpen, rate_limit.RateLimitTimeout)
+
+
+def _ok(response):
+    status = getattr(response, 'status_code', None)
+    return isinstance(status, int) and status < 400
+
+
+class Provider:
+    """一个 OpenAI 兼容的接口，以及它的延迟和错误率统计"""
+
+    def __init__(self, name, base_url, api_key='', model=None):
+        self.name = name
+        self.base_url = base_url.rstrip('/')
+        self.api_key = api_key or ''
+        self.model = model
+        self._lock = threading.Lock()
+        self.latency = None  # 成功调用的延迟 EWMA（秒），没有记录时为 None
+        self.error_rate = 0.0
+        self.calls = 0
+        self.errors = 0
+        self._failed_at = None
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self.gate = llm_client.Gate()
+
+    @property
+    def url(self):
+        return f"{self.base_url}/v1/chat/completions"
+
+    def _request(self, payload, timeout):
+        if self.model:
+            payload = dict(payload, model=self.model)
+        return dict(
+            headers={
+                "Authorization": f"Bearer {self.api_key}",
+                "Content-Type": "application/json"
+            },
+            json=payload,
+            timeout=timeout
+        )
+
+    def served_model(self, payload):
+        """实际生成回答的模型：服务商配置了 model 时覆盖请求里的"""
+        return self.model or payload.get('model')
+
+    def post(self, payload, timeout, stream=False):
+        return llm_client.post(self.url, gate=self.gate, stream=stream, **self._request(payload, timeout))
+
+    async def apost(self, payload, timeout):
+        return await llm_client.apost(self.url, gate=self.gate, **self._request(payload, timeout))
+
+    def record(self, elapsed, ok):
+        with self._lock:
+            self.calls += 1
+            if ok:
+                self._latencies.append(elapsed)
+                self.latency = elapsed if self.latency is None else \
+                    self.latency + EWMA_ALPHA * (elapsed - self.latency)
+            else:
+                self.errors += 1
+                self._failed_at = time.monotonic()
+            self.error_rate += EWMA_ALPHA * ((0.0 if ok else 1.0) - self.error_rate)
+
+    def _healthy(self, now):
+        if self.gate.breaker.state == OPEN:
+            return False
+        return self.error_rate <= MAX_ERROR_RATE or self._failed_at is None \
+            or now - self._failed_at >= UNHEALTHY_COOLDOWN
+
+    def healthy(self, now=None):
+        with self._lock:
+            return self._healthy(time.monotonic() if now is None else now)
+
+    def rank_key(self, now):
+        """健康的在前；其中没有记录的在前，其余按延迟 EWMA 从小到大"""
+        with self._lock:
+            return (not self._healthy(now), self.latency is not None, self.latency or 0.0)
+
+    def p95(self):
+        """最近成功调用的 p95 延迟（秒）；样本不足时返回 None"""
+        with self._lock:
+            if len(self._latencies) < HEDGE_MIN_SAMPLES:
+                return None
+            samples = sorted(self._latencies)
+        return samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+
+    def stats(self, now):
+        p95 = self.p95()
+        with self._lock:
+            return {
+                'name': self.name,
+                'base_url': self.base_url,
+                'model': self.model,
+                'calls': self.calls,
+                'errors': self.errors,
+                'latency_ms': round(self.latency * 1000, 1) if self.latency is not None else None,
+                'p95_ms': round(p95 * 1000, 1) if p95 is not None else None,
+                'error_rate': round(self.error_rate, 3),
+                'healthy': self._healthy(now),
+                **self.gate.stats()
+            }
+
+
+class StubResponse:
+    """本地假响应：提供 services 用到的 requests / httpx 响应属性"""
+
+    def __init__(self, content):
+        self.status_code = 200
+        self.headers = {}
+        self.content = content
+        self.elapsed_ms = 0.0
+        self.connection_reused = True
+
+    def json(self):
+        return {"choices": [{"message": {"role": "assistant", "content": self.content}}]}
+
+    @property
+    def text(self):
+        return json.dumps(self.json(), ensure_ascii=False)
+
+    def iter_lines(self, decode_unicode=False):
+        for start in range(0, len(self.content), 16):
+            chunk = {"choices": [{"delta": {"content": self.content[start:start + 16]}}]}
+            yield "data: " + json.dumps(chunk, ensure_ascii=False)
+        yield "data: [DONE]"
+
+    def close(self):
+        pass
+
+
+class StubProvider(Provider):
+    """本地假服务商：不发网络请求，也不经过自己的限流器和熔断器；delay 秒后返回"""
+
+    def __init__(self, name='stub', delay=0.0, model=None):
+        super().__init__(name, 'stub://local', 'stub', model)
+        self.delay = delay
+        self._counter = itertools.count(1)
+
+    def post(self, payload, timeout, stream=False):
+        if self.delay:
+            time.sleep(self.delay)
+        return StubResponse(self.reply(payload))
+
+    async def apost(self, payload, timeout):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return StubResponse(self.reply(payload))
+
+    def reply(self, payload):
+        """按提示词类型（批量翻译、故事、造句、单词翻译）生成内容"""
+        messages = payload.get("messages") or [{}]
+        system = messages[0].get("content", "")
+        user = messages[-1].get("content", "")
+        n = next(self._counter)
+
+        if "故事" in system:
+            words = [w.strip() for w in user.split(":", 1)[-1].split(",") if w.strip()]
+            bolded = ", ".join(f"<b>{w}</b>" for w in words)
+            return f"Story #{n}: one day {bolded} went on a small adventure together."
+        if "句子" in system:
+            if "JSON数组" in system:
+                match = re.search(r"\d+", user)
+                count = int(match.group()) if match else 1
+                items = [{"chinese": f"这是第{n}-{i}个句子。", "answer": f"This is sentence {n}-{i}."}
+                         for i in range(count)]
+                return json.dumps(items, ensure_ascii=False)
+            return json.dumps({"chinese": f"这是第{n}个句子。", "answer": f"This is sentence {n}."},
+                              ensure_ascii=False)
+        try:
+            words = json.loads(user)
+        except ValueError:
+            words = None
+        if isinstance(words, list):
+            return json.dumps({w: f"{w}的释义" for w in words}, ensure_ascii=False)
+        return f"{user}的释义"
+
+
+class ProviderRegistry:
+
+    def __init__(self, providers, hedge=False):
+        if not providers:
+            raise ValueError("至少需要配置一个大模型服务商")
+        self.providers = list(providers)
+        self.hedge = hedge
+        self._lock = threading.Lock()
+        self._executor = None
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    @property
+    def api_key(self):
+        """第一个配置了密钥的服务商的密钥，都没有时为空"""
+        return next((p.api_key for p in self.providers if p.api_key), '')
+
+    def ranked(self):
+        now = time.monotonic()
+        # 排序是稳定的：条件相同时保持配置里的顺序
+        return sorted(self.providers, key=lambda p: p.rank_key(now))
+
+    def _route(self, stream=False):
+        """返回 (排好序的服务商, 对冲用的服务商, 对冲等待秒数)；不对冲时后两项为 None"""
+        ranked = self.ranked()
+        primary = ranked[0]
+        if not self.hedge or stream or rate_limit.current_priority() != rate_limit.INTERACTIVE:
+            return ranked, None, None
+        deadline = primary.p95()
+        if deadline is None:
+            return ranked, None, None
+        backup = ranked[1] if len(ranked) > 1 and ranked[1].healthy() else primary
+        return ranked, backup, deadline
+
+    def _count_hedge(self, won):
+        with self._lock:
+            if won:
+                self.hedge_wins += 1
+            else:
+                self.hedged += 1
+
+    def _call(self, provider, payload, timeout, stream=False):
+        started = time.perf_counter()
+        try:
+            response = provider.post(payload, timeout, stream)
+        except LOCAL_ERRORS:
+            raise
+        except Exception:
+            provider.record(time.perf_counter() - started, False)
+            raise
+        provider.record(time.perf_counter() - started, _ok(response))
+        response.served_model = provider.served_model(payload)
+        return response
+
+    async def _acall(self, provider, payload, timeout):
+        started = time.perf_counter()
+        try:
+            response = await provider.apost(payload, timeout)
+        except LOCAL_ERRORS:
+            raise
+        except Exception:
+            provider.record(time.perf_counter() - started, False)
+            raise
+        provider.record(time.perf_counter() - started, _ok(response))
+        response.served_model = provider.served_model(payload)
+        return response
+
+    def _failover(self, ranked, payload, timeout, stream=False):
+        """按顺序调用，某个服务商本地快速失败（熔断、排队超时）时换下一个；都失败时抛出最后一个错误"""
+        for provider in ranked[:-1]:
+            try:
+                return self._call(provider, payload, timeout, stream)
+            except LOCAL_ERRORS as e:
+                print(f"大模型服务商 {provider.name} 暂时不可用（{type(e).__name__}），改用下一个")
+        return self._call(ranked[-1], payload, timeout, stream)
+
+    async def _afailover(self, ranked, payload, timeout):
+        for provider in ranked[:-1]:
+            try:
+                return await self._acall(provider, payload, timeout)
+            except LOCAL_ERRORS as e:
+                print(f"大模型服务商 {provider.name} 暂时不可用（{type(e).__name__}），改用下一个")
+        return await self._acall(ranked[-1], payload, timeout)
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = futures.ThreadPoolExecutor(
+                    max_workers=2 * llm_client.POOL_MAXSIZE, thread_name_prefix='llm-hedge'
+                )
+            return self._executor
+
+    def post_chat(self, payload, timeout, stream=False):
+        """同步调用 chat completions；返回 requests 响应（stub 服务商返回 StubResponse）"""
+        ranked, backup, deadline = self._route(stream)
+        if backup is None:
+            return self._failover(ranked, payload, timeout, stream)
+        primary = ranked[0]
+
+        pool = self._pool()
+        first = pool.submit(contextvars.copy_context().run, self._call, primary, payload, timeout)
+        done, _ = futures.wait([first], timeout=deadline)
+        if done:
+            return first.result()
+
+        self._count_hedge(False)
+        second = pool.submit(contextvars.copy_context().run, self._call, backup, payload, timeout)
+        pending = {first, second}
+        fallback, error = None, None
+        while pending:
+            done, pending = futures.wait(pending, return_when=futures.FIRST_COMPLETED)
+            for future in done:
+                try:
+                    response = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+                if _ok(response):
+                    if future is second:
+                        self._count_hedge(True)
+                    for other in (first, second):
+                        if other is not future:
+                            other.add_done_callback(_discard)
+                    return response
+                fallback = fallback or response
+        if fallback is not None:
+            return fallback
+        raise error
+
+    async def apost_chat(self, payload, timeout):
+        """post_chat 的异步版本；对冲输掉的请求直接取消"""
+        ranked, backup, deadline = self._route()
+        if backup is None:
+            return await self._afailover(ranked, payload, timeout)
+        primary = ranked[0]
+
+        first = asyncio.ensure_future(self._acall(primary, payload, timeout))
+        done, _ = await asyncio.wait({first}, timeout=deadline)
+        if done:
+            return first.result()
+
+        self._count_hedge(False)
+        second = asyncio.ensure_future(self._acall(backup, payload, timeout))
+        pending = {first, second}
+        fallback, error = None, None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                        continue
+                    response = task.result()
+                    if _ok(response):
+                        if task is second:
+                            self._count_hedge(True)
+                        return response
+                    fallback = fallback or response
+        finally:
+            for task in pending:
+                task.cancel()
+        if fallback is not None:
+            return fallback
+        raise error
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            result = {'hedge': self.hedge, 'hedged': self.hedged, 'hedge_wins': self.hedge_wins}
+        result['providers'] = [p.stats(now) for p in self.ranked()]
+        return result
+
+
+def _discard(future):
+    """对冲输掉的同步请求：返回后关闭响应，把连接还给连接池"""
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
+def _build_provider(item):
+    item = dict(item)
+    kind = item.get('type', 'openai')
+    if kind == 'stub':
+        return StubProvider(item.get('name', 'stub'), float(item.get('delay', 0)), item.get('model'))
+    if kind != 'openai':
+        raise ValueError(f"未知的大模型服务商类型: {kind}")
+    if not item.get('base_url'):
+        raise ValueError(f"大模型服务商缺少 base_url: {item}")
+    api_key = item.get('api_key') or os.getenv(item.get('api_key_env') or '', '')
+    return Provider(item.get('name') or item['base_url'], item['base_url'], api_key, item.get('model'))
+
+
+def create_registry(spec, default, hedge=False):
+    """spec 为 LLM_PROVIDERS 的 JSON 字符串，为空时只用 default 描述的服务商"""
+    if not spec:
+        return ProviderRegistry([_build_provider(default)], hedge)
+    try:
+        items = json.loads(spec)
+    except ValueError as e:
+        raise ValueError(f"LLM_PROVIDERS 不是合法的 JSON: {e}")
+    if isinstance(items, dict):
+        items = [items]
+    return ProviderRegistry([_build_provider(item) for item in items], hedge)
@@ -0,0 +1,183 @@
+# rate_limit.py
+"""
+大模型调用的客户端限流：翻译、故事、造句共用一个限流器。
+
+- 令牌桶限制每秒请求数，允许短时突发
+- 并发上限按 AIMD 自适应：每次成功加性增大，遇到 429 / 503 减半，
+  在服务商的限额附近来回试探，既把吞吐推到上限又不长时间越过它
+- 响应带 Retry-After 时，在这段时间内所有调用都暂停
+- 两个优先级：交互请求（故事、造句、手动翻译）排队时，后台批量任务让出令牌，
+  且批量任务最多占用 bulk_share 比例的并发，给交互请求留出余量
+"""
+import contextvars
+import math
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+
+INTERACTIVE = 0
+BULK = 1
+
+# 这些状态码说明服务商已经过载，需要降速
+THROTTLE_STATUS_CODES = (429, 503)
+# 没有 Retry-After 时，遇到限流后暂停的秒数
+DEFAULT_BACKOFF = 1.0
+MAX_RETRY_AFTER = 60.0
+# 一次限流只减半一次：同一批在途请求接连返回 429 时不重复减半
+DECREASE_COOLDOWN = 1.0
+
+_priority = contextvars.ContextVar('llm_priority', default=INTERACTIVE)
+
+
+class RateLimitTimeout(Exception):
+    """等待限流器放行超时"""
+
+
+def current_priority():
+    return _priority.get()
+
+
+@contextmanager
+def bulk():
+    """在 with 块内发出的模型调用按后台批量任务排队"""
+    token = _priority.set(BULK)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def parse_retry_after(value, now=None):
+    """解析 Retry-After（秒数或 HTTP 日期），返回需要等待的秒数；无法解析时返回 None"""
+    if not value or not isinstance(value, str):
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = parsedate_to_datetime(value).timestamp() - (now or time.time())
+        except (TypeError, ValueError):
+            return None
+    return min(max(seconds, 0.0), MAX_RETRY_AFTER)
+
+
+class AdaptiveLimiter:
+
+    def __init__(self, rate=10.0, burst=10, initial_concurrency=4, max_concurrency=20,
+                 min_rate=0.5, bulk_share=0.75):
+        # rate <= 0 表示不限制每秒请求数，只做并发控制
+        self.max_rate = float(rate)
+        self.min_rate = min(float(min_rate), self.max_rate) if rate > 0 else 0.0
+        self.rate = self.max_rate
+        self.burst = max(1, burst)
+        self.max_concurrency = max(1, max_concurrency)
+        self.limit = float(min(max(1, initial_concurrency), self.max_concurrency))
+        self.bulk_share = bulk_share
+
+        self._cond = threading.Condition()
+        self._tokens = float(self.burst)
+        self._refilled_at = time.monotonic()
+        self._blocked_until = 0.0
+        self._last_decrease = 0.0
+        self._waiting = {INTERACTIVE: 0, BULK: 0}
+        self.in_flight = 0
+        self._stats = {'acquired': 0, 'timeouts': 0, 'throttled': 0, 'retry_after_waits': 0}
+
+    def _slots(self, priority):
+        limit = int(self.limit)
+        if priority == BULK:
+            return max(1, math.floor(limit * self.bulk_share))
+        return limit
+
+    def _refill(self, now):
+        if self.rate > 0:
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def _admit_delay(self, priority, now):
+        """返回 0 表示可以放行；否则返回建议等待的秒数（None 表示等别的调用释放）"""
+        if now < self._blocked_until:
+            return self._blocked_until - now
+        if priority == BULK and self._waiting[INTERACTIVE]:
+            return None
+        if self.in_flight >= self._slots(priority):
+            return None
+        if self.rate > 0:
+            self._refill(now)
+            if self._tokens < 1:
+                return (1 - self._tokens) / self.rate
+        return 0
+
+    def acquire(self, priority=INTERACTIVE, timeout=None):
+        """等待放行；超时抛出 RateLimitTimeout。放行后必须调用 release()"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._waiting[priority] += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    delay = self._admit_delay(priority, now)
+                    if delay == 0:
+                        if self.rate > 0:
+                            self._tokens -= 1
+                        self.in_flight += 1
+                        self._stats['acquired'] += 1
+                        return
+                    if deadline is not None and now >= deadline:
+                        self._stats['timeouts'] += 1
+                        raise RateLimitTimeout('等待大模型调用配额超时')
+                    wait = 1.0 if delay is None else delay
+                    if deadline is not None:
+                        wait = min(wait, deadline - now)
+                    self._cond.wait(wait)
+            finally:
+                self._waiting[priority] -= 1
+                # 交互请求不再排队时，唤醒被它挡住的批量任务
+                self._cond.notify_all()
+
+    def release(self, status=None, retry_after=None):
+        """调用结束：按响应状态调整速率和并发上限。status 为 None 表示请求没有得到响应"""
+        with self._cond:
+            self.in_flight = max(0, self.in_flight - 1)
+            now = time.monotonic()
+            if status in THROTTLE_STATUS_CODES:
+                self._on_throttle(now, parse_retry_after(retry_after))
+            elif status is not None and status < 500:
+                self._on_success()
+            self._cond.notify_all()
+
+    def _on_success(self):
+        # 加性增：大约每完成 limit 个请求，并发上限加 1；速率同理
+        self.limit = min(self.max_concurrency, self.limit + 1.0 / self.limit)
+        if self.rate > 0:
+            self.rate = min(self.max_rate, self.rate + 1.0 / self.rate)
+
+    def _on_throttle(self, now, retry_after):
+        self._stats['throttled'] += 1
+        if retry_after is not None:
+            self._stats['retry_after_waits'] += 1
+        pause = DEFAULT_BACKOFF if retry_after is None else retry_after
+        self._blocked_until = max(self._blocked_until, now + pause)
+        if now - self._last_decrease < DECREASE_COOLDOWN:
+            return
+        # 乘性减
+        self._last_decrease = now
+        self.limit = max(1.0, self.limit / 2)
+        if self.rate > 0:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._tokens = min(self._tokens, 1.0)
+
+    def stats(self):
+        with self._cond:
+            return dict(
+                self._stats,
+                rate=round(self.rate, 2),
+                max_rate=self.max_rate,
+                concurrency_limit=round(self.limit, 2),
+                max_concurrency=self.max_concurrency,
+                in_flight=self.in_flight,
+                waiting_interactive=self._waiting[INTERACTIVE],
+                waiting_bulk=self._waiting[BULK],
+                paused_for=round(max(0.0, self._blocked_until - time.monotonic()), 2)
+            )
@@ -0,0 +1,130 @@
+# sampling.py
+"""
+随机抽词：取代 ORDER BY RAND()（每次都要全表扫描 + 排序）。
+进程内按词库、熟悉程度分组保存单词 id，词库版本号变化时查变更日志，
+只有增删单词或熟悉程度改变时才重新加载（翻译写回等其它修改不影响抽词）；
+每次抽 k 个只需 O(k) 次随机选择，再按主键取回这 k 个单词。
+"""
+import random
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from sqlalchemy import select
+from models import db, Word, DEFAULT_DECK_ID
+from versioning import changes_since, current_version
+
+# 熟悉程度 -> 抽中权重：未学的单词更容易被抽到
+DEFAULT_STATUS_WEIGHTS = {0: 3, 1: 2, 2: 1}
+# 两次抽词之间修改过的单词超过这么多个时不再逐个核对熟悉程度，直接重新加载
+MAX_CHECKED_UPDATES = 1000
+
+
+def _contains(ids, word_id):
+    """ids 按 id 升序加载，二分查找"""
+    if not ids:
+        return False
+    i = bisect_left(ids, word_id)
+    return i < len(ids) and ids[i] == word_id
+
+
+class WordSampler:
+
+    def __init__(self, weights=None, max_age=300.0):
+        self.weights = dict(DEFAULT_STATUS_WEIGHTS if weights is None else weights)
+        # 兜底：绕过版本号直接改库时，最多这么久后也会重新加载
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        # 词库 id -> (熟悉程度 -> 升序的 array of id, 核对到的版本号, 加载时间)；用到哪个词库才加载哪个
+        self._decks = {}
+        self.reloads = 0
+
+    def _load(self, deck_id, version):
+        groups = {}
+        rows = db.session.execute(select(Word.id, Word.status).where(Word.deck_id == deck_id).order_by(Word.id))
+        for row in rows:
+            groups.setdefault(row.status or 0, array('q')).append(row.id)
+        with self._lock:
+            self._decks[deck_id] = (groups, version, time.time())
+            self.reloads += 1
+        return groups
+
+    def _membership_changed(self, groups, changes):
+        """变更里有没有影响抽词的：增删单词，或者单词换了熟悉程度"""
+        if changes['full_resync'] or changes['deleted'] or 'insert' in changes['upserted'].values():
+            return True
+        updated = list(changes['upserted'])
+        if not updated:
+            return False
+        if len(updated) > MAX_CHECKED_UPDATES:
+            return True
+        rows = db.session.execute(select(Word.id, Word.status).where(Word.id.in_(updated))).all()
+        return len(rows) < len(updated) or any(not _contains(groups.get(row.status or 0), row.id) for row in rows)
+
+    def _groups(self, deck_id, force=False):
+        with self._lock:
+            cached = self._decks.get(deck_id)
+        if force or cached is None or time.time() - cached[2] > self.max_age:
+            return self._load(deck_id, current_version())
+        groups, version, loaded_at = cached
+        changes = changes_since(version, deck_id)
+        if changes['version'] == version:
+            return groups
+        if self._membership_changed(groups, changes):
+            return self._load(deck_id, changes['version'])
+        with self._lock:
+            self._decks[deck_id] = (groups, changes['version'], loaded_at)
+        return groups
+
+    def sample_ids(self, k, deck_id=DEFAULT_DECK_ID):
+        """按权重从词库里不放回地抽 k 个 id；单词总数不超过 k 时返回全部"""
+        all_groups = self._groups(deck_id)
+        groups = [(self.weights.get(status, 1) * len(ids), ids) for status, ids in all_groups.items() if ids]
+        total = sum(len(ids) for _, ids in groups)
+        if k >= total:
+            return [word_id for _, ids in groups for word_id in ids]
+
+        groups = [(weight, ids) for weight, ids in groups if weight > 0]
+        total_weight = sum(weight for weight, _ in groups)
+        chosen = set()
+        attempts = 0
+        # 先按组的总权重选组，再在组内均匀选一个；抽到重复的就重抽
+        while groups and len(chosen) < k and attempts < k * 20:
+            attempts += 1
+            r = random.random() * total_weight
+            for weight, ids in groups:
+                r -= weight
+                if r < 0:
+                    break
+            chosen.add(ids[random.randrange(len(ids))])
+
+        if len(chosen) < k:
+            # k 接近单词总数（或权重全为 0）时重抽效率太低，剩下的直接从未选中的单词里补
+            rest = [i for ids in all_groups.values() for i in ids if i not in chosen]
+            chosen.update(random.sample(rest, min(k - len(chosen), len(rest))))
+        return list(chosen)
+
+    def sample_words(self, k, deck_id=DEFAULT_DECK_ID):
+        """从词库里随机抽 k 个单词，返回英文列表"""
+        for attempt in range(2):
+            ids = self.sample_ids(k, deck_id)
+            rows = db.session.execute(select(Word.english).where(Word.id.in_(ids))).all() if ids else []
+            if (rows and len(rows) == len(ids)) or attempt:
+                break
+            # 抽到的单词已被删除、或缓存里一个单词都没有，而版本号没变（例如绕过接口直接改库），
+            # 强制重新加载后再抽一次；词库为空时这次加载也几乎没有开销
+            self._groups(deck_id, force=True)
+        words = [row.english for row in rows]
+        random.shuffle(words)
+        return words
+
+    def stats(self):
+        with self._lock:
+            return {
+                'decks': {
+                    deck_id: {'version': version, 'words': {status: len(ids) for status, ids in groups.items()}}
+                    for deck_id, (groups, version, _) in self._decks.items()
+                },
+                'weights': self.weights,
+                'reloads': self.reloads
+            }
@@ -0,0 +1,107 @@
+# sentence_pool.py
+"""造句题目预生成池：数据库里常备 N 道题，请求直接取用，后台线程按批补充"""
+import hashlib
+import threading
+from sqlalchemy import delete, func, select
+from background import BackgroundWorker
+from dedup_store import MemoryDedupStore
+from models import db, PooledSentence, insert_ignore
+from services import generate_sentence_challenges
+
+def sentence_digest(chinese):
+    """句子去掉空白后的 sha1，用于判断重复"""
+    return hashlib.sha1(''.join(chinese.split()).encode('utf-8')).hexdigest()
+
+
+class SentencePool(BackgroundWorker):
+    """
+    - take()：取出最早生成的一道题并从池中删除，池空时返回 None
+    - run_once()：池中题目不足 size 时，一次请求生成 batch_size 道题补充
+    新题会与池中已有的、以及 dedup_store 中记录的已下发句子去重。
+    """
+    name = 'sentence-pool'
+
+    def __init__(self, app, size=20, batch_size=5, interval=30.0, dedup_store=None):
+        super().__init__(interval)
+        self.app = app
+        self.size = size
+        self.batch_size = batch_size
+        # 已下发句子的哈希，可与实时生成路径、其它 worker 进程共享
+        self.dedup_store = dedup_store if dedup_store is not None else MemoryDedupStore()
+        self._lock = threading.Lock()
+        self.served_total = 0
+        self.generated_total = 0
+        self.duplicates_dropped = 0
+        self.refills = 0
+
+    def ready_count(self):
+        return db.session.execute(select(func.count()).select_from(PooledSentence)).scalar()
+
+    def take(self):
+        """取出一道题；多个进程同时取同一行时，删除失败的一方换下一行重试"""
+        for _ in range(3):
+            row = db.session.execute(
+                select(PooledSentence.id, PooledSentence.chinese, PooledSentence.answer, PooledSentence.digest)
+                .order_by(PooledSentence.id)
+                .limit(1)
+            ).first()
+            if row is None:
+                break
+            deleted = db.session.execute(delete(PooledSentence).where(PooledSentence.id == row.id)).rowcount
+            db.session.commit()
+            if deleted:
+                self.dedup_store.add(row.digest)
+                with self._lock:
+                    self.served_total += 1
+                if self.ready_count() < self.size // 2:
+                    self.wake()
+                return {'chinese': row.chinese, 'answer': row.answer}
+
+        # 池空了，让后台尽快补充
+        self.wake()
+        return None
+
+    def run_once(self):
+        """补充一批，返回池是否仍未补满（且本轮有进展）"""
+        with self.app.app_context():
+            before = self.ready_count()
+            missing = self.size - before
+            if missing <= 0:
+                return False
+
+            challenges = generate_sentence_challenges(min(self.batch_size, missing))
+            rows = {}
+            for item in challenges:
+                if len(item['chinese']) > 255 or len(item['answer']) > 500:
+                    continue
+                digest = sentence_digest(item['chinese'])
+                if digest in rows or digest in self.dedup_store:
+                    continue
+                rows[digest] = {'chinese': item['chinese'], 'answer': item['answer'], 'digest': digest}
+
+            if rows:
+                # 与池中已有句子重复的由唯一键忽略
+                db.session.execute(insert_ignore(PooledSentence), list(rows.values()))
+                db.session.commit()
+            added = self.ready_count() - before
+
+        with self._lock:
+            self.refills += 1
+            self.generated_total += len(challenges)
+            self.duplicates_dropped += len(challenges) - max(added, 0)
+        return added > 0 and added < missing
+
+    def stats(self):
+        with self.app.app_context():
+            ready = self.ready_count()
+        with self._lock:
+            return {
+                'running': self.running,
+                'ready': ready,
+                'size': self.size,
+                'served_total': self.served_total,
+                'generated_total': self.generated_total,
+                'duplicates_dropped': self.duplicates_dropped,
+                'refills': self.refills,
+                'last_error': self.last_error
+            }
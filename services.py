@@ -1,149 +1,544 @@
 # services.py
 import os
+import re
 import json
+import unicodedata
 from config import Config
-
-# 直接使用底层http客户端，绕过OpenAI客户端的proxies问题
-import requests
+from singleflight import create_singleflight
+# 直接使用底层http客户端，绕过OpenAI客户端的proxies问题；所有调用共用 llm_client 的连接池
+from providers import create_registry
 
 API_KEY = os.getenv("DEEPSEEK_API_KEY", Config.DEEPSEEK_API_KEY)
-#"https://api.siliconflow.cn/v1"
 BASE_URL = "https://api.deepseek.com"
 MODEL_NAME = "deepseek-chat"
 
+# 大模型服务商：默认只用 DeepSeek；LLM_PROVIDERS 可以配置多个 OpenAI 兼容接口（见 providers.py），
+# 每次调用路由到延迟最低的健康服务商
+provider_registry = create_registry(
+    Config.LLM_PROVIDERS,
+    default={"name": "deepseek", "base_url": BASE_URL, "api_key": API_KEY, "model": MODEL_NAME},
+    hedge=Config.LLM_HEDGE_ENABLED
+)
+# 通过 LLM_PROVIDERS 配置了其它服务商时，可以不设 DEEPSEEK_API_KEY
+API_KEY = API_KEY or provider_registry.api_key
+# 当前配置的服务商会用到的模型；由其中任何一个生成的翻译都算当前有效
+TRANSLATION_MODELS = frozenset(p.model or MODEL_NAME for p in provider_registry.providers)
+# 翻译提示词版本：修改翻译提示词时递增，旧的缓存结果随之失效
+TRANSLATION_PROMPT_VERSION = "v1"
+# 故事提示词版本，作用同上
+STORY_PROMPT_VERSION = "v1"
+
+# get_translation 失败时返回的提示文字，这些内容不能当作翻译结果缓存
+TRANSLATION_FALLBACKS = ("请配置 API KEY", "翻译为空", "翻译服务暂时不可用")
+
+# 相同的翻译 / 故事请求同时在途时只向模型发一次（造句每次都要不同的句子，不合并）
+singleflight = create_singleflight(Config.SINGLEFLIGHT_BACKEND, Config.SINGLEFLIGHT_PATH)
+
+def normalize_word(word):
+    """归一化单词：全角转半角、去首尾空白、合并连续空白、转小写"""
+    word = unicodedata.normalize('NFKC', word or '')
+    return ' '.join(word.split()).lower()
+
+def _flight_key(name, prompt_version, words):
+    """合并键：(函数, 模型, 提示词版本, 归一化后的参数)"""
+    return json.dumps([name, MODEL_NAME, prompt_version, words], ensure_ascii=False)
+
+def _post_chat(payload, timeout, stream=False):
+    """路由到最快的健康服务商，通过共享连接池（keep-alive）调用 chat completions 接口；stream=True 时按需读取响应体"""
+    return provider_registry.post_chat(payload, timeout, stream)
+
+async def _apost_chat(payload, timeout):
+    """_post_chat 的异步版本，走 llm_client 的共享异步客户端"""
+    return await provider_registry.apost_chat(payload, timeout)
+
+def is_translation_fallback(text):
+    """判断 get_translation 的返回值是否是失败提示而不是真正的翻译"""
+    return not text or text.startswith(TRANSLATION_FALLBACKS)
+
+# generate_sentence_challenge 失败时 answer 字段的取值
+SENTENCE_FALLBACK_ANSWERS = ("Error", "请重试", "Please configure API Key")
+
+def is_sentence_fallback(data):
+    """判断造句题目是否是失败提示而不是真正的题目"""
+    return not data or data.get("answer") in SENTENCE_FALLBACK_ANSWERS
+
+# generate_story 失败时返回的提示文字前缀
+STORY_FALLBACKS = ("请提供单词列表", "请配置 API KEY", "生成故事出错")
+
+def is_story_fallback(story):
+    """判断 generate_story 的返回值是否是失败提示（含限流）而不是真正的故事"""
+    return not story or not isinstance(story, str) or story.startswith(STORY_FALLBACKS) \
+        or "limit exceeded" in story.lower()
+
+def _translation_payload(word):
+    return {
+        "model": MODEL_NAME,
+        "messages": [
+            {"role": "system", "content": "你是一个翻译助手。直接输出该英文单词最常用的3个中文意思，用逗号分隔。不要输出拼音或其他解释。"},
+            {"role": "user", "content": word}
+        ],
+        "temperature": 0.3
+    }
+
+class Translation(str):
+    """get_translation 的返回值：翻译文本，model 为实际生成它的模型"""
+
+    def __new__(cls, text, model=MODEL_NAME):
+        translation = super().__new__(cls, text)
+        translation.model = model
+        return translation
+
+def served_model(response):
+    """响应实际来自哪个模型；没有经过服务商注册表（例如测试替身）时按 MODEL_NAME"""
+    model = getattr(response, 'served_model', None)
+    return model if isinstance(model, str) and model else MODEL_NAME
+
+def _translation_result(response):
+    """返回 [翻译文本, 模型]；singleflight 可能经 JSON 在进程间共享结果，不能直接返回 Translation"""
+    if response.status_code == 200:
+        content = response.json()["choices"][0]["message"]["content"]
+        return [content.strip() if content else "翻译为空", served_model(response)]
+    else:
+        return [f"翻译服务暂时不可用: {response.status_code}", MODEL_NAME]
+
 def get_translation(word):
-    """获取单词翻译"""
+    """获取单词翻译（Translation）；同一个单词的并发调用共享一次请求"""
+    key = _flight_key('translation', TRANSLATION_PROMPT_VERSION, normalize_word(word))
+    return Translation(*singleflight.do(key, lambda: _get_translation(word)))
+
+async def aget_translation(word):
+    """get_translation 的异步版本"""
+    key = _flight_key('translation', TRANSLATION_PROMPT_VERSION, normalize_word(word))
+    return Translation(*await singleflight.ado(key, lambda: _aget_translation(word)))
+
+def _get_translation(word):
     if not API_KEY:
-        return "请配置 API KEY"
+        return ["请配置 API KEY", MODEL_NAME]
     
     try:
-        response = requests.post(
-            f"{BASE_URL}/v1/chat/completions",
-            headers={
-                "Authorization": f"Bearer {API_KEY}",
-                "Content-Type": "application/json"
-            },
-            json={
+        response = _post_chat(_translation_payload(word), timeout=30)
+        return _translation_result(response)
+    except Exception as e:
+        print(f"AI Error: {e}")
+        
+        return ["翻译服务暂时不可用", MODEL_NAME]
+
+async def _aget_translation(word):
+    if not API_KEY:
+        return ["请配置 API KEY", MODEL_NAME]
+
+    try:
+        response = await _apost_chat(_translation_payload(word), timeout=30)
+        return _translation_result(response)
+    except Exception as e:
+        print(f"AI Error: {e}")
+        return ["翻译服务暂时不可用", MODEL_NAME]
+
+BATCH_TRANSLATION_PROMPT = (
+    "你是一个翻译助手。用户会给出一个英文单词的JSON数组，请为每个单词给出最常用的3个中文意思，用逗号分隔。"
+    "不要输出拼音或其他解释。只能返回纯JSON对象，不要用markdown代码块包裹。"
+    "格式：{\"单词1\": \"意思1, 意思2, 意思3\", \"单词2\": \"...\"}"
+)
+# 单次请求最多打包的单词数，超过时按块拆分
+MAX_TRANSLATION_BATCH = 50
+# words.chinese 列的长度上限
+MAX_TRANSLATION_LENGTH = 255
+
+CHINESE_CHAR_PATTERN = re.compile(r'[\u4e00-\u9fff]')
+# 截断或夹杂多余文字的 JSON 中，逐个抽取 "key": "value" 对
+JSON_PAIR_PATTERN = re.compile(r'"((?:[^"\\]|\\.)*)"\s*:\s*"((?:[^"\\]|\\.)*)"')
+
+
+class Translations(dict):
+    """{单词: 中文}；models 记录每个单词实际由哪个模型翻译（服务商可以配置不同的模型）"""
+
+    def __init__(self, translations=(), models=None):
+        super().__init__(translations)
+        self.models = dict(models or {})
+
+
+class TranslationUnavailable(Exception):
+    """
+    批量翻译请求本身失败（没有配置密钥、网络错误、非 200、限流、熔断），拆分重试也不会成功。
+    partial 是失败之前已经得到的翻译。
+    """
+
+    def __init__(self, message='', partial=None):
+        super().__init__(message)
+        self.partial = partial if partial is not None else Translations()
+
+
+def _load_translation_object(content):
+    """解析模型返回的 JSON 对象；格式错误或被截断时尽量修复出完整的键值对"""
+    content = content.replace('```json', '').replace('```', '').strip()
+    json_match = re.search(r'\{.*\}', content, re.DOTALL)
+    if json_match:
+        try:
+            data = json.loads(json_match.group())
+            if isinstance(data, dict):
+                return data
+        except json.JSONDecodeError:
+            pass
+
+    # 修复：截断的响应（缺少结尾的 }）或多余的逗号，逐对抽取
+    data = {}
+    for key, value in JSON_PAIR_PATTERN.findall(content):
+        try:
+            data[json.loads(f'"{key}"')] = json.loads(f'"{value}"')
+        except json.JSONDecodeError:
+            continue
+    return data
+
+def _parse_translation_map(content, words):
+    """把模型返回的内容解析为 {原单词: 中文}，只保留请求过的单词和合法的翻译"""
+    data = _load_translation_object(content)
+
+    # 模型偶尔会改变大小写，按小写对齐回原单词
+    requested = {w.lower(): w for w in words}
+    result = {}
+    for key, value in data.items():
+        word = requested.get(str(key).strip().lower())
+        if not word:
+            continue
+        if isinstance(value, list):
+            value = ", ".join(str(v) for v in value)
+        if not isinstance(value, str):
+            continue
+        value = value.strip()
+        # 校验：必须包含中文，且不超过列长度
+        if value and CHINESE_CHAR_PATTERN.search(value) and len(value) <= MAX_TRANSLATION_LENGTH:
+            result[word] = value
+    return result
+
+def _request_translations(words):
+    """发送一次批量翻译请求，返回 (模型输出的原始文本, 实际生成它的模型)"""
+    try:
+        response = _post_chat(
+            {
                 "model": MODEL_NAME,
                 "messages": [
-                    {"role": "system", "content": "你是一个翻译助手。直接输出该英文单词最常用的3个中文意思，用逗号分隔。不要输出拼音或其他解释。"},
-                    {"role": "user", "content": word}
+                    {"role": "system", "content": BATCH_TRANSLATION_PROMPT},
+                    {"role": "user", "content": json.dumps(words, ensure_ascii=False)}
                 ],
                 "temperature": 0.3
             },
-            timeout=30
+            timeout=60
         )
-        
-        if response.status_code == 200:
-            content = response.json()["choices"][0]["message"]["content"]
-            return content.strip() if content else "翻译为空"
-        else:
-            return f"翻译服务暂时不可用: {response.status_code}"
     except Exception as e:
         print(f"AI Error: {e}")
-        
-        return "翻译服务暂时不可用"
+        raise TranslationUnavailable(str(e))
+
+    if response.status_code != 200:
+        print(f"批量翻译API错误: {response.status_code}")
+        raise TranslationUnavailable(f"HTTP {response.status_code}")
+
+    try:
+        content = response.json()["choices"][0]["message"]["content"] or ""
+    except (ValueError, KeyError, IndexError, TypeError):
+        # 响应体本身不是合法 JSON，按格式错误处理
+        content = ""
+    return content, served_model(response)
+
+def _translate_batch(words, result):
+    """翻译一批单词并写入 result（Translations）；缺失或格式错误的部分拆成两半重试"""
+    content, model = _request_translations(words)
+    parsed = _parse_translation_map(content, words)
+    result.update(parsed)
+    result.models.update(dict.fromkeys(parsed, model))
+
+    missing = [w for w in words if w not in result]
+    if not missing or len(words) == 1:
+        return
+    if len(missing) == 1:
+        _translate_batch(missing, result)
+        return
+    mid = len(missing) // 2
+    _translate_batch(missing[:mid], result)
+    _translate_batch(missing[mid:], result)
+
+def _align_translations(shared, words):
+    """共享的结果可能来自大小写不同的调用，按归一化形式对齐回本次的单词"""
+    by_key = {normalize_word(w): (translation, shared.models.get(w, MODEL_NAME))
+              for w, translation in shared.items()}
+    result = Translations()
+    for w in words:
+        if normalize_word(w) in by_key:
+            result[w], result.models[w] = by_key[normalize_word(w)]
+    return result
+
+def _shared_translations(words):
+    """singleflight 的结果可能经 JSON 在进程间共享，models 要放进普通 dict 才不会丢"""
+    result = _get_translations(words)
+    return {'translations': dict(result), 'models': result.models}
+
+def fetch_translations(words):
+    """
+    批量获取单词翻译，返回 Translations {单词: 中文}（models 为各单词实际用的模型），
+    模型漏掉或返回不合法的单词不在结果中。
+    请求本身失败时抛出 TranslationUnavailable（partial 为已经得到的部分），
+    调用方据此区分“服务不可用”和“这个单词翻译不出来”。
+    单词集合相同（忽略大小写和顺序）的并发调用共享一次请求。
+    """
+    words = list(dict.fromkeys(w for w in words if w))
+    key = _flight_key('translations', TRANSLATION_PROMPT_VERSION, sorted({normalize_word(w) for w in words}))
+    try:
+        shared = singleflight.do(key, lambda: _shared_translations(words))
+    except TranslationUnavailable as e:
+        raise TranslationUnavailable(str(e), _align_translations(e.partial, words)) from e
+    return _align_translations(Translations(shared['translations'], shared['models']), words)
+
+def get_translations(words):
+    """fetch_translations 的宽松版本：请求失败时返回已经得到的部分"""
+    try:
+        return fetch_translations(words)
+    except TranslationUnavailable as e:
+        return e.partial
+
+def _get_translations(words):
+    """
+    一次请求最多翻译 MAX_TRANSLATION_BATCH 个单词；模型返回格式错误或漏掉部分单词时，
+    把缺失的单词拆分成更小的批次重试，直到单个单词为止。
+    请求本身失败（网络错误、限流等）时不再拆分，抛出 TranslationUnavailable，带上已经得到的结果。
+    """
+    words = list(dict.fromkeys(w for w in words if w))
+    if not words:
+        return Translations()
+    if not API_KEY:
+        raise TranslationUnavailable("请配置 API KEY")
+
+    result = Translations()
+    try:
+        for start in range(0, len(words), MAX_TRANSLATION_BATCH):
+            _translate_batch(words[start:start + MAX_TRANSLATION_BATCH], result)
+    except TranslationUnavailable as e:
+        e.partial = result
+        raise
+    return result
+
+def _story_payload(words_list):
+    words_str = ", ".join(words_list)
+    return {
+        "model": MODEL_NAME,
+        "messages": [
+            {"role": "system", "content": "你是一个英语老师。请用以下单词写一个200字左右的有趣英文短篇故事。请务必将用到的单词用 <b></b> 标签加粗显示，例如 <b>apple</b>。"},
+            {"role": "user", "content": f"单词列表: {words_str}"}
+        ],
+        "temperature": 0.7
+    }
+
+def _story_result(response):
+    if response.status_code == 200:
+        return response.json()["choices"][0]["message"]["content"]
+    else:
+        return f"生成故事出错: {response.status_code}"
+
+def _story_key(words_list):
+    return _flight_key('story', STORY_PROMPT_VERSION, sorted({normalize_word(w) for w in words_list or []}))
 
 def generate_story(words_list):
-    """根据单词列表生成故事"""
+    """根据单词列表生成故事；单词组合相同的并发调用（同步或异步）共享一次请求"""
+    return singleflight.do(_story_key(words_list), lambda: _generate_story(words_list))
+
+async def agenerate_story(words_list):
+    """generate_story 的异步版本"""
+    return await singleflight.ado(_story_key(words_list), lambda: _agenerate_story(words_list))
+
+def _generate_story(words_list):
     if not words_list or len(words_list) == 0:
         return "请提供单词列表"
     if not API_KEY:
         return "请配置 API KEY"
     
-    words_str = ", ".join(words_list)
     try:
-        response = requests.post(
-            f"{BASE_URL}/v1/chat/completions",
-            headers={
-                "Authorization": f"Bearer {API_KEY}",
-                "Content-Type": "application/json"
-            },
-            json={
-                "model": MODEL_NAME,
-                "messages": [
-                    {"role": "system", "content": "你是一个英语老师。请用以下单词写一个200字左右的有趣英文短篇故事。请务必将用到的单词用 <b></b> 标签加粗显示，例如 <b>apple</b>。"},
-                    {"role": "user", "content": f"单词列表: {words_str}"}
-                ],
-                "temperature": 0.7
-            },
-            timeout=60
-        )
-        
-        if response.status_code == 200:
-            return response.json()["choices"][0]["message"]["content"]
-        else:
-            return f"生成故事出错: {response.status_code}"
+        response = _post_chat(_story_payload(words_list), timeout=60)
+        return _story_result(response)
     except Exception as e:
         return f"生成故事出错: {str(e)}"
 
-def generate_sentence_challenge(exclude_sentences=None):
-    """生成中文造句题目"""
+async def _agenerate_story(words_list):
+    if not words_list or len(words_list) == 0:
+        return "请提供单词列表"
+    if not API_KEY:
+        return "请配置 API KEY"
+
+    try:
+        response = await _apost_chat(_story_payload(words_list), timeout=60)
+        return _story_result(response)
+    except Exception as e:
+        return f"生成故事出错: {str(e)}"
+
+class StoryStreamError(Exception):
+    """流式生成故事失败；message 是给用户看的提示，status 是建议返回的状态码"""
+
+    def __init__(self, message, status=500):
+        super().__init__(message)
+        self.status = status
+
+def stream_story(words_list):
+    """
+    generate_story 的流式版本（stream: true）：逐段 yield 模型生成的文本。
+    出错时（包括已经输出了一部分之后中断）抛出 StoryStreamError，错误提示不混进故事文本。
+    """
+    if not words_list or len(words_list) == 0:
+        raise StoryStreamError("请提供单词列表", 400)
+    if not API_KEY:
+        raise StoryStreamError("请配置 API KEY")
+
+    payload = dict(_story_payload(words_list), stream=True)
+    try:
+        response = _post_chat(payload, timeout=60, stream=True)
+    except Exception as e:
+        raise StoryStreamError(f"生成故事出错: {str(e)}") from e
+
+    try:
+        if response.status_code != 200:
+            raise StoryStreamError(f"生成故事出错: {response.status_code}",
+                                   429 if response.status_code == 429 else 500)
+        # 每行一个 "data: {json}"，以 "data: [DONE]" 结束
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith("data:"):
+                continue
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                break
+            try:
+                delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+            except (ValueError, KeyError, IndexError):
+                continue
+            if delta:
+                yield delta
+    except StoryStreamError:
+        raise
+    except Exception as e:
+        raise StoryStreamError(f"生成故事出错: {str(e)}") from e
+    finally:
+        # 提前结束（例如浏览器断开）时也把连接还给连接池
+        response.close()
+
+def bold_story_words(story, words_list):
+    """模型漏掉 <b></b> 加粗时补上：把故事里还没加粗的单词加粗"""
+    for word in words_list:
+        if re.search(rf"<b>\s*{re.escape(word)}\s*</b>", story, re.IGNORECASE):
+            continue
+        story = re.sub(rf"(?<![\w<>/])({re.escape(word)})(?![\w<])", r"<b>\1</b>", story, flags=re.IGNORECASE)
+    return story
+
+def _sentence_payload(exclude_sentences):
     prompt = "来一个句子"
     if exclude_sentences:
         exclusion_list = "\\n".join(exclude_sentences)
         prompt += f"不能重复以下中文句子：\\n{exclusion_list}"
-    
+
+    return {
+        "model": MODEL_NAME,
+        "messages": [
+            {"role": "system", "content": "生成一个常用的中文句子，并提供对应的标准英文翻译。只能返回纯JSON格式，不要用markdown代码块包裹。格式：{\"chinese\": \"...\", \"answer\": \"...\"}"},
+            {"role": "user", "content": prompt}
+        ],
+        "temperature": 0.7,
+        #"response_format": {"type": "json_object"}
+    }
+
+def _sentence_result(response):
+    if response.status_code == 200:
+        # 获取响应内容
+        result = response.json()
+        content = result["choices"][0]["message"]["content"].strip()
+        
+        # 清理可能存在的 markdown 符号
+        content = content.replace('```json', '').replace('```', '').strip()
+        
+        # 尝试解析JSON
+        try:
+            # 查找JSON内容（有时候AI会返回额外文字）
+            json_match = re.search(r'\{.*\}', content, re.DOTALL)
+            if json_match:
+                content = json_match.group()
+            
+            data = json.loads(content)
+            # 确保返回的数据包含必要的字段
+            if "chinese" in data and "answer" in data:
+                return data
+            else:
+                print(f"返回数据缺少必要字段: {data}")
+                return {"chinese": "生成失败，格式错误", "answer": "Error"}
+                
+        except json.JSONDecodeError as e:
+            print(f"JSON解析错误: {e}")
+            print(f"原始内容: {content}")
+            
+            # 备选方案：尝试从文本中提取
+            return {"chinese": content[:50], "answer": "请重试"}
+    else:
+        # 打印详细的错误信息
+        print(f"API错误: {response.status_code}")
+        print(f"响应内容: {response.text}")
+        return {"chinese": f"生成失败: HTTP {response.status_code}", "answer": "Error"}
+
+def generate_sentence_challenge(exclude_sentences=None):
+    """生成中文造句题目"""
     if not API_KEY:
         return {"chinese": "请配置API Key", "answer": "Please configure API Key"}
 
     try:
-        response = requests.post(
-            f"{BASE_URL}/v1/chat/completions",
-            headers={
-                "Authorization": f"Bearer {API_KEY}",
-                "Content-Type": "application/json"
-            },
-            json={
+        response = _post_chat(_sentence_payload(exclude_sentences), timeout=30)
+        return _sentence_result(response)
+            
+    except Exception as e:
+        print(f"Error: {e}")
+        import traceback
+        traceback.print_exc()
+        return {"chinese": "生成失败，请重试", "answer": "Error"}
+
+async def agenerate_sentence_challenge(exclude_sentences=None):
+    """generate_sentence_challenge 的异步版本"""
+    if not API_KEY:
+        return {"chinese": "请配置API Key", "answer": "Please configure API Key"}
+
+    try:
+        response = await _apost_chat(_sentence_payload(exclude_sentences), timeout=30)
+        return _sentence_result(response)
+    except Exception as e:
+        print(f"Error: {e}")
+        return {"chinese": "生成失败，请重试", "answer": "Error"}
+
+def generate_sentence_challenges(count):
+    """一次请求生成多个造句题目，返回 [{"chinese": ..., "answer": ...}]，失败时返回空列表"""
+    if not API_KEY or count <= 0:
+        return []
+
+    try:
+        response = _post_chat(
+            {
                 "model": MODEL_NAME,
                 "messages": [
-                    {"role": "system", "content": "生成一个常用的中文句子，并提供对应的标准英文翻译。只能返回纯JSON格式，不要用markdown代码块包裹。格式：{\"chinese\": \"...\", \"answer\": \"...\"}"},
-                    {"role": "user", "content": prompt}
+                    {"role": "system", "content": f"生成{count}个互不相同的常用中文句子，并提供对应的标准英文翻译。只能返回纯JSON数组，不要用markdown代码块包裹。格式：[{{\"chinese\": \"...\", \"answer\": \"...\"}}]"},
+                    {"role": "user", "content": f"来{count}个句子"}
                 ],
-                "temperature": 0.7,
-                #"response_format": {"type": "json_object"}
+                "temperature": 0.9
             },
-            timeout=30
+            timeout=60
         )
-        
-        if response.status_code == 200:
-            # 获取响应内容
-            result = response.json()
-            content = result["choices"][0]["message"]["content"].strip()
-            
-            # 清理可能存在的 markdown 符号
-            content = content.replace('```json', '').replace('```', '').strip()
-            
-            # 尝试解析JSON
-            try:
-                # 查找JSON内容（有时候AI会返回额外文字）
-                import re
-                json_match = re.search(r'\{.*\}', content, re.DOTALL)
-                if json_match:
-                    content = json_match.group()
-                
-                data = json.loads(content)
-                # 确保返回的数据包含必要的字段
-                if "chinese" in data and "answer" in data:
-                    return data
-                else:
-                    print(f"返回数据缺少必要字段: {data}")
-                    return {"chinese": "生成失败，格式错误", "answer": "Error"}
-                    
-            except json.JSONDecodeError as e:
-                print(f"JSON解析错误: {e}")
-                print(f"原始内容: {content}")
-                
-                # 备选方案：尝试从文本中提取
-                return {"chinese": content[:50], "answer": "请重试"}
-        else:
-            # 打印详细的错误信息
+        if response.status_code != 200:
             print(f"API错误: {response.status_code}")
-            print(f"响应内容: {response.text}")
-            return {"chinese": f"生成失败: HTTP {response.status_code}", "answer": "Error"}
-            
+            return []
+
+        content = response.json()["choices"][0]["message"]["content"] or ""
+        content = content.replace('```json', '').replace('```', '').strip()
+        json_match = re.search(r'\[.*\]', content, re.DOTALL)
+        if not json_match:
+            return []
+        items = json.loads(json_match.group())
     except Exception as e:
         print(f"Error: {e}")
-        import traceback
-        traceback.print_exc()
-        return {"chinese": "生成失败，请重试", "answer": "Error"}
+        return []
+
+    challenges = []
+    for item in items if isinstance(items, list) else []:
+        if not isinstance(item, dict):
+            continue
+        chinese = str(item.get("chinese") or "").strip()
+        answer = str(item.get("answer") or "").strip()
+        if chinese and answer:
+            challenges.append({"chinese": chinese, "answer": answer})
+    return challenges
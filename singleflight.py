@@ -0,0 +1,241 @@
+# singleflight.py
+"""
+相同请求合并（single-flight）：同一个键同时只有一个调用真正执行，
+其余并发调用等待并共享它的结果（或异常）。调用结束后键立即释放，不做缓存。
+
+- 进程内：线程和各个事件循环里的协程共用一张在途调用表
+- SQLiteFlightBackend（可选）：本机多个 gunicorn worker 通过一个 SQLite 文件抢同一个键，
+  抢到的进程执行调用并写回结果，其它进程轮询读取；等待的进程都读到后结果即删除
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+
+class SQLiteFlightBackend:
+    """
+    flights 表的 key 是主键：INSERT OR IGNORE 成功的进程是领头者。
+    等待者在行上登记（waiters + 1），读到结果后注销，最后一个读完的删除该行；
+    没有等待者时领头者直接删除，结果不会留给之后的调用。
+    领头者失败时删除该行，等待者随后自己重新抢；领头者进程崩溃时，
+    等待者发现行已超过 stale_after 秒就删掉重抢。等待者进程崩溃留下的行
+    在 begin() 开头顺带清理，最多每 cleanup_interval 秒一次，不在轮询里做。
+    """
+
+    def __init__(self, path, stale_after=90.0, poll_interval=0.05, cleanup_interval=60.0):
+        self.path = path
+        self.stale_after = stale_after
+        self.poll_interval = poll_interval
+        self.cleanup_interval = cleanup_interval
+        self._last_cleanup = 0.0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS flights ('
+            'key TEXT PRIMARY KEY, '
+            'started_at REAL NOT NULL, '
+            'finished_at REAL, '
+            'result TEXT, '
+            'waiters INTEGER NOT NULL DEFAULT 0)'
+        )
+        columns = {row[1] for row in self._conn.execute('PRAGMA table_info(flights)')}
+        if 'waiters' not in columns:
+            self._conn.execute('ALTER TABLE flights ADD COLUMN waiters INTEGER NOT NULL DEFAULT 0')
+
+    def _cleanup(self, now):
+        """删除超过 stale_after 的行：崩溃的领头者留下的，或者登记过的等待者崩溃后没人读的结果"""
+        with self._lock:
+            if now - self._last_cleanup < self.cleanup_interval:
+                return
+            self._last_cleanup = now
+            self._conn.execute('DELETE FROM flights WHERE started_at < ?', (now - self.stale_after,))
+
+    def _leave(self, key, started_at):
+        """等待者注销；已经有结果且没有其它等待者时删除该行。需要持有 self._lock"""
+        self._conn.execute('BEGIN IMMEDIATE')
+        try:
+            self._conn.execute('UPDATE flights SET waiters = waiters - 1 WHERE key = ? AND started_at = ?',
+                               (key, started_at))
+            self._conn.execute('DELETE FROM flights WHERE key = ? AND started_at = ? '
+                               'AND finished_at IS NOT NULL AND waiters <= 0', (key, started_at))
+            self._conn.execute('COMMIT')
+        except BaseException:
+            self._conn.execute('ROLLBACK')
+            raise
+
+    def begin(self, key, timeout=None):
+        """抢到键返回 (True, None)；别的进程已算出结果时返回 (False, 结果)"""
+        deadline = None if timeout is None else time.time() + timeout
+        self._cleanup(time.time())
+        registered = None  # 登记过的那一行的 started_at
+        while True:
+            now = time.time()
+            with self._lock:
+                cursor = self._conn.execute('INSERT OR IGNORE INTO flights (key, started_at) VALUES (?, ?)',
+                                            (key, now))
+                if cursor.rowcount == 1:
+                    return True, None
+                row = self._conn.execute('SELECT started_at, finished_at, result FROM flights WHERE key = ?',
+                                         (key,)).fetchone()
+                if row is None:
+                    # 刚被删除（领头者失败或结果已被读完），立即重抢
+                    continue
+                started_at, finished_at, result = row
+                if finished_at is not None:
+                    if registered == started_at:
+                        self._leave(key, started_at)
+                    return False, json.loads(result)
+                if now - started_at > self.stale_after:
+                    # 领头者多半已经崩溃
+                    self._conn.execute('DELETE FROM flights WHERE key = ? AND started_at = ? AND finished_at IS NULL',
+                                       (key, started_at))
+                    continue
+                if registered != started_at:
+                    cursor = self._conn.execute(
+                        'UPDATE flights SET waiters = waiters + 1 WHERE key = ? AND started_at = ? '
+                        'AND finished_at IS NULL', (key, started_at))
+                    registered = started_at if cursor.rowcount == 1 else None
+            if deadline is not None and now >= deadline:
+                # 等太久就自己执行，不再等别的进程
+                if registered is not None:
+                    with self._lock:
+                        self._leave(key, registered)
+                return True, None
+            time.sleep(self.poll_interval)
+
+    def finish(self, key, result):
+        """有等待者时写回结果，没有时直接删除该行"""
+        try:
+            payload = json.dumps(result, ensure_ascii=False)
+        except (TypeError, ValueError):
+            self.abort(key)
+            return
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                cursor = self._conn.execute(
+                    'UPDATE flights SET finished_at = ?, result = ? '
+                    'WHERE key = ? AND finished_at IS NULL AND waiters > 0',
+                    (time.time(), payload, key))
+                if cursor.rowcount == 0:
+                    self._conn.execute('DELETE FROM flights WHERE key = ? AND finished_at IS NULL', (key,))
+                self._conn.execute('COMMIT')
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+
+    def abort(self, key):
+        with self._lock:
+            self._conn.execute('DELETE FROM flights WHERE key = ? AND finished_at IS NULL', (key,))
+
+
+class SingleFlight:
+
+    def __init__(self, backend=None, wait_timeout=120.0):
+        self.backend = backend
+        self.wait_timeout = wait_timeout
+        self._lock = threading.Lock()
+        self._calls = {}  # 键 -> concurrent.futures.Future，线程和协程都能等待
+        self.leaders = 0
+        self.shared = 0
+
+    def _join(self, key):
+        """返回 (是否领头, Future)"""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.shared += 1
+                return False, future
+            future = Future()
+            self._calls[key] = future
+            self.leaders += 1
+            return True, future
+
+    def _settle(self, key, future, result=None, error=None):
+        with self._lock:
+            self._calls.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, key, fn):
+        """执行 fn()；同一个键已有调用在途时等待并返回它的结果"""
+        leader, future = self._join(key)
+        if not leader:
+            return future.result()
+        try:
+            result = self._run(key, fn)
+        except BaseException as e:
+            # 无论怎样失败都要释放键，否则等待者会一直等下去
+            self._settle(key, future, error=e)
+            raise
+        self._settle(key, future, result)
+        return result
+
+    def _run(self, key, fn):
+        if self.backend is None:
+            return fn()
+        claimed, result = self.backend.begin(key, self.wait_timeout)
+        if not claimed:
+            return result
+        try:
+            result = fn()
+        except Exception:
+            self.backend.abort(key)
+            raise
+        self.backend.finish(key, result)
+        return result
+
+    async def ado(self, key, coro_fn):
+        """do 的异步版本：coro_fn() 返回协程；等待者可以在别的事件循环里"""
+        leader, future = self._join(key)
+        if not leader:
+            return await asyncio.wrap_future(future)
+        try:
+            result = await self._arun(key, coro_fn)
+        except BaseException as e:
+            # 包括协程被取消：也要释放键，否则等待者会一直等下去
+            self._settle(key, future, error=e)
+            raise
+        self._settle(key, future, result)
+        return result
+
+    async def _arun(self, key, coro_fn):
+        if self.backend is None:
+            return await coro_fn()
+        claimed, result = await asyncio.to_thread(self.backend.begin, key, self.wait_timeout)
+        if not claimed:
+            return result
+        try:
+            result = await coro_fn()
+        except BaseException:
+            self.backend.abort(key)
+            raise
+        self.backend.finish(key, result)
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {
+                'backend': 'sqlite' if self.backend is not None else 'memory',
+                'in_flight': len(self._calls),
+                'leaders': self.leaders,
+                'shared': self.shared
+            }
+
+
+def create_singleflight(backend='memory', path=None):
+    if backend == 'sqlite':
+        return SingleFlight(SQLiteFlightBackend(path or 'instance/singleflight.sqlite3'))
+    if backend == 'memory':
+        return SingleFlight()
+    raise ValueError(f"未知的请求合并后端: {backend}")
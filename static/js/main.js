@@ -1,13 +1,40 @@
 let currentWords = [];
 let currentAnswer = "";
-// 增加翻译任务队列
-let translationQueue = [];
-let isTranslating = false;
+// 翻译由服务端后台队列完成，页面只轮询进度
+let isPollingTranslator = false;
+let lastTranslatedTotal = null;
+// 当前列表对应的词库版本
+let wordsEtag = null;
+let wordsVersion = null;
+// 翻译结果的 SSE 订阅
+let translatorEvents = null;
+// 当前词库：页面地址里的 ?deck_id=，没有时服务端使用默认词库
+const deckId = new URLSearchParams(window.location.search).get('deck_id');
+
+// 给接口地址带上当前词库（EventSource 不能设置请求头，所以统一用查询参数）
+function withDeck(url) {
+    if (!deckId) return url;
+    return url + (url.includes('?') ? '&' : '?') + 'deck_id=' + encodeURIComponent(deckId);
+}
 
 // 1. 获取单词数据 (增加一个参数来控制是否需要刷新admin列表)
 async function fetchWords(isAdmin = false) {
-    const res = await fetch('/api/words');
-    const newWords = await res.json();
+    // 按页拉取，只要页面用到的列；第一页带上次的 ETag，词库没变时服务端返回 304，不再重新渲染
+    let newWords = [];
+    let afterId = 0;
+    let etag = null;
+    while (afterId !== null) {
+        const headers = afterId === 0 && wordsEtag ? { 'If-None-Match': wordsEtag } : {};
+        const res = await fetch(withDeck(`/api/words?fields=id,english,chinese&limit=1000&after_id=${afterId}`), { headers });
+        if (res.status === 304) return;
+        if (afterId === 0) {
+            etag = res.headers.get('ETag');
+            wordsVersion = Number(res.headers.get('X-Vocab-Version'));
+        }
+        newWords = newWords.concat(await res.json());
+        afterId = res.headers.get('X-Next-After-Id');
+    }
+    wordsEtag = etag;
     
     // 无论是主页还是后台，都更新全局列表
     currentWords = newWords;
@@ -15,18 +42,12 @@ async function fetchWords(isAdmin = false) {
     // 如果是管理页面，将数据存为全局变量并渲染列表
     if (isAdmin) {
         renderAdminList();
-        // --- 核心修改：重新填充翻译队列 ---
-        translationQueue = []; // 先清空，再填充
-        newWords.forEach(word => {
-            // 如果单词的中文是“待翻译...”或“翻译失败（API 错误）”，重新加入队列
-            if (word.chinese === "待翻译..." || word.chinese.includes("翻译失败")) {
-                translationQueue.push(word.id);
-            }
-        });
-        
-        // 启动/继续翻译队列
-        if (translationQueue.length > 0) {
-            startTranslationQueue();
+        // 优先订阅服务端推送；不可用时，还有待翻译的单词才轮询后台翻译进度
+        const hasPending = newWords.some(word => word.chinese === "待翻译...");
+        if (!subscribeTranslator() && hasPending) {
+            pollTranslator();
+        } else if (hasPending) {
+            checkFailedTranslations();
         }
     } else {
        // 主页：使用全局列表进行渲染
@@ -76,67 +97,100 @@ function setView(mode) {
     renderCards(mode);
 }
 
-// 4. 异步翻译函数 (核心优化)
-async function startTranslationQueue() {
-    if (isTranslating || translationQueue.length === 0) {
-        isTranslating = false;
-        return; 
-    }
+// 4. 轮询服务端翻译队列（翻译本身在服务端批量完成，关闭页面也不会中断）
+async function pollTranslator() {
+    if (isPollingTranslator) return;
+    isPollingTranslator = true;
 
-    isTranslating = true;
-    const wordId = translationQueue.shift(); // 取出第一个 ID
     const status = document.getElementById('upload-status');
-    status.innerText = `正在翻译 ID ${wordId}，队列剩余 ${translationQueue.length} 个。`;
-    
-    try {
-        const res = await fetch(`/api/translate_word/${wordId}`, { method: 'POST' });
-        const data = await res.json();
-        
-        if (res.status === 200) {
-            // ****** 核心优化点：局部更新 DOM ******
-            const cnElement = document.getElementById(`chinese-${wordId}`);
-            if (cnElement) {
-                cnElement.innerText = data.chinese; // 直接更新中文列的内容
-            }
-            
-            // 顺便更新主页的列表数据（如果它已加载）
-            const wordToUpdate = currentWords.find(w => w.id === wordId);
-            if(wordToUpdate) {
-                wordToUpdate.chinese = data.chinese;
+    while (true) {
+        try {
+            const res = await fetch('/api/translator/status');
+            const data = await res.json();
+
+            if (data.queue_depth > 0) {
+                status.innerText = `后台翻译中，队列剩余 ${data.queue_depth} 个（约 ${data.words_per_minute} 个/分钟）。`;
             }
-            
-            console.log(`Word ${wordId} translated to: ${data.chinese}`);
-        } else {
-            // 翻译失败
-            const cnElement = document.getElementById(`chinese-${wordId}`);
-            let errorStatus = "翻译失败（API 错误）";
-           
-            // 只要不是成功的状态，都重新排队
-            translationQueue.push(wordId);
-
-            if (data.error) {
-                errorStatus = `翻译失败 (${res.status} ${data.error.substring(0, 15)}...，将重试)`;
-            } else if (res.status !== 200) {
-                 errorStatus = `翻译失败 (HTTP ${res.status}，将重试)`;
+            // 有新的翻译完成时刷新列表
+            const changed = lastTranslatedTotal !== null && data.translated_total !== lastTranslatedTotal;
+            lastTranslatedTotal = data.translated_total;
+            if (changed) {
+                await syncWords();
             }
-            
-            if (cnElement) {
-                cnElement.innerText = errorStatus; 
+
+            if (data.queue_depth === 0) {
+                if (data.failed > 0) {
+                    showFailedTranslations(data.failed);
+                } else {
+                    status.innerText = '全部单词已翻译完成。';
+                }
+                break;
             }
-            console.warn(`Word ${wordId} failed (HTTP ${res.status}), retrying later.`);
+        } catch (e) {
+            console.error('Translator status error:', e);
         }
+        await new Promise(resolve => setTimeout(resolve, 3000));
+    }
+    isPollingTranslator = false;
+}
+
+// 多次翻译失败的单词不再自动重试，交给用户决定是否重新翻译
+function showFailedTranslations(count) {
+    const status = document.getElementById('upload-status');
+    status.innerHTML = `有 ${count} 个单词多次翻译失败。 <button onclick="retryFailedTranslations()">重新翻译</button>`;
+}
+
+// 使用 SSE 时不轮询队列状态，加载列表时查一次有没有不再自动重试的单词
+async function checkFailedTranslations() {
+    try {
+        const res = await fetch('/api/translator/status');
+        const data = await res.json();
+        if (data.failed > 0) showFailedTranslations(data.failed);
+    } catch (e) {
+        console.error('Translator status error:', e);
+    }
+}
+
+// 失败次数达到上限的单词重新进入翻译队列
+async function retryFailedTranslations() {
+    const status = document.getElementById('upload-status');
+    try {
+        const res = await fetch(withDeck('/api/translator/retry'), { method: 'POST' });
+        const data = await res.json();
+        status.innerText = data.message || data.error;
+        if (!translatorEvents) pollTranslator();
     } catch (e) {
-        // 网络请求失败时，也重新入队
-        translationQueue.push(wordId);
-        console.error('Translation fetch error:', e, 'Retrying.');
-    } finally {
-        isTranslating = false;
-        // 无论成功还是失败，等待 3 秒再处理下一个单词
-        setTimeout(startTranslationQueue, 3000); 
+        status.innerText = '重新翻译失败';
     }
 }
 
-// 5. 修改 uploadFile 函数（保持不变，它只负责启动队列）
+// 订阅服务端推送的翻译结果（SSE），收到后只改对应的 chinese-<id> 单元格；连接失败时退回轮询
+function subscribeTranslator() {
+    if (translatorEvents) return true;
+    if (!window.EventSource) return false;
+
+    translatorEvents = new EventSource(withDeck('/api/translator/events'));
+    translatorEvents.addEventListener('translation', e => {
+        const w = JSON.parse(e.data);
+        const cell = document.getElementById(`chinese-${w.id}`);
+        // 列表里还没有这个单词，走增量同步
+        if (!cell) return syncWords();
+        cell.innerText = w.chinese;
+        const old = currentWords.find(item => item.id === w.id);
+        if (old) old.chinese = w.chinese;
+    });
+    translatorEvents.addEventListener('resync', () => syncWords());
+    translatorEvents.onerror = () => {
+        // 浏览器会自动重连；只有被服务端拒绝（如订阅数已满）时才改为轮询
+        if (translatorEvents.readyState === EventSource.CLOSED) {
+            translatorEvents = null;
+            pollTranslator();
+        }
+    };
+    return true;
+}
+
+// 5. 上传文件（翻译由服务端队列接手）
 async function uploadFile() {
     const fileInput = document.getElementById('fileInput');
     const status = document.getElementById('upload-status');
@@ -149,7 +203,7 @@ async function uploadFile() {
     status.innerText = '正在上传并保存英文单词...';
     
     try {
-        const res = await fetch('/api/upload', {
+        const res = await fetch(withDeck('/api/upload'), {
             method: 'POST',
             body: formData
         });
@@ -157,13 +211,9 @@ async function uploadFile() {
         
         status.innerText = data.message || data.error;
 
-        // 立即刷新列表，以便用户看到“待翻译...”状态
-        fetchWords(true); 
-
-        if (data.new_words && data.new_words.length > 0) {
-            translationQueue = data.new_words.map(w => w.id);
-            startTranslationQueue();
-        }
+        // 立即刷新列表，以便用户看到“待翻译...”状态，并开始轮询翻译进度
+        await syncWords();
+        if (!translatorEvents) pollTranslator();
         
     } catch (e) {
         status.innerText = '上传失败';
@@ -173,31 +223,97 @@ async function uploadFile() {
 // 删除单词
 async function deleteWord(id) {
     if(!confirm('确定删除?')) return;
-    await fetch(`/api/words/${id}`, { method: 'DELETE' });
-    fetchWords(true);
+    await fetch(withDeck(`/api/words/${id}`), { method: 'DELETE' });
+    syncWords();
 }
 
-// 3. 渲染后台列表（使用 index 作为序号）
-function renderAdminList() {
-        const tbody = document.getElementById('admin-list');
-        // 使用 map 的第二个参数 (index) 来生成从 1 开始的序号
-        tbody.innerHTML = currentWords.map((w, index) => `
+// 后台列表增量同步：只取上次版本之后改动的单词，就地更新对应的行和 chinese-<id> 单元格
+async function syncWords() {
+    if (wordsVersion === null) return fetchWords(true);
+    const res = await fetch(withDeck(`/api/words/changes?since=${wordsVersion}`));
+    const data = await res.json();
+    if (data.full_resync) return fetchWords(true);
+
+    const tbody = document.getElementById('admin-list');
+    data.updated.forEach(w => {
+        const cell = document.getElementById(`chinese-${w.id}`);
+        if (cell) cell.innerText = w.chinese;
+        const old = currentWords.find(item => item.id === w.id);
+        if (old) old.chinese = w.chinese;
+    });
+    data.deleted.forEach(id => {
+        document.getElementById(`word-row-${id}`)?.remove();
+        currentWords = currentWords.filter(item => item.id !== id);
+    });
+    data.inserted.forEach(w => {
+        if (currentWords.some(item => item.id === w.id)) return;
+        currentWords.push(w);
+        tbody.insertAdjacentHTML('beforeend', adminRow(w, currentWords.length - 1));
+    });
+    // 删除后序号需要重排
+    if (data.deleted.length) {
+        Array.from(tbody.rows).forEach((row, index) => { row.cells[0].innerText = index + 1; });
+    }
+    wordsVersion = data.version;
+    // 列表已在本地更新，下次全量拉取不能再用旧的 ETag
+    wordsEtag = null;
+}
+
+// 后台列表的一行（使用 index 作为序号）
+function adminRow(w, index) {
+    return `
             <tr id="word-row-${w.id}" style="border-bottom: 1px solid #eee;">
                 <td style="padding: 10px;">${index + 1}</td> 
                 <td>${w.english}</td>
                 <td id="chinese-${w.id}">${w.chinese}</td>
                 <td><button style="padding: 5px 10px; background: #ff7675; color: white;" onclick="deleteWord(${w.id})">删除</button></td>
             </tr>
-        `).join('');
+        `;
+}
+
+// 3. 渲染后台列表（使用 index 作为序号）
+function renderAdminList() {
+        const tbody = document.getElementById('admin-list');
+        // 使用 map 的第二个参数 (index) 来生成从 1 开始的序号
+        tbody.innerHTML = currentWords.map(adminRow).join('');
     }
 
 // 生成故事
+// 流式接口边生成边显示，结束时用服务端检查过加粗的完整故事替换
 async function generateStory() {
     const box = document.getElementById('story-box');
     box.innerHTML = 'AI 正在创作故事... ⏳';
-    const res = await fetch('/api/story', { method: 'POST' });
-    const data = await res.json();
-    box.innerHTML = data.story;
+    const res = await fetch(withDeck('/api/story/stream'), { method: 'POST' });
+    if (!res.body) {
+        const fallback = await fetch(withDeck('/api/story'), { method: 'POST' });
+        box.innerHTML = (await fallback.json()).story;
+        return;
+    }
+
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let text = '';
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        // SSE 消息以空行分隔
+        const messages = buffer.split('\n\n');
+        buffer = messages.pop();
+        for (const message of messages) {
+            const event = message.match(/^event: (.*)$/m);
+            const data = message.match(/^data: (.*)$/m);
+            if (!event || !data) continue;
+            const payload = JSON.parse(data[1]);
+            if (event[1] === 'chunk') {
+                text += payload.text;
+                box.innerHTML = text;
+            } else {
+                box.innerHTML = payload.story;
+            }
+        }
+    }
 }
 
 // 造句练习
@@ -0,0 +1,150 @@
+# story_cache.py
+"""
+故事缓存：按（提示词版本, 排序后的单词组合）缓存模型生成的故事。
+- 单词组合完全相同时直接命中
+- 否则找与请求重合度最高、且不低于 min_overlap 的故事（通过 单词 -> 组合 的倒排索引查找）
+按最近使用顺序淘汰，同时受条目过期时间（TTL）和总字节数上限约束。
+失败提示（is_story_fallback）在 put 里直接丢弃，任何调用方都不会把它缓存下来。
+"""
+import threading
+import time
+from collections import Counter, OrderedDict
+from services import STORY_PROMPT_VERSION, is_story_fallback
+from translation_cache import normalize
+
+# 最多记录多少个未命中的单词组合
+MAX_TRACKED_REQUESTS = 1000
+
+
+def story_key(words):
+    return (STORY_PROMPT_VERSION, tuple(sorted({normalize(w) for w in words if normalize(w)})))
+
+
+class StoryCache:
+
+    def __init__(self, max_bytes=2 * 1024 * 1024, ttl=86400.0, min_overlap=0.6):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.min_overlap = min_overlap
+        self._lock = threading.Lock()
+        # key -> {'story', 'words', 'size', 'expires_at', 'source'}
+        self._entries = OrderedDict()
+        self._index = {}  # 单词 -> 包含它的 key 集合
+        self._requests = Counter()  # 未命中的单词组合被请求的次数，供预生成挑选热门组合
+        self.bytes = 0
+        self.hits = 0
+        self.overlap_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, words):
+        """返回 (故事, 故事实际用到的单词) 或 None"""
+        key = story_key(words)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry['expires_at'] <= now:
+                self._remove(key)
+                entry = None
+            if entry is None:
+                key = self._best_overlap(key, now)
+                entry = self._entries.get(key) if key else None
+                if entry is not None:
+                    self.overlap_hits += 1
+            else:
+                self.hits += 1
+
+            if entry is None:
+                self.misses += 1
+                self._requests[story_key(words)] += 1
+                if len(self._requests) > MAX_TRACKED_REQUESTS:
+                    self._requests = Counter(dict(self._requests.most_common(MAX_TRACKED_REQUESTS // 2)))
+                return None
+            self._entries.move_to_end(key)
+            return entry['story'], list(entry['words'])
+
+    def _best_overlap(self, key, now):
+        words = key[1]
+        if not words:
+            return None
+        counts = Counter()
+        for word in words:
+            counts.update(k for k in self._index.get(word, ()) if k[0] == key[0])
+        best = None
+        best_score = self.min_overlap
+        for candidate, shared in counts.items():
+            # 按并集计算重合度，避免只含一两个单词的短组合轻易命中
+            score = shared / len(set(words) | set(candidate[1]))
+            if score >= best_score and self._entries[candidate]['expires_at'] > now:
+                best, best_score = candidate, score
+        return best
+
+    def put(self, words, story, source='live'):
+        """缓存生成好的故事；失败提示不缓存，返回是否已缓存"""
+        if is_story_fallback(story):
+            return False
+        key = story_key(words)
+        if not key[1]:
+            return False
+        size = len(story.encode('utf-8')) + sum(len(w) for w in key[1])
+        if size > self.max_bytes:
+            return False
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = {
+                'story': story,
+                'words': key[1],
+                'size': size,
+                'expires_at': time.time() + self.ttl,
+                'source': source
+            }
+            for word in key[1]:
+                self._index.setdefault(word, set()).add(key)
+            self.bytes += size
+            self._requests.pop(key, None)
+            while self.bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+        return True
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self.bytes -= entry['size']
+        for word in entry['words']:
+            keys = self._index.get(word)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._index[word]
+
+    def popular_misses(self, n):
+        """被请求次数最多、但缓存里还没有的单词组合"""
+        with self._lock:
+            return [list(key[1]) for key, _ in self._requests.most_common(n) if key[0] == STORY_PROMPT_VERSION]
+
+    def count(self, source=None):
+        with self._lock:
+            return sum(1 for entry in self._entries.values() if source is None or entry['source'] == source)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._index.clear()
+            self._requests.clear()
+            self.bytes = 0
+            self.hits = self.overlap_hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.overlap_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'overlap_hits': self.overlap_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round((self.hits + self.overlap_hits) / lookups, 3) if lookups else 0.0
+            }
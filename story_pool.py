@@ -0,0 +1,88 @@
+# story_pool.py
+"""故事预生成：在低峰时段为热门单词组合提前生成故事，放进故事缓存"""
+import threading
+import time
+from background import BackgroundWorker
+from services import generate_story, is_story_fallback, bold_story_words
+
+
+def parse_hours(value):
+    """解析 "1-6" 或 "22-2,13" 这样的小时范围，返回小时集合"""
+    hours = set()
+    for part in (value or '').split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if '-' in part:
+            start, end = (int(x) % 24 for x in part.split('-', 1))
+            hour = start
+            while True:
+                hours.add(hour)
+                if hour == end:
+                    break
+                hour = (hour + 1) % 24
+        else:
+            hours.add(int(part) % 24)
+    return hours
+
+
+class StoryPool(BackgroundWorker):
+    """
+    低峰时段内，缓存中预生成的故事不足 size 个时每轮生成一个：
+    优先选最常被请求但未命中的单词组合，没有时随机抽取 words_per_story 个单词。
+    """
+    name = 'story-pool'
+
+    def __init__(self, app, cache, sampler, size=20, hours='1-6', words_per_story=10, interval=60.0):
+        super().__init__(interval)
+        self.app = app
+        self.cache = cache
+        self.sampler = sampler
+        self.size = size
+        self.hours = parse_hours(hours)
+        self.words_per_story = words_per_story
+        self._lock = threading.Lock()
+        self.generated_total = 0
+        self.failed_total = 0
+
+    def off_peak(self, now=None):
+        return time.localtime(now).tm_hour in self.hours
+
+    def _next_words(self):
+        popular = self.cache.popular_misses(1)
+        if popular:
+            return popular[0]
+        with self.app.app_context():
+            return self.sampler.sample_words(self.words_per_story)
+
+    def run_once(self):
+        """生成一个故事，返回是否还需要继续"""
+        if not self.off_peak() or self.cache.count(source='pool') >= self.size:
+            return False
+        words = self._next_words()
+        if not words:
+            return False
+
+        story = generate_story(words)
+        if is_story_fallback(story):
+            with self._lock:
+                self.failed_total += 1
+            # 失败（多半是限流）时等一个周期再试
+            return False
+
+        self.cache.put(words, bold_story_words(story, words), source='pool')
+        with self._lock:
+            self.generated_total += 1
+        return True
+
+    def stats(self):
+        with self._lock:
+            return {
+                'running': self.running,
+                'off_peak': self.off_peak(),
+                'pooled': self.cache.count(source='pool'),
+                'size': self.size,
+                'generated_total': self.generated_total,
+                'failed_total': self.failed_total,
+                'last_error': self.last_error
+            }
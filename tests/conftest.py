@@ -77,8 +77,9 @@ def test_client():
             # 清理数据（使用更安全的方式）
             try:
                 # 方法1：使用更安全的清理方式
-                from sqlalchemy import text
-                db.session.execute(text('DELETE FROM words'))
+                # 清空所有表（单词、翻译缓存等），保证测试之间互不影响
+                for table in reversed(db.metadata.sorted_tables):
+                    db.session.execute(table.delete())
                 db.session.commit()
                 print("✓ 数据库数据已清理")
             except Exception as e:
@@ -90,7 +91,8 @@ def test_client():
         # 测试后清理
         with app.app_context():
             try:
-                db.session.query(Word).delete()
+                for table in reversed(db.metadata.sorted_tables):
+                    db.session.execute(table.delete())
                 db.session.commit()
                 db.session.remove()
                 print("✓ 测试后清理完成")
@@ -133,6 +135,20 @@ def sample_words():
         db.session.commit()
 
 
+@pytest.fixture(autouse=True)
+def reset_llm_breaker():
+    """
+    熔断器是进程级状态（默认的一个加上每个服务商各一个）：每个测试开始前复位，
+    避免前面测试里模拟的失败调用让后面的测试被快速失败
+    """
+    import llm_client
+    import services
+    llm_client.breaker.reset()
+    for provider in services.provider_registry.providers:
+        provider.gate.breaker.reset()
+    yield
+
+
 # ========== 注册pytest标记 ==========
 
 def pytest_configure(config):
@@ -0,0 +1,152 @@
+# tests/integration/test_decks.py
+"""
+多词库集成测试
+测试：创建词库 -> 同一个单词导入两个词库 -> 列表 / 增量 / 删除都只作用于当前词库 -> 翻译通过全局词典复用
+"""
+import pytest
+import allure
+from io import BytesIO
+from unittest.mock import patch
+from app import app, db, Word, Deck
+from translator import TranslationWorker
+
+
+def _upload(client, content, deck_id=None):
+    data = {'file': (BytesIO(content.encode('utf-8')), 'words.txt')}
+    headers = {'X-Deck-Id': str(deck_id)} if deck_id else {}
+    return client.post('/api/upload', data=data, headers=headers, content_type='multipart/form-data')
+
+
+@allure.epic("集成测试类")
+@allure.feature("词库测试类")
+@allure.story("按词库隔离")
+@pytest.mark.integration
+class TestDecks:
+
+    @pytest.fixture
+    def deck_id(self, test_client):
+        response = test_client.post('/api/decks', json={'name': '二班', 'user': 'teacher'})
+        assert response.status_code == 201
+        return response.get_json()['id']
+
+    @allure.title("1. 创建词库并按用户列出")
+    def test_create_deck(self, test_client, deck_id):
+        assert test_client.post('/api/decks', json={}).status_code == 400
+
+        data = test_client.get('/api/decks?user=teacher').get_json()
+        assert [d['id'] for d in data] == [deck_id]
+        assert data[0]['name'] == '二班'
+        assert test_client.get('/api/decks?user=nobody').get_json() == []
+
+    @allure.title("2. 同一个单词可以导入不同词库，列表互不影响")
+    def test_same_word_in_two_decks(self, test_client, deck_id):
+        assert len(_upload(test_client, 'apple 苹果\nbanana').get_json()['new_words']) == 2
+        assert len(_upload(test_client, 'apple 苹果果', deck_id).get_json()['new_words']) == 1
+        # 同一词库内仍然去重
+        assert _upload(test_client, 'apple', deck_id).get_json()['new_words'] == []
+
+        default_words = test_client.get('/api/words?fields=english,chinese').get_json()
+        deck_words = test_client.get(f'/api/words?fields=english,chinese&deck_id={deck_id}').get_json()
+        assert default_words == [{'english': 'apple', 'chinese': '苹果'}, {'english': 'banana', 'chinese': '待翻译...'}]
+        assert deck_words == [{'english': 'apple', 'chinese': '苹果果'}]
+
+        # 两个词库的 ETag 不同，互相不会命中 304
+        etag = test_client.get('/api/words').headers['ETag']
+        response = test_client.get(f'/api/words?deck_id={deck_id}', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+
+    @allure.title("3. 增量同步和删除只作用于当前词库")
+    def test_changes_and_delete_scoped(self, test_client, deck_id):
+        version = int(test_client.get('/api/words').headers['X-Vocab-Version'])
+        _upload(test_client, 'apple 苹果')
+        _upload(test_client, 'cat 猫', deck_id)
+
+        changes = test_client.get(f'/api/words/changes?since={version}&deck_id={deck_id}').get_json()
+        assert [w['english'] for w in changes['inserted']] == ['cat']
+
+        with app.app_context():
+            apple_id = Word.query.filter_by(english='apple').first().id
+        # 不能通过别的词库删除单词
+        assert test_client.delete(f'/api/words/{apple_id}', headers={'X-Deck-Id': str(deck_id)}).status_code == 404
+        assert test_client.delete(f'/api/words/{apple_id}').status_code == 200
+
+        changes = test_client.get(f'/api/words/changes?since={version}').get_json()
+        assert changes['inserted'] == [] and changes['deleted'] == [apple_id]
+        with app.app_context():
+            assert Word.query.filter_by(deck_id=deck_id).count() == 1
+
+    @allure.title("4. 不存在的词库返回 404")
+    def test_unknown_deck(self, test_client):
+        with app.app_context():
+            assert db.session.get(Deck, 999) is None
+        assert test_client.get('/api/words?deck_id=999').status_code == 404
+        assert _upload(test_client, 'apple', 999).status_code == 404
+
+
+@allure.epic("集成测试类")
+@allure.feature("词库测试类")
+@allure.story("全局词典")
+@pytest.mark.integration
+class TestLexemes:
+
+    @allure.title("1. 一个单词只翻译一次，其它词库上传时直接复用")
+    def test_translation_shared_across_decks(self, test_client):
+        deck_id = test_client.post('/api/decks', json={'name': '二班'}).get_json()['id']
+        _upload(test_client, 'apple\nbanana')
+
+        worker = TranslationWorker(app, batch_size=10)
+        with patch('translator.fetch_translations') as mock_batch:
+            mock_batch.side_effect = lambda words: {w: f'{w}-中文' for w in words}
+            worker.run_once()
+            mock_batch.assert_called_once_with(['apple', 'banana'])
+
+        # 已翻译的单词上传到别的词库时直接带上翻译，不进入翻译队列
+        new_words = _upload(test_client, 'Apple\ncherry', deck_id).get_json()['new_words']
+        assert [w['chinese'] for w in new_words] == ['apple-中文', '待翻译...']
+        assert test_client.get('/api/translator/status').get_json()['queue_depth'] == 1
+
+        with app.app_context():
+            words = Word.query.filter(Word.english.in_(['apple', 'Apple'])).all()
+            assert len(words) == 2
+            assert words[0].lexeme_id == words[1].lexeme_id is not None
+
+    @allure.title("2. 排序规则认为相同的单词（只差重音）共用一个词条")
+    def test_resolve_matches_collation(self, test_client):
+        import translation_cache
+        from models import Lexeme
+
+        with app.app_context():
+            result = translation_cache.resolve(['café', 'cafe'])
+            assert result['café'][0] == result['cafe'][0] is not None
+            translation_cache.store_many({'café': '咖啡馆'})
+            db.session.commit()
+
+            # 数据库返回的 headword 与请求的字符串不同（MySQL 下 "café" 查到 "cafe"）时也能对上
+            row = db.session.query(Lexeme).one()
+            with patch('translation_cache._select_lexemes', return_value=[
+                    type('Row', (), dict(id=row.id, headword='Café', translation=row.translation,
+                                         model=row.model, prompt_version=row.prompt_version))]):
+                assert translation_cache.resolve(['cafe']) == {'cafe': (row.id, '咖啡馆')}
+                assert translation_cache.lookup_many(['café']) == {'café': '咖啡馆'}
+
+    @allure.title("3. 词条记录实际生成翻译的模型（服务商覆盖了 model）")
+    def test_lexeme_records_served_model(self, test_client):
+        import services
+        import translation_cache
+        from models import Lexeme
+        from providers import ProviderRegistry, StubProvider
+
+        registry = ProviderRegistry([StubProvider(model='other-model')])
+        with patch('services.provider_registry', registry), patch('services.API_KEY', registry.api_key):
+            translations = services.fetch_translations(['kiwi'])
+            assert translations.models == {'kiwi': 'other-model'}
+            assert services.get_translation('plum').model == 'other-model'
+
+        with app.app_context():
+            translation_cache.store_many(translations)
+            db.session.commit()
+            assert db.session.query(Lexeme.model).filter_by(headword='kiwi').scalar() == 'other-model'
+            # 配置里有这个模型时才算当前有效的翻译
+            with patch('translation_cache.TRANSLATION_MODELS', frozenset({'other-model'})):
+                assert translation_cache.lookup('kiwi') == 'kiwi的释义'
+            assert translation_cache.lookup('kiwi') is None
@@ -0,0 +1,106 @@
+# tests/integration/test_migrate.py
+"""
+内置迁移脚本集成测试
+测试：旧表结构 -> 加列 -> 回填 -> 建索引 -> 重复执行
+"""
+import pytest
+import allure
+from sqlalchemy import create_engine, insert, inspect, text
+from app import app, db, Word
+from migrate import upgrade
+
+
+@allure.epic("集成测试类")
+@allure.feature("数据库迁移")
+@allure.story("待翻译标记")
+@pytest.mark.integration
+class TestMigrate:
+
+    @allure.title("1. 已有数据库补上 pending 列和索引")
+    def test_upgrade_old_schema(self, tmp_path, monkeypatch):
+        monkeypatch.setattr('migrate.BACKFILL_BATCH', 2)
+        engine = create_engine(f"sqlite:///{tmp_path / 'old.sqlite3'}")
+        with engine.begin() as conn:
+            conn.execute(text(
+                "CREATE TABLE words (id INTEGER PRIMARY KEY, english VARCHAR(100) NOT NULL UNIQUE, "
+                "chinese VARCHAR(255), status INTEGER DEFAULT 0)"
+            ))
+            conn.execute(
+                text("INSERT INTO words (english, chinese) VALUES (:english, :chinese)"),
+                [{'english': f'word{i}', 'chinese': '待翻译...' if i % 2 else '已翻译'} for i in range(5)]
+            )
+            conn.execute(text(
+                "CREATE TABLE translation_cache (id INTEGER PRIMARY KEY, headword VARCHAR(100), model VARCHAR(64), "
+                "prompt_version VARCHAR(16), translation VARCHAR(255), created_at DATETIME)"
+            ))
+            conn.execute(text(
+                "INSERT INTO translation_cache (headword, model, prompt_version, translation) "
+                "VALUES ('word1', 'm', 'v1', '旧'), ('word1', 'm', 'v2', '新')"
+            ))
+
+        changes = upgrade(engine)
+        assert 'add column words.pending' in changes
+        assert 'backfill words.pending: 2 rows' in changes
+        assert 'import translation_cache into lexemes: 1 rows' in changes
+        assert 'backfill words.lexeme_id: 5 rows' in changes
+        assert 'add column words.translate_attempts' in changes
+
+        with engine.connect() as conn:
+            pending = conn.execute(text("SELECT english FROM words WHERE pending = 1 ORDER BY id")).scalars().all()
+            indexes = {index['name'] for index in inspect(conn).get_indexes('words')}
+        assert pending == ['word1', 'word3']
+        assert {'ix_words_pending_id', 'ix_words_deck_status_id'} <= indexes
+        assert 'ix_words_status_id' not in indexes
+
+        # 已有单词归入默认词库，其他词库可以有相同的英文
+        with engine.begin() as conn:
+            assert conn.execute(text("SELECT COUNT(*) FROM words WHERE deck_id = 1")).scalar() == 5
+            assert conn.execute(text("SELECT name FROM decks WHERE id = 1")).scalar() == '默认词库'
+            # 每个单词都指向词典里的词条，旧缓存里最新的翻译被保留
+            assert conn.execute(text(
+                "SELECT l.translation FROM words w JOIN lexemes l ON l.id = w.lexeme_id WHERE w.english = 'word1'"
+            )).scalar() == '新'
+            assert conn.execute(text("SELECT COUNT(*) FROM words WHERE lexeme_id IS NULL")).scalar() == 0
+            conn.execute(text("INSERT INTO decks (id, name) VALUES (2, '二班')"))
+            conn.execute(text("INSERT INTO words (deck_id, english, chinese) VALUES (2, 'word1', '单词')"))
+
+        # 可以重复执行
+        assert upgrade(engine) == []
+
+    @allure.title("2. pending 随 chinese 自动同步")
+    def test_pending_follows_chinese(self, test_client):
+        with app.app_context():
+            db.session.query(Word).delete()
+            db.session.execute(insert(Word), [
+                {'english': 'apple', 'chinese': '待翻译...'},
+                {'english': 'banana', 'chinese': '香蕉'}
+            ])
+            word = Word()
+            word.english = 'cat'
+            word.chinese = '待翻译...'
+            db.session.add(word)
+            db.session.commit()
+            assert {w.english: w.pending for w in Word.query.all()} == {'apple': True, 'banana': False, 'cat': True}
+
+            word.chinese = '猫'
+            db.session.commit()
+            assert Word.query.filter_by(pending=True).count() == 1
+
+    @allure.title("3. 回填词条按排序规则合并只差大小写、重音的单词")
+    def test_backfill_lexemes_by_collation(self, tmp_path):
+        engine = create_engine(f"sqlite:///{tmp_path / 'old.sqlite3'}")
+        with engine.begin() as conn:
+            conn.execute(text(
+                "CREATE TABLE words (id INTEGER PRIMARY KEY, english VARCHAR(100) NOT NULL UNIQUE, "
+                "chinese VARCHAR(255), status INTEGER DEFAULT 0)"
+            ))
+            conn.execute(
+                text("INSERT INTO words (english, chinese) VALUES (:english, '待翻译...')"),
+                [{'english': english} for english in ('Café', 'cafe', 'tea')]
+            )
+
+        assert 'backfill words.lexeme_id: 3 rows' in upgrade(engine)
+        with engine.connect() as conn:
+            lexemes = dict(conn.execute(text("SELECT english, lexeme_id FROM words")).all())
+            assert conn.execute(text("SELECT COUNT(*) FROM lexemes")).scalar() == 2
+        assert lexemes['Café'] == lexemes['cafe'] != lexemes['tea']
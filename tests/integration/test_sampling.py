@@ -0,0 +1,94 @@
+# tests/integration/test_sampling.py
+"""
+随机抽词集成测试
+测试：抽样数量 -> 按熟悉程度加权 -> 增删单词、熟悉程度变化后重新加载
+"""
+import random
+import pytest
+import allure
+from collections import Counter
+from sqlalchemy import update
+from app import app, db, Word
+from models import DEFAULT_DECK_ID
+from sampling import WordSampler
+from versioning import record_changes
+
+
+@allure.epic("集成测试类")
+@allure.feature("故事生成测试类")
+@allure.story("随机抽词")
+@pytest.mark.integration
+class TestWordSampler:
+
+    @pytest.fixture(autouse=True)
+    def setup_words(self, test_client):
+        with app.app_context():
+            db.session.query(Word).delete()
+            for i in range(40):
+                word = Word()
+                word.english = f'word{i}'
+                word.chinese = f'单词{i}'
+                # 前 10 个未学，其余已掌握
+                word.status = 0 if i < 10 else 2
+                db.session.add(word)
+            db.session.commit()
+
+    @allure.title("1. 不放回抽样，单词不足时返回全部")
+    def test_sample_size(self):
+        sampler = WordSampler()
+        with app.app_context():
+            words = sampler.sample_words(10)
+            assert len(words) == len(set(words)) == 10
+            assert len(sampler.sample_words(100)) == 40
+
+    @allure.title("2. 未学的单词被抽中的概率更高")
+    def test_status_weighting(self):
+        random.seed(42)
+        sampler = WordSampler(weights={0: 9, 1: 1, 2: 1})
+        counts = Counter()
+        with app.app_context():
+            for _ in range(200):
+                for word in sampler.sample_words(1):
+                    counts[int(word[4:]) < 10] += 1
+        # 未学组总权重 90，已掌握组 30，约 3/4 落在未学组
+        assert counts[True] > counts[False] * 2
+
+    @allure.title("3. 只在词库版本变化时重新加载 id")
+    def test_reload_on_version_change(self):
+        sampler = WordSampler()
+        with app.app_context():
+            sampler.sample_words(5)
+            sampler.sample_words(5)
+            assert sampler.reloads == 1
+
+            word = Word()
+            word.english = 'fresh'
+            word.chinese = '新'
+            db.session.add(word)
+            db.session.flush()
+            record_changes('insert', [word.id])
+            db.session.commit()
+
+            assert 'fresh' in sampler.sample_words(100)
+            assert sampler.reloads == 2
+
+    @allure.title("4. 只改释义不重新加载，熟悉程度变化时重新加载")
+    def test_translation_update_keeps_cache(self):
+        sampler = WordSampler()
+        with app.app_context():
+            sampler.sample_words(5)
+            word_id = Word.query.filter_by(english='word0').first().id
+
+            # 后台翻译写回只改 chinese
+            db.session.execute(update(Word).where(Word.id == word_id).values(chinese='新释义'))
+            record_changes('update', [word_id])
+            db.session.commit()
+            sampler.sample_words(5)
+            assert sampler.reloads == 1
+
+            db.session.execute(update(Word).where(Word.id == word_id).values(status=2))
+            record_changes('update', [word_id])
+            db.session.commit()
+            sampler.sample_words(5)
+            assert sampler.reloads == 2
+            assert sampler.stats()['decks'][DEFAULT_DECK_ID]['words'] == {0: 9, 2: 31}
@@ -7,7 +7,9 @@ import pytest
 import allure
 import json
 from unittest.mock import patch
-from app import app, db, RECENT_SENTENCE_CHALLENGES
+from app import app, db, sentence_dedup
+from dedup_store import MemoryDedupStore
+from sentence_pool import sentence_digest
 
 
 # ========== 2. 句子挑战测试类 ==========
@@ -21,9 +23,9 @@ class TestSentenceIntegration:
     @pytest.fixture(autouse=True)
     def clear_cache(self):
         """每个测试前清空缓存"""
-        RECENT_SENTENCE_CHALLENGES.clear()
+        sentence_dedup.clear()
         yield
-        RECENT_SENTENCE_CHALLENGES.clear()
+        sentence_dedup.clear()
     
     @allure.title("1. 正常生成句子成功")
     def test_generate_sentence_normal(self, test_client):
@@ -32,17 +34,15 @@ class TestSentenceIntegration:
             "chinese": "今天天气真好", 
             "answer": "The weather is really nice today"
         }
-        with patch('app.generate_sentence_challenge') as mock_gen_sentence:
+        with patch('app.agenerate_sentence_challenge') as mock_gen_sentence:
             mock_gen_sentence.return_value = mock_response
             response = test_client.get('/api/sentence')
             assert response.status_code == 200
             json_data = response.get_json()
             assert json_data['chinese'] == '今天天气真好'
             
-            assert len(RECENT_SENTENCE_CHALLENGES) == 1
-            first_cache = RECENT_SENTENCE_CHALLENGES[0]
-            assert first_cache is not None
-            assert first_cache['chinese'] == '今天天气真好'
+            assert len(sentence_dedup) == 1
+            assert sentence_digest('今天天气真好') in sentence_dedup
         print("✓ TC_SC_001 通过")
 
     
@@ -50,17 +50,21 @@ class TestSentenceIntegration:
     def test_sentence_no_repeat_logic(self, test_client):
         """TC_SC_002: 验证重复句子检测"""
         responses = [
+            {'chinese': '第一句话', 'answer': 'First'},
             {'chinese': '第一句话', 'answer': 'First'},
             {'chinese': '第二句话', 'answer': 'Second'}
         ]
-        with patch('app.generate_sentence_challenge') as mock_gen_sentence:
+        with patch('app.agenerate_sentence_challenge') as mock_gen_sentence:
             mock_gen_sentence.side_effect = responses
             test_client.get('/api/sentence')
             
-            # 验证排除列表
-            test_client.get('/api/sentence')
+            # 重复的句子在生成后被过滤掉，自动重新生成
+            response = test_client.get('/api/sentence')
+            assert response.get_json()['chinese'] == '第二句话'
+            assert mock_gen_sentence.call_count == 3
+            # 不再把已下发的句子塞进提示词
             _, kwargs = mock_gen_sentence.call_args
-            assert '第一句话' in kwargs.get('exclude_sentences', [])
+            assert 'exclude_sentences' not in kwargs
         print("✓ TC_SC_002 通过")
 
     
@@ -68,21 +72,23 @@ class TestSentenceIntegration:
     def test_sentence_cache_limit(self, test_client):
         """TC_SC_003: 缓存机制验证（FIFO 淘汰）"""
         sentences = [{'chinese': f'句子{i}', 'answer': f'S{i}'} for i in range(10)]
-        with patch('app.generate_sentence_challenge') as mock_gen_sentence:
+        store = MemoryDedupStore(capacity=5)
+        with patch('app.agenerate_sentence_challenge') as mock_gen_sentence, \
+                patch('app.sentence_dedup', store):
             mock_gen_sentence.side_effect = sentences
             for _ in range(6):
                 test_client.get('/api/sentence')
             
-            assert len(RECENT_SENTENCE_CHALLENGES) == 5
-            cache_chinese = [item['chinese'] for item in RECENT_SENTENCE_CHALLENGES if item]
-            assert '句子0' not in cache_chinese
+            assert len(store) == 5
+            assert sentence_digest('句子0') not in store
+            assert sentence_digest('句子5') in store
         print("✓ TC_SC_003 通过")
 
     
     @allure.title("4. AI 返回非预期格式处理")
     def test_sentence_invalid_json_response(self, test_client):
         """TC_SC_004: AI 返回非预期格式处理"""
-        with patch('app.generate_sentence_challenge') as mock_gen_sentence:
+        with patch('app.agenerate_sentence_challenge') as mock_gen_sentence:
             mock_gen_sentence.return_value = {
                 'chinese': '生成失败，请重试',
                 'answer': 'Error'
@@ -106,7 +112,7 @@ class TestSentenceIntegration:
             'answer': 'Testing Markdown parsing'
         }
         
-        with patch('app.generate_sentence_challenge') as mock_gen_sentence:
+        with patch('app.agenerate_sentence_challenge') as mock_gen_sentence:
             mock_gen_sentence.return_value = mock_cleaned_data
             
             response = test_client.get('/api/sentence')
@@ -117,7 +123,6 @@ class TestSentenceIntegration:
             assert json_data['answer'] == 'Testing Markdown parsing'
             
             # 确保即使是这种格式，也正确存入了缓存
-            assert RECENT_SENTENCE_CHALLENGES[0] is not None
-            assert RECENT_SENTENCE_CHALLENGES[0]['chinese'] == '测试 Markdown 解析'
+            assert sentence_digest('测试 Markdown 解析') in sentence_dedup
             
         print("TC_SC_005 通过：带 Markdown 的 JSON 处理正确")
\ No newline at end of file
@@ -0,0 +1,68 @@
+"""
+造句题目预生成池集成测试
+测试：批量补充 -> 去重 -> 直接取题 -> 池空回退实时生成
+"""
+import pytest
+import allure
+from unittest.mock import patch
+from app import app, sentence_pool, sentence_dedup
+from sentence_pool import SentencePool
+
+
+@allure.epic("集成测试类")
+@allure.feature("句子挑战测试类")
+@allure.story("预生成池")
+@pytest.mark.integration
+class TestSentencePool:
+
+    @pytest.fixture(autouse=True)
+    def clear_cache(self, test_client):
+        sentence_dedup.clear()
+        yield
+        sentence_dedup.clear()
+
+    @allure.title("1. 一次请求补充一批并去重")
+    def test_refill_batches_and_dedupes(self):
+        pool = SentencePool(app, size=4, batch_size=4)
+        batch = [
+            {'chinese': '今天天气很好', 'answer': 'The weather is nice today'},
+            {'chinese': '今天 天气很好', 'answer': 'Duplicate with spaces'},
+            {'chinese': '我喜欢读书', 'answer': 'I like reading'},
+        ]
+        with patch('sentence_pool.generate_sentence_challenges', return_value=batch) as mock_gen:
+            # 只补进 2 道题，仍未补满，应继续
+            assert pool.run_once() is True
+            mock_gen.assert_called_once_with(4)
+
+        with app.app_context():
+            assert pool.ready_count() == 2
+            first = pool.take()
+            assert first == {'chinese': '今天天气很好', 'answer': 'The weather is nice today'}
+
+        # 已下发过的句子不会再进池
+        with patch('sentence_pool.generate_sentence_challenges', return_value=batch[:1]):
+            pool.run_once()
+        stats = pool.stats()
+        assert stats['ready'] == 1
+        assert stats['served_total'] == 1
+        assert stats['duplicates_dropped'] == 2
+
+    @allure.title("2. 接口优先从池中取题")
+    def test_sentence_api_serves_from_pool(self, test_client):
+        batch = [{'chinese': f'句子{i}', 'answer': f'S{i}'} for i in range(3)]
+        with patch('sentence_pool.generate_sentence_challenges', return_value=batch):
+            sentence_pool.run_once()
+
+        with patch('app.agenerate_sentence_challenge') as mock_gen:
+            for i in range(3):
+                response = test_client.get('/api/sentence')
+                assert response.get_json() == {'chinese': f'句子{i}', 'answer': f'S{i}'}
+            mock_gen.assert_not_called()
+
+            # 池空后回退到实时生成
+            mock_gen.return_value = {'chinese': '实时', 'answer': 'live'}
+            response = test_client.get('/api/sentence')
+            assert response.get_json()['chinese'] == '实时'
+            mock_gen.assert_called_once()
+
+        assert test_client.get('/api/sentence/pool').get_json()['ready'] == 0
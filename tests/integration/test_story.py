@@ -3,11 +3,16 @@
 故事生成功能集成测试
 测试：单词选择 -> AI生成 -> 格式验证 -> 错误处理
 """
+import json
 import pytest
 import time
 from unittest.mock import patch, MagicMock
 import allure
-from app import app, db, Word
+from app import app, db, Word, story_cache
+from story_cache import StoryCache
+from story_pool import StoryPool, parse_hours
+from sampling import WordSampler
+from services import StoryStreamError
 
 # ========== 3. 故事生成测试类 ==========
 @allure.epic("集成测试类")
@@ -16,6 +21,13 @@ from app import app, db, Word
 @pytest.mark.integration
 class TestStoryIntegration:
     """故事生成集成测试类"""
+
+    @pytest.fixture(autouse=True)
+    def clear_story_cache(self):
+        """每个测试前清空故事缓存，保证请求真正走到模型"""
+        story_cache.clear()
+        yield
+        story_cache.clear()
     
     @allure.title("1. 正常生成故事成功")
     def test_generate_story_normal(self, test_client):
@@ -39,7 +51,7 @@ class TestStoryIntegration:
         # 2. Mock AI 响应
         mock_story = "Once upon a time, there was an <b>apple</b>."
         
-        with patch('app.generate_story') as mock_gen_story:
+        with patch('app.agenerate_story') as mock_gen_story:
             mock_gen_story.return_value = mock_story
             
             response = test_client.post('/api/story')
@@ -61,7 +73,7 @@ class TestStoryIntegration:
             db.session.query(Word).delete()
             db.session.commit()
         
-        with patch('app.generate_story') as mock_gen_story:
+        with patch('app.agenerate_story') as mock_gen_story:
             response = test_client.post('/api/story')
             assert response.status_code == 200
             assert '词库为空' in response.get_json()['story']
@@ -79,7 +91,7 @@ class TestStoryIntegration:
             db.session.commit()
             print("数据库单词数:", db.session.query(Word).count())  # 调试信息
 
-        with patch('app.generate_story') as mock_gen_story:
+        with patch('app.agenerate_story') as mock_gen_story:
             mock_gen_story.side_effect = Exception("API rate limit exceeded, please try again later")
             
             response = test_client.post('/api/story')
@@ -109,7 +121,7 @@ class TestStoryIntegration:
             db.session.add(word)
             db.session.commit()
     
-        with patch('app.generate_story') as mock_gen_story:
+        with patch('app.agenerate_story') as mock_gen_story:
             mock_gen_story.return_value = None
             response = test_client.post('/api/story')
             
@@ -133,7 +145,9 @@ class TestStoryIntegration:
         
         stories = []
         for i in range(3):
-            with patch('app.generate_story') as mock_gen_story:
+            # 随机抽到的单词组合可能和上一次重合，这里验证的是每次都调用模型
+            story_cache.clear()
+            with patch('app.agenerate_story') as mock_gen_story:
                 mock_text = f"Story {i} with <b>word{i}</b>."
                 mock_gen_story.return_value = mock_text
                 
@@ -145,4 +159,187 @@ class TestStoryIntegration:
         
         assert len(stories) == 3
         # 验证故事内容不完全一致
-        assert len(set(stories)) == 3
\ No newline at end of file
+        assert len(set(stories)) == 3
+
+@allure.epic("集成测试类")
+@allure.feature("故事生成测试类")
+@allure.story("流式故事")
+@pytest.mark.integration
+class TestStoryStreamIntegration:
+    """流式故事接口集成测试类"""
+
+    @pytest.fixture(autouse=True)
+    def setup_words(self, test_client):
+        story_cache.clear()
+        with app.app_context():
+            db.session.query(Word).delete()
+            word = Word()
+            word.english = 'apple'
+            word.chinese = '苹果'
+            db.session.add(word)
+            db.session.commit()
+        yield
+        story_cache.clear()
+
+    def _events(self, response):
+        events = []
+        for message in response.get_data(as_text=True).split('\n\n'):
+            lines = dict(line.split(': ', 1) for line in message.split('\n') if line.startswith(('event', 'data')))
+            if 'event' in lines:
+                events.append((lines['event'], json.loads(lines['data'])))
+        return events
+
+    @allure.title("1. 逐段推送，结束时补上加粗")
+    def test_stream_story_chunks(self, test_client):
+        with patch('app.stream_story', return_value=iter(['An apple ', 'story.'])) as mock_stream:
+            response = test_client.post('/api/story/stream')
+            # 响应体是边读边生成的
+            events = self._events(response)
+
+        assert response.status_code == 200
+        assert response.mimetype == 'text/event-stream'
+        mock_stream.assert_called_once_with(['apple'])
+        assert events == [
+            ('chunk', {'text': 'An apple '}),
+            ('chunk', {'text': 'story.'}),
+            ('done', {'story': 'An <b>apple</b> story.'})
+        ]
+
+    @allure.title("2. 结束时识别限流")
+    def test_stream_story_rate_limit(self, test_client):
+        with patch('app.stream_story', return_value=iter(['Rate limit exceeded'])):
+            response = test_client.post('/api/story/stream')
+            event, data = self._events(response)[-1]
+        assert event == 'error'
+        assert data == {'story': '操作太快啦！请 30 秒后再试。', 'status': 429}
+
+    @allure.title("3. 生成过的故事再次请求时直接返回")
+    def test_stream_story_served_from_cache(self, test_client):
+        with patch('app.stream_story', return_value=iter(['An apple story.'])) as mock_stream:
+            test_client.post('/api/story/stream').get_data()
+            response = test_client.post('/api/story/stream')
+            events = self._events(response)
+            mock_stream.assert_called_once()
+        assert events == [('done', {'story': 'An <b>apple</b> story.'})]
+
+    @allure.title("4. 中途断开时推送 error 事件，已输出的片段不缓存")
+    def test_stream_story_fails_partway(self, test_client):
+        def broken(words):
+            yield 'An apple '
+            raise StoryStreamError('生成故事出错: connection reset')
+
+        with patch('app.stream_story', side_effect=broken):
+            response = test_client.post('/api/story/stream')
+            events = self._events(response)
+        assert events == [
+            ('chunk', {'text': 'An apple '}),
+            ('error', {'story': '生成故事出错: connection reset', 'status': 500})
+        ]
+        assert story_cache.stats()['entries'] == 0
+
+    @allure.title("5. 失败提示作为 error 事件推送，不缓存")
+    def test_stream_story_fallback_text(self, test_client):
+        with patch('services.API_KEY', ''):
+            response = test_client.post('/api/story/stream')
+            event, data = self._events(response)[-1]
+        assert event == 'error'
+        assert data == {'story': '请配置 API KEY', 'status': 500}
+        assert story_cache.stats()['entries'] == 0
+
+
+@allure.epic("集成测试类")
+@allure.feature("故事生成测试类")
+@allure.story("故事缓存")
+@pytest.mark.integration
+class TestStoryCache:
+    """故事缓存测试类"""
+
+    @pytest.fixture(autouse=True)
+    def setup_words(self, test_client):
+        story_cache.clear()
+        with app.app_context():
+            db.session.query(Word).delete()
+            for i in range(10):
+                word = Word()
+                word.english = f'word{i}'
+                word.chinese = f'单词{i}'
+                db.session.add(word)
+            db.session.commit()
+        yield
+        story_cache.clear()
+
+    @allure.title("1. 相同单词组合不再调用模型")
+    def test_story_cache_hit(self, test_client):
+        with patch('app.agenerate_story', return_value='A <b>story</b>.') as mock_gen_story:
+            first = test_client.post('/api/story').get_json()
+            second = test_client.post('/api/story').get_json()
+        # 词库只有 10 个单词，两次抽到的组合相同
+        assert first == second == {'story': 'A <b>story</b>.'}
+        mock_gen_story.assert_called_once()
+        assert test_client.get('/api/story/cache').get_json()['hits'] == 1
+
+    @allure.title("2. 出错和限流的结果不缓存")
+    def test_story_errors_not_cached(self, test_client):
+        with patch('app.agenerate_story', return_value='生成故事出错: 500') as mock_gen_story:
+            test_client.post('/api/story')
+            test_client.post('/api/story')
+        assert mock_gen_story.call_count == 2
+        assert story_cache.stats()['entries'] == 0
+
+    @allure.title("3. 重合度足够高的单词组合复用，LRU 按字节数淘汰")
+    def test_overlap_and_eviction(self):
+        cache = StoryCache(max_bytes=200, ttl=60, min_overlap=0.6)
+        cache.put(['a', 'b', 'c', 'd', 'e'], 'x' * 50)
+        # 重合 4/6，命中
+        assert cache.get(['a', 'b', 'c', 'd', 'f']) == ('x' * 50, ['a', 'b', 'c', 'd', 'e'])
+        # 重合 2/8，未命中
+        assert cache.get(['a', 'b', 'g', 'h', 'i']) is None
+
+        cache.put(['p'], 'y' * 60)
+        cache.put(['q'], 'z' * 60)
+        cache.put(['r'], 'w' * 60)
+        # 超出 200 字节，淘汰最久未使用的
+        assert cache.get(['a', 'b', 'c', 'd', 'e']) is None
+        assert cache.stats()['bytes'] <= 200
+        assert ['a', 'b', 'g', 'h', 'i'] in cache.popular_misses(5)
+
+    @allure.title("4. 过期的故事不再命中")
+    def test_ttl_expiry(self):
+        cache = StoryCache(ttl=60)
+        cache.put(['apple'], 'story')
+        with patch('story_cache.time.time', return_value=time.time() + 61):
+            assert cache.get(['apple']) is None
+
+    @allure.title("4b. 失败提示不会进入缓存")
+    def test_put_rejects_fallbacks(self):
+        cache = StoryCache(ttl=60)
+        for story in ('生成故事出错: 503', '请配置 API KEY', 'Rate limit exceeded', ''):
+            assert cache.put(['apple'], story) is False
+        assert cache.stats()['entries'] == 0
+        assert cache.put(['apple'], 'An <b>apple</b> story.') is True
+
+    @allure.title("5. 低峰时段为热门组合预生成故事")
+    def test_story_pool_pregenerates(self, test_client):
+        assert parse_hours('22-1,13') == {22, 23, 0, 1, 13}
+        cache = StoryCache()
+        cache.get(['word1', 'word2'])
+        pool = StoryPool(app, cache, WordSampler(), size=2, hours='0-23')
+
+        with patch('story_pool.generate_story', return_value='A word1 and word2 story.') as mock_gen:
+            # 先生成最常被请求的组合，再随机抽词
+            assert pool.run_once() is True
+            mock_gen.assert_called_with(['word1', 'word2'])
+            assert pool.run_once() is True
+            assert len(mock_gen.call_args[0][0]) == 10
+            # 已补满
+            assert pool.run_once() is False
+            assert mock_gen.call_count == 2
+
+        assert cache.get(['word1', 'word2'])[0] == 'A <b>word1</b> and <b>word2</b> story.'
+        assert pool.stats()['pooled'] == 2
+
+        pool.hours = set()
+        cache.clear()
+        with patch('story_pool.generate_story') as mock_gen:
+            assert pool.run_once() is False
+            mock_gen.assert_not_called()
@@ -8,6 +8,7 @@ import json
 import allure
 from unittest.mock import patch, MagicMock
 from app import app, db, Word
+import translation_cache
 
 
 # ========== 翻译集成测试类 ==========
@@ -191,4 +192,65 @@ class TestTranslateIntegration:
                 # 初始数据中有1个已翻译(banana)，新翻译了7个(apple, cat + 5个test)
                 assert translated_words_count == 8
         
-        print("✓ TC_TR_006 通过：批量翻译流程正常")
\ No newline at end of file
+        print("✓ TC_TR_006 通过：批量翻译流程正常")
+    
+    @allure.title("6. 翻译缓存命中时不调用AI")
+    def test_translate_uses_persistent_cache(self, test_client):
+        """
+        TC_TR_007: 相同单词（忽略大小写和空白）第二次翻译直接命中缓存
+        """
+
+        with app.app_context():
+            other = Word()
+            other.english = ' Apple '
+            other.chinese = '待翻译...'
+            db.session.add(other)
+            db.session.commit()
+            other_id = other.id
+
+        translation_cache.reset_stats()
+        with patch('app.get_translation') as mock_translate:
+            mock_translate.return_value = "苹果, 苹果树"
+
+            response = test_client.post(f'/api/translate_word/{self.word1_id}')
+            assert response.get_json()['chinese'] == '苹果, 苹果树'
+
+            response = test_client.post(f'/api/translate_word/{other_id}')
+            assert response.status_code == 200
+            assert response.get_json()['chinese'] == '苹果, 苹果树'
+
+            mock_translate.assert_called_once_with('apple')
+
+        stats = test_client.get('/api/translator/status').get_json()['cache']
+        assert stats['hits'] == 1
+        assert stats['misses'] == 1
+
+    @allure.title("7. 失败提示不写入缓存")
+    def test_translate_fallback_not_cached(self, test_client):
+        """
+        TC_TR_008: AI 返回失败提示时不缓存，下次仍会调用 AI
+        """
+        with patch('app.get_translation') as mock_translate:
+            mock_translate.return_value = "翻译服务暂时不可用: 503"
+            test_client.post(f'/api/translate_word/{self.word1_id}')
+
+        with app.app_context():
+            assert translation_cache.lookup('apple') is None
+
+    @allure.title("8. 翻译失败时返回 503，单词保持待翻译")
+    def test_translate_fallback_keeps_pending(self, test_client):
+        """
+        TC_TR_009: 限流、熔断等失败提示不写入单词，客户端按 Retry-After 稍后重试
+        """
+        with patch('app.get_translation') as mock_translate:
+            mock_translate.return_value = "翻译服务暂时不可用: 503"
+            response = test_client.post(f'/api/translate_word/{self.word1_id}')
+
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '30'
+        assert '翻译服务暂时不可用' in response.get_json()['details']
+
+        with app.app_context():
+            word = db.session.get(Word, self.word1_id)
+            assert word.chinese == '待翻译...'
+            assert word.pending
@@ -0,0 +1,215 @@
+# tests/integration/test_translate_worker.py
+"""
+服务端批量翻译队列集成测试
+测试：待翻译单词扫描 -> 批量翻译 -> 批量写回 -> 队列状态
+"""
+import pytest
+import allure
+from unittest.mock import patch
+from app import app, db, Word, translation_worker
+from translator import TranslationWorker, MAX_TRANSLATE_ATTEMPTS, retry_delay
+from services import TranslationUnavailable
+import translation_cache
+import offline_dict
+
+
+@allure.epic("集成测试类")
+@allure.feature("翻译测试类")
+@allure.story("后台批量翻译")
+@pytest.mark.integration
+class TestTranslationWorker:
+
+    @pytest.fixture(autouse=True)
+    def setup_words(self, test_client):
+        with app.app_context():
+            db.session.query(Word).delete()
+            for eng in ['apple', 'banana', 'cat', 'dog', 'egg']:
+                word = Word()
+                word.english = eng
+                word.chinese = '待翻译...'
+                db.session.add(word)
+            done = Word()
+            done.english = 'fish'
+            done.chinese = '鱼'
+            db.session.add(done)
+            db.session.commit()
+
+    @allure.title("1. 一次请求翻译一批单词")
+    def test_run_once_translates_batch(self):
+        worker = TranslationWorker(app, batch_size=3)
+        with patch('translator.fetch_translations') as mock_batch:
+            mock_batch.side_effect = lambda words: {w: f'{w}-中文' for w in words}
+
+            assert worker.run_once() is True
+            mock_batch.assert_called_once_with(['apple', 'banana', 'cat'])
+
+            assert worker.run_once() is True
+            assert mock_batch.call_args[0][0] == ['dog', 'egg']
+
+            # 队列清空后空闲
+            assert worker.run_once() is False
+            assert mock_batch.call_count == 2
+
+        with app.app_context():
+            words = {w.english: w.chinese for w in Word.query.all()}
+        assert words['apple'] == 'apple-中文'
+        assert words['egg'] == 'egg-中文'
+        assert words['fish'] == '鱼'
+
+        stats = worker.stats()
+        assert stats['queue_depth'] == 0
+        assert stats['translated_total'] == 5
+        assert stats['batches'] == 2
+
+    @allure.title("2. 未返回的单词保持待翻译，退避时间过后重试")
+    def test_missing_words_stay_pending(self):
+        worker = TranslationWorker(app, batch_size=10)
+        with patch('translator.fetch_translations', return_value={'apple': '苹果'}):
+            worker.run_once()
+
+        with app.app_context():
+            pending = Word.query.filter_by(chinese='待翻译...').all()
+            assert len(pending) == 4
+            assert all(w.translate_attempts == 1 and w.next_attempt_at and w.translate_error for w in pending)
+        assert worker.stats()['failed_total'] == 4
+
+        with patch('translator.fetch_translations', return_value={}) as mock_batch:
+            # 还在退避期内，不再发给模型
+            assert worker.run_once() is False
+            mock_batch.assert_not_called()
+
+            with app.app_context():
+                db.session.query(Word).update({Word.next_attempt_at: None})
+                db.session.commit()
+            # 扫到末尾后从头重新扫描剩下的单词
+            assert worker.run_once() is False
+            assert mock_batch.call_args[0][0] == ['banana', 'cat', 'dog', 'egg']
+
+    @allure.title("3. 队列状态接口")
+    def test_translator_status_api(self, test_client):
+        response = test_client.get('/api/translator/status')
+        assert response.status_code == 200
+        data = response.get_json()
+        assert data['queue_depth'] == 5
+        assert data['running'] is False
+        assert translation_worker.running is False
+
+    @allure.title("4. 批量翻译先查缓存")
+    def test_worker_uses_cache(self):
+        with app.app_context():
+            translation_cache.store_many({'Apple': '苹果', 'cat': '猫'})
+            db.session.commit()
+
+        worker = TranslationWorker(app, batch_size=10)
+        with patch('translator.fetch_translations') as mock_batch:
+            mock_batch.side_effect = lambda words: {w: f'{w}-中文' for w in words}
+            worker.run_once()
+            mock_batch.assert_called_once_with(['banana', 'dog', 'egg'])
+
+        with app.app_context():
+            words = {w.english: w.chinese for w in Word.query.all()}
+            assert words['apple'] == '苹果'
+            assert words['cat'] == '猫'
+            # 新翻译的结果也进入缓存
+            assert translation_cache.lookup('DOG') == 'dog-中文'
+
+    @allure.title("5. 离线词典里的单词不调用模型")
+    def test_worker_uses_offline_dict(self, tmp_path):
+        path = str(tmp_path / 'dict.bin')
+        offline_dict.build([('apple', '苹果'), ('egg', '鸡蛋')], path)
+        offline_dict.load(path)
+        try:
+            worker = TranslationWorker(app, batch_size=10)
+            with patch('translator.fetch_translations') as mock_batch:
+                mock_batch.side_effect = lambda words: {w: f'{w}-中文' for w in words}
+                worker.run_once()
+                mock_batch.assert_called_once_with(['banana', 'cat', 'dog'])
+
+            with app.app_context():
+                words = {w.english: w.chinese for w in Word.query.all()}
+                assert words['apple'] == '苹果'
+                assert words['egg'] == '鸡蛋'
+                # 离线释义不写入全局词典，只有模型翻译会写入
+                assert translation_cache.lookup('apple') is None
+        finally:
+            offline_dict.load(None)
+
+    @allure.title("6. 导入 app 不启动后台任务，只有显式调用才启动")
+    def test_background_tasks_not_started_on_import(self):
+        import app as app_module
+        assert not translation_worker.running
+        assert not app_module.sentence_pool.running
+        assert 'background' in app.cli.commands
+
+        with patch.object(app_module.translation_worker, 'start') as start_worker, \
+                patch.object(app_module.sentence_pool, 'start') as start_pool, \
+                patch.object(app_module.story_pool, 'start') as start_story, \
+                patch('app.Config.STORY_POOL_ENABLED', True):
+            app_module.start_background_tasks(with_story_pool=False)
+        start_worker.assert_called_once()
+        start_pool.assert_called_once()
+        start_story.assert_not_called()
+
+    @allure.title("7. 重试间隔指数增长，达到上限后不再自动翻译")
+    def test_retry_backoff_and_cap(self):
+        assert retry_delay(1) == 60
+        assert retry_delay(3) == 240
+        assert retry_delay(30) == 6 * 3600
+
+        worker = TranslationWorker(app, batch_size=10)
+        with app.app_context():
+            db.session.query(Word).filter(Word.english != 'apple').update(
+                {Word.translate_attempts: MAX_TRANSLATE_ATTEMPTS})
+            db.session.commit()
+
+        with patch('translator.fetch_translations', return_value={}) as mock_batch:
+            worker.run_once()
+            mock_batch.assert_called_once_with(['apple'])
+        stats = worker.stats()
+        assert stats['queue_depth'] == 1
+        assert stats['failed'] == 4
+
+        # 重新标记为待翻译时重新计数
+        with app.app_context():
+            word = Word.query.filter_by(english='banana').first()
+            word.chinese = '待翻译...'
+            assert word.translate_attempts == 0 and word.next_attempt_at is None
+
+    @allure.title("8. 翻译服务不可用时整个队列暂停，单词的失败次数不变")
+    def test_outage_pauses_queue(self):
+        worker = TranslationWorker(app, batch_size=2)
+        with patch('translator.fetch_translations') as mock_batch:
+            mock_batch.side_effect = TranslationUnavailable('HTTP 503', {'apple': '苹果'})
+            assert worker.run_once() is False
+            # 暂停期间不取新的一批
+            assert worker.run_once() is False
+            assert mock_batch.call_count == 1
+            assert worker.stats()['paused_for'] > 0
+
+            with app.app_context():
+                assert db.session.query(Word).filter(Word.translate_attempts > 0).count() == 0
+                assert Word.query.filter_by(english='apple').first().chinese == '苹果'
+
+            # 恢复后从同一批重新开始
+            worker._paused_until = 0.0
+            mock_batch.side_effect = lambda words: {w: f'{w}-中文' for w in words}
+            assert worker.run_once() is True
+            mock_batch.assert_called_with(['banana', 'cat'])
+        assert worker.outages == 0
+
+    @allure.title("9. 重新翻译接口清零失败次数")
+    def test_retry_failed_api(self, test_client):
+        with app.app_context():
+            db.session.query(Word).filter(Word.english != 'fish').update(
+                {Word.translate_attempts: MAX_TRANSLATE_ATTEMPTS, Word.translate_error: '模型没有返回有效的翻译'})
+            db.session.commit()
+        assert test_client.get('/api/translator/status').get_json()['failed'] == 5
+
+        with patch.object(translation_worker, 'wake') as wake:
+            response = test_client.post('/api/translator/retry')
+        assert response.status_code == 200
+        assert response.get_json()['reset'] == 5
+        wake.assert_called_once()
+        data = test_client.get('/api/translator/status').get_json()
+        assert data['failed'] == 0
+        assert data['queue_depth'] == 5
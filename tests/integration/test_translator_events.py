@@ -0,0 +1,96 @@
+# tests/integration/test_translator_events.py
+"""
+翻译进度推送集成测试
+测试：变更日志轮询 -> 广播给多个订阅者 -> 有界队列 -> SSE 接口
+"""
+import json
+import pytest
+import allure
+from unittest.mock import patch
+from app import app, db, Word, event_broker
+from events import EventBroker, Subscription, TooManySubscribers
+from translator import TranslationWorker
+from versioning import record_changes
+
+
+@allure.epic("集成测试类")
+@allure.feature("翻译测试类")
+@allure.story("翻译进度推送")
+@pytest.mark.integration
+class TestTranslatorEvents:
+
+    @pytest.fixture(autouse=True)
+    def setup_words(self, test_client):
+        with app.app_context():
+            db.session.query(Word).delete()
+            for eng in ['apple', 'banana']:
+                word = Word()
+                word.english = eng
+                word.chinese = '待翻译...'
+                db.session.add(word)
+            db.session.flush()
+            record_changes('insert', [w.id for w in Word.query.all()])
+            db.session.commit()
+
+    @allure.title("1. 一路轮询广播给所有订阅者")
+    def test_broker_fans_out_translations(self):
+        broker = EventBroker(app, autostart=False)
+        first = broker.subscribe()
+        second = broker.subscribe()
+        # 第一轮只记录当前版本
+        broker.run_once()
+        assert first.get(timeout=0) is None
+
+        worker = TranslationWorker(app, batch_size=10)
+        with patch('translator.fetch_translations', return_value={'apple': '苹果'}):
+            worker.run_once()
+        broker.run_once()
+
+        with app.app_context():
+            apple_id = Word.query.filter_by(english='apple').first().id
+        expected = {'event': 'translation', 'data': {'id': apple_id, 'chinese': '苹果'}}
+        assert first.get(timeout=0) == expected
+        assert second.get(timeout=0) == expected
+        # 待翻译的 banana 不推送
+        assert first.get(timeout=0) is None
+        assert broker.stats()['published_total'] == 1
+
+    @allure.title("2. 订阅数和队列长度都有上限")
+    def test_broker_is_bounded(self):
+        broker = EventBroker(app, max_subscribers=1, queue_size=1, autostart=False)
+        subscription = broker.subscribe()
+        with pytest.raises(TooManySubscribers):
+            broker.subscribe()
+
+        broker.publish({'event': 'translation', 'data': {'id': 1, 'chinese': '一'}})
+        broker.publish({'event': 'translation', 'data': {'id': 2, 'chinese': '二'}})
+        # 溢出后丢弃积压，通知客户端重新同步
+        assert subscription.get(timeout=0) == {'event': 'resync'}
+        assert subscription.get(timeout=0) is None
+
+        broker.unsubscribe(subscription)
+        assert broker.stats()['subscribers'] == 0
+
+    @allure.title("3. SSE 接口输出事件")
+    def test_events_endpoint_streams(self, test_client):
+        subscription = Subscription(10)
+        subscription.put({'event': 'translation', 'data': {'id': 7, 'chinese': '苹果'}})
+        with patch.object(event_broker, 'subscribe', return_value=subscription), \
+                patch.object(event_broker, 'unsubscribe') as mock_unsubscribe:
+            response = test_client.get('/api/translator/events', buffered=False)
+            assert response.status_code == 200
+            assert response.mimetype == 'text/event-stream'
+
+            chunks = iter(response.response)
+            assert next(chunks).startswith(b'retry:')
+            event = next(chunks).decode('utf-8')
+            assert event.startswith('event: translation\n')
+            assert json.loads(event.split('data: ', 1)[1]) == {'id': 7, 'chinese': '苹果'}
+            response.close()
+            mock_unsubscribe.assert_called_once_with(subscription)
+
+    @allure.title("4. 订阅数已满时返回 503")
+    def test_events_endpoint_rejects_when_full(self, test_client):
+        with patch.object(event_broker, 'subscribe', side_effect=TooManySubscribers()):
+            response = test_client.get('/api/translator/events')
+        assert response.status_code == 503
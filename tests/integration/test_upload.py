@@ -364,6 +364,68 @@ def test_upload_file_encoding_gbk(test_client):
     assert "banana" in words
     print("✓ 文件编码测试通过")
 
+@allure.title("13. 分块批量导入返回正确的ID")
+def test_upload_bulk_import_returns_ids(test_client):
+    """分块边界上的查重与回查 ID：new_words 顺序与文件一致，ID 与数据库一致"""
+    with app.app_context():
+        w = Word()
+        w.english = 'word_3'
+        w.chinese = '已存在'
+        db.session.add(w)
+        db.session.commit()
+
+    words = [f"word_{i}" for i in range(10)] + ["word_1", "word_5"]
+    data = {'file': (BytesIO("\n".join(words).encode('utf-8')), 'chunks.txt')}
+
+    with patch('importer.IMPORT_CHUNK_SIZE', 3):
+        response = test_client.post('/api/upload', data=data)
+
+    assert response.status_code == 200
+    new_words = response.get_json()['new_words']
+    assert [w['english'] for w in new_words] == [f"word_{i}" for i in range(10) if i != 3]
+
+    with app.app_context():
+        ids = {w.english: w.id for w in Word.query.all()}
+        assert len(ids) == 10
+        for item in new_words:
+            assert item['id'] == ids[item['english']]
+            assert item['chinese'] == '待翻译...'
+            assert item['status'] == 0
+
+@allure.title("14. 流式导入跨块、跨批次")
+def test_upload_streaming_small_chunks(test_client):
+    """样本、读取块、写入批次都很小时，结果与整体导入一致（包括跨批次去重）"""
+    lines = [f"w{i} 词{i}" for i in range(50)] + ["w7 重复", "extra"]
+    raw = "\r\n".join(lines).encode('utf-8')
+    data = {'file': (BytesIO(raw), 'stream.txt')}
+
+    with patch('importer.ENCODING_SAMPLE_SIZE', 64), \
+            patch('importer.READ_CHUNK_SIZE', 7), \
+            patch('importer.IMPORT_CHUNK_SIZE', 4):
+        response = test_client.post('/api/upload', data=data)
+
+    assert response.status_code == 200
+    new_words = response.get_json()['new_words']
+    assert len(new_words) == 51
+    assert new_words[7] == {'id': new_words[7]['id'], 'english': 'w7', 'chinese': '词7', 'status': 0}
+
+    with app.app_context():
+        assert Word.query.count() == 51
+
+
+@allure.title("15. 只有大小写或重音不同的单词按同一个单词导入")
+def test_upload_case_insensitive_duplicates(test_client):
+    """与 MySQL 不区分大小写的排序规则一致：文件内的 Apple / apple 只导入第一个，不会撞唯一键"""
+    raw = "Apple\napple\nAPPLE 苹果\ncafé\ncafe\nbanana".encode('utf-8')
+    data = {'file': (BytesIO(raw), 'case.txt')}
+
+    response = test_client.post('/api/upload', data=data)
+
+    assert response.status_code == 200
+    assert [w['english'] for w in response.get_json()['new_words']] == ['Apple', 'café', 'banana']
+    with app.app_context():
+        assert Word.query.count() == 3
+
 
 
 # ========== 如果需要，可以添加setup/teardown ==========
@@ -385,4 +447,48 @@ def cleanup_database():
     # 测试后：再次清理
     with app.app_context():
         db.session.query(Word).delete()
-        db.session.commit()
\ No newline at end of file
+        db.session.commit()
+
+
+@allure.title("16. 开头全是英文、后面才有中文的 GBK 文件")
+def test_upload_gbk_after_ascii_prefix(test_client):
+    """编码检测只看开头 64KB，后面的 GBK 内容解码失败时换编码重新导入"""
+    lines = [f"word{i}" for i in range(12000)] + [f"gbk{i} 苹果{i}" for i in range(2000)]
+    data = {'file': (BytesIO("\n".join(lines).encode('gbk')), 'mixed.txt')}
+
+    response = test_client.post('/api/upload', data=data)
+
+    assert response.status_code == 200
+    assert len(response.get_json()['new_words']) == 14000
+    with app.app_context():
+        assert Word.query.filter_by(english='gbk1999').first().chinese == '苹果1999'
+
+
+@allure.title("17. 查重之后被别的上传抢先插入的单词不算新单词")
+def test_upload_skips_rows_inserted_concurrently(test_client):
+    """INSERT IGNORE 忽略掉的行不出现在 new_words 里，也不记成新增"""
+    import translation_cache
+    resolve = translation_cache.resolve
+
+    def resolve_after_concurrent_upload(words):
+        # 模拟另一个请求在查重之后、插入之前写入了 banana
+        other = Word()
+        other.english = 'banana'
+        other.chinese = '香蕉'
+        db.session.add(other)
+        db.session.flush()
+        return resolve(words)
+
+    data = {'file': (BytesIO(b'apple\nbanana\ncat'), 'race.txt')}
+    with patch('translation_cache.resolve', side_effect=resolve_after_concurrent_upload):
+        response = test_client.post('/api/upload', data=data)
+
+    assert response.status_code == 200
+    new_words = response.get_json()['new_words']
+    assert [w['english'] for w in new_words] == ['apple', 'cat']
+    inserted = test_client.get('/api/words/changes?since=0').get_json()['inserted']
+    assert sorted(w['english'] for w in inserted) == ['apple', 'cat']
+    with app.app_context():
+        ids = {w.english: w.id for w in Word.query.all()}
+        assert {w['english']: w['id'] for w in new_words} == {'apple': ids['apple'], 'cat': ids['cat']}
+        assert Word.query.filter_by(english='banana').one().chinese == '香蕉'
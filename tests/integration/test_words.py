@@ -0,0 +1,192 @@
+# tests/integration/test_words.py
+"""
+单词列表接口集成测试
+测试：keyset 分页 -> 过滤 -> 字段投影 -> 版本号与 304
+"""
+import pytest
+import allure
+from io import BytesIO
+from unittest.mock import patch
+from app import app, db, Word
+from translator import TranslationWorker
+
+
+@allure.epic("集成测试类")
+@allure.feature("单词列表测试类")
+@allure.story("分页查询")
+@pytest.mark.integration
+class TestWordsApi:
+
+    @pytest.fixture(autouse=True)
+    def setup_words(self, test_client):
+        with app.app_context():
+            db.session.query(Word).delete()
+            for i in range(7):
+                word = Word()
+                word.english = f'word{i}'
+                word.chinese = '待翻译...' if i % 2 else f'单词{i}'
+                word.status = i % 3
+                db.session.add(word)
+            db.session.commit()
+
+    @allure.title("1. 按游标分页取完全部单词")
+    def test_keyset_pagination(self, test_client):
+        seen = []
+        after_id = 0
+        pages = 0
+        while after_id is not None:
+            response = test_client.get(f'/api/words?limit=3&after_id={after_id}')
+            assert response.status_code == 200
+            page = response.get_json()
+            assert len(page) <= 3
+            seen.extend(w['english'] for w in page)
+            after_id = response.headers.get('X-Next-After-Id')
+            pages += 1
+
+        assert pages == 3
+        assert seen == [f'word{i}' for i in range(7)]
+
+    @allure.title("2. 按熟悉程度和翻译状态过滤")
+    def test_filters(self, test_client):
+        data = test_client.get('/api/words?status=0,2').get_json()
+        assert [w['english'] for w in data] == ['word0', 'word2', 'word3', 'word5', 'word6']
+
+        data = test_client.get('/api/words?pending=true').get_json()
+        assert [w['english'] for w in data] == ['word1', 'word3', 'word5']
+
+        data = test_client.get('/api/words?pending=false&status=0').get_json()
+        assert [w['english'] for w in data] == ['word0', 'word6']
+
+    @allure.title("3. 字段投影与参数校验")
+    def test_fields_projection(self, test_client):
+        response = test_client.get('/api/words?fields=english&limit=2')
+        assert response.get_json() == [{'english': 'word0'}, {'english': 'word1'}]
+        assert response.headers['X-Next-After-Id']
+
+        response = test_client.get('/api/words?fields=english,password')
+        assert response.status_code == 400
+
+    @allure.title("4. 不带分页参数时返回整个词库")
+    def test_unpaged_returns_all(self, test_client):
+        with patch('word_query.MAX_PAGE_SIZE', 3):
+            response = test_client.get('/api/words')
+            assert [w['english'] for w in response.get_json()] == [f'word{i}' for i in range(7)]
+            assert 'X-Next-After-Id' not in response.headers
+
+            # 带了任一分页参数就按页返回
+            response = test_client.get('/api/words?after_id=0')
+            assert len(response.get_json()) == 3
+            assert response.headers['X-Next-After-Id']
+
+
+@allure.epic("集成测试类")
+@allure.feature("单词列表测试类")
+@allure.story("条件请求")
+@pytest.mark.integration
+class TestWordsVersioning:
+
+    @pytest.fixture(autouse=True)
+    def setup_words(self, test_client):
+        with app.app_context():
+            db.session.query(Word).delete()
+            word = Word()
+            word.english = 'apple'
+            word.chinese = '待翻译...'
+            db.session.add(word)
+            db.session.commit()
+            self.word_id = word.id
+
+    @allure.title("1. 词库未变化时返回 304")
+    def test_unchanged_list_returns_304(self, test_client):
+        first = test_client.get('/api/words')
+        etag = first.headers['ETag']
+
+        with patch('app.list_words') as mock_list:
+            response = test_client.get('/api/words', headers={'If-None-Match': etag})
+            assert response.status_code == 304
+            assert response.data == b''
+            mock_list.assert_not_called()
+
+    @allure.title("2. 上传、翻译、删除都会更新版本号")
+    def test_mutations_bump_version(self, test_client):
+        etags = [test_client.get('/api/words').headers['ETag']]
+
+        test_client.post('/api/upload', data={'file': (BytesIO(b'banana'), 'words.txt')})
+        etags.append(test_client.get('/api/words').headers['ETag'])
+
+        with patch('app.get_translation', return_value='苹果'):
+            test_client.post(f'/api/translate_word/{self.word_id}')
+        etags.append(test_client.get('/api/words').headers['ETag'])
+
+        test_client.delete(f'/api/words/{self.word_id}')
+        etags.append(test_client.get('/api/words').headers['ETag'])
+
+        assert len(set(etags)) == 4
+        response = test_client.get('/api/words', headers={'If-None-Match': etags[1]})
+        assert response.status_code == 200
+        assert [w['english'] for w in response.get_json()] == ['banana']
+
+    @allure.title("3. 后台翻译写回后更新版本号")
+    def test_worker_bumps_version(self, test_client):
+        etag = test_client.get('/api/words').headers['ETag']
+        worker = TranslationWorker(app, batch_size=10)
+        with patch('translator.fetch_translations', return_value={'apple': '苹果'}):
+            worker.run_once()
+
+        response = test_client.get('/api/words', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert response.get_json()[0]['chinese'] == '苹果'
+
+
+@allure.epic("集成测试类")
+@allure.feature("单词列表测试类")
+@allure.story("增量同步")
+@pytest.mark.integration
+class TestWordChanges:
+
+    @pytest.fixture(autouse=True)
+    def setup_words(self, test_client):
+        with app.app_context():
+            db.session.query(Word).delete()
+        test_client.post('/api/upload', data={'file': (BytesIO(b'apple\nbanana\ncat'), 'words.txt')})
+        response = test_client.get('/api/words')
+        self.version = int(response.headers['X-Vocab-Version'])
+        self.ids = {w['english']: w['id'] for w in response.get_json()}
+
+    @allure.title("1. 只返回指定版本之后的新增、修改和删除")
+    def test_changes_since_version(self, test_client):
+        with patch('app.get_translation', return_value='苹果'):
+            test_client.post(f'/api/translate_word/{self.ids["apple"]}')
+        test_client.delete(f'/api/words/{self.ids["banana"]}')
+        test_client.post('/api/upload', data={'file': (BytesIO(b'dog'), 'words.txt')})
+
+        data = test_client.get(f'/api/words/changes?since={self.version}').get_json()
+        assert data['full_resync'] is False
+        assert data['version'] == self.version + 3
+        assert data['updated'] == [{'id': self.ids['apple'], 'english': 'apple', 'chinese': '苹果', 'status': 0}]
+        assert [w['english'] for w in data['inserted']] == ['dog']
+        assert data['deleted'] == [self.ids['banana']]
+
+        # 已是最新版本时没有改动
+        data = test_client.get(f'/api/words/changes?since={data["version"]}').get_json()
+        assert data['inserted'] == data['updated'] == data['deleted'] == []
+
+    @allure.title("2. 同一单词多次改动合并，后台翻译写入变更日志")
+    def test_changes_are_collapsed(self, test_client):
+        worker = TranslationWorker(app, batch_size=10)
+        with patch('translator.fetch_translations', return_value={'cat': '猫'}):
+            worker.run_once()
+
+        data = test_client.get('/api/words/changes?since=0').get_json()
+        # 先新增后修改的仍算新增，内容是最新的
+        assert {w['english']: w['chinese'] for w in data['inserted']}['cat'] == '猫'
+        assert data['updated'] == []
+
+        data = test_client.get(f'/api/words/changes?since={self.version}').get_json()
+        assert [w['english'] for w in data['updated']] == ['cat']
+
+    @allure.title("3. 版本号超出日志范围时要求全量同步")
+    def test_full_resync(self, test_client):
+        data = test_client.get('/api/words/changes?since=9999').get_json()
+        assert data['full_resync'] is True
+        assert test_client.get('/api/words/changes').status_code == 400
@@ -0,0 +1,88 @@
+# tests/unit/test_circuit_breaker.py
+
+import time
+import pytest
+import allure
+from unittest.mock import patch
+
+import llm_client
+import services
+from circuit_breaker import CircuitBreaker, CircuitOpen, CLOSED, OPEN, HALF_OPEN
+
+pytestmark = pytest.mark.unit
+
+
+@allure.epic("工具函数单元测试")
+@allure.feature("熔断器")
+class TestCircuitBreaker:
+
+    @allure.title("连续失败达到阈值后打开，成功会清零计数")
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+        for _ in range(2):
+            breaker.before()
+            breaker.record_failure()
+        breaker.record_success()
+        assert breaker.stats()['consecutive_failures'] == 0
+
+        for _ in range(3):
+            breaker.before()
+            breaker.record_failure()
+        assert breaker.state == OPEN
+        with pytest.raises(CircuitOpen):
+            breaker.before()
+        assert breaker.stats()['rejected'] == 1
+
+    @allure.title("半开：只放行探测请求，成功后关闭，失败后重新打开")
+    def test_half_open_probe(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+        breaker.before()
+        breaker.record_failure()
+        assert breaker.state == OPEN
+
+        time.sleep(0.06)
+        assert breaker.state == HALF_OPEN
+        probe = breaker.before()
+        assert probe is True
+        # 探测请求在途时其它调用仍然快速失败
+        with pytest.raises(CircuitOpen):
+            breaker.before()
+        breaker.record_failure(probe)
+        assert breaker.state == OPEN
+
+        time.sleep(0.06)
+        probe = breaker.before()
+        # 探测请求没有真正发出时归还名额
+        breaker.cancel(probe)
+        probe = breaker.before()
+        breaker.record_success(probe)
+        assert breaker.state == CLOSED
+        assert breaker.before() is False
+
+    @allure.title("熔断时不发请求，直接返回原有的失败提示")
+    def test_services_fail_fast_when_open(self):
+        gate = services.provider_registry.providers[0].gate
+        for _ in range(gate.breaker.failure_threshold):
+            gate.breaker.record_failure()
+
+        with patch('llm_client.session.post') as mock_post, patch('services.API_KEY', 'x'):
+            started = time.monotonic()
+            assert services.get_translation('apple') == '翻译服务暂时不可用'
+            assert services.generate_story(['apple']).startswith('生成故事出错')
+            assert services.get_translations(['apple', 'pear']) == {}
+            assert time.monotonic() - started < 1
+            mock_post.assert_not_called()
+
+        assert services.provider_registry.stats()['providers'][0]['breaker']['state'] == OPEN
+
+    @allure.title("5xx 计入失败，429 不计入")
+    def test_status_classification(self):
+        with patch('llm_client.session.post') as mock_post:
+            mock_post.return_value.status_code = 503
+            mock_post.return_value.headers = {}
+            llm_client.post('http://upstream/v1', json={})
+            assert llm_client.breaker.stats()['consecutive_failures'] == 1
+
+            mock_post.return_value.status_code = 200
+            llm_client.post('http://upstream/v1', json={})
+            assert llm_client.breaker.stats()['consecutive_failures'] == 0
@@ -0,0 +1,51 @@
+# tests/unit/test_dedup_store.py
+
+import pytest
+import allure
+
+from dedup_store import MemoryDedupStore, SQLiteDedupStore, create_dedup_store
+
+pytestmark = pytest.mark.unit
+
+
+@allure.epic("工具函数单元测试")
+@allure.feature("去重存储")
+class TestDedupStore:
+
+    @allure.title("内存存储：重复返回 False，超出容量淘汰最早的键")
+    def test_memory_store_ring_eviction(self):
+        store = MemoryDedupStore(capacity=3)
+        assert store.add('a') is True
+        assert store.add('a') is False
+        for key in ['b', 'c', 'd']:
+            store.add(key)
+
+        assert len(store) == 3
+        assert 'a' not in store
+        assert 'd' in store
+        # 被淘汰的键可以重新加入
+        assert store.add('a') is True
+        assert 'b' not in store
+
+    @allure.title("SQLite 存储：多个实例共享同一个文件")
+    def test_sqlite_store_shared_between_instances(self, tmp_path):
+        path = str(tmp_path / 'dedup.sqlite3')
+        first = SQLiteDedupStore(path, capacity=3)
+        second = SQLiteDedupStore(path, capacity=3)
+
+        assert first.add('a') is True
+        assert 'a' in second
+        assert second.add('a') is False
+
+        for key in ['b', 'c', 'd']:
+            second.add(key)
+        assert len(first) == 3
+        assert 'a' not in first
+
+        first.clear()
+        assert len(second) == 0
+
+    @allure.title("未知的存储类型")
+    def test_create_unknown_backend(self):
+        with pytest.raises(ValueError):
+            create_dedup_store('redis')
@@ -0,0 +1,60 @@
+# tests/unit/test_importer.py
+
+import pytest
+import allure
+from io import BytesIO
+from unittest.mock import patch
+
+from importer import parse_line, iter_lines, iter_batches, detect_encoding, ImportFormatError
+
+pytestmark = pytest.mark.unit
+
+
+@allure.epic("工具函数单元测试")
+@allure.feature("词库导入")
+class TestImporter:
+
+    @allure.title("单行解析")
+    @pytest.mark.parametrize("line, expected", [
+        ("apple", ("apple", "待翻译...")),
+        ("  apple \t 苹果 ", ("apple", "苹果")),
+        ("狗 dog", ("狗", "dog")),
+        ("   ", None),
+    ])
+    def test_parse_line(self, line, expected):
+        assert parse_line(line) == expected
+
+    @allure.title("块边界截断多字节字符和换行")
+    def test_iter_lines_across_chunk_boundaries(self):
+        content = "apple 苹果\r\nbanana 香蕉\rcat 猫\n\ndog"
+        raw = content.encode('gbk')
+
+        # 每次只读 1 个字节，保证多字节字符和 \r\n 都会被拆开
+        with patch('importer.READ_CHUNK_SIZE', 1):
+            lines = list(iter_lines(BytesIO(raw), 'gbk'))
+
+        assert lines == content.splitlines(keepends=True)[:-1] + ["dog"]
+
+    @allure.title("二进制内容被拦截")
+    def test_iter_lines_rejects_binary(self):
+        with pytest.raises(ImportFormatError):
+            list(iter_lines(BytesIO(b'abc\x00def'), 'utf-8'))
+
+    @allure.title("按固定大小分批")
+    def test_iter_batches(self):
+        lines = ["w1", "", "w2 词2", "w3", "w4", "w5"]
+        batches = list(iter_batches(lines, batch_size=2))
+        assert [len(b) for b in batches] == [2, 2, 1]
+        assert batches[0] == [("w1", "待翻译..."), ("w2", "词2")]
+
+    @allure.title("编码检测兜底")
+    def test_detect_encoding_fallback(self):
+        with patch('importer.chardet.detect', return_value={'encoding': 'GB2312', 'confidence': 0.1}):
+            assert detect_encoding(b'abc') == 'utf-8'
+        with patch('importer.chardet.detect', return_value={'encoding': None, 'confidence': 0.0}):
+            assert detect_encoding(b'abc') == 'utf-8'
+        assert detect_encoding("hello 世界，你好".encode('utf-8')).lower().startswith('utf')
+        # ASCII / GB2312 换成兼容的超集，文件后面出现的中文也能解码
+        assert detect_encoding(b'plain ascii words\n' * 10) == 'utf-8'
+        with patch('importer.chardet.detect', return_value={'encoding': 'GB2312', 'confidence': 0.99}):
+            assert detect_encoding(b'abc') == 'gb18030'
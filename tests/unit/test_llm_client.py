@@ -0,0 +1,152 @@
+# tests/unit/test_llm_client.py
+
+import asyncio
+import json
+import threading
+import time
+import pytest
+import allure
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import llm_client
+from circuit_breaker import CircuitBreaker
+
+pytestmark = pytest.mark.unit
+
+
+class _EchoHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # 支持 keep-alive
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        self.rfile.read(length)
+        body = json.dumps({"ok": True}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def local_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _EchoHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@allure.epic("AI服务单元测试")
+@allure.feature("共享连接池")
+class TestLLMClient:
+
+    @allure.title("连续调用复用同一个连接")
+    def test_post_reuses_connection(self, local_server):
+        before = llm_client.stats()
+
+        first = llm_client.post(f"{local_server}/v1/chat/completions", json={"a": 1}, timeout=5)
+        second = llm_client.post(f"{local_server}/v1/chat/completions", json={"a": 2}, timeout=5)
+
+        assert first.json() == {"ok": True}
+        assert first.connection_reused is False
+        assert second.connection_reused is True
+
+        after = llm_client.stats()
+        assert after['calls'] - before['calls'] == 2
+        assert after['new_connections'] - before['new_connections'] == 1
+        assert after['recent_calls'][-1]['reused'] is True
+
+    @allure.title("连接失败计入错误数")
+    def test_post_error_counted(self):
+        before = llm_client.stats()['errors']
+        with pytest.raises(Exception):
+            llm_client.post("http://127.0.0.1:9/v1/chat/completions", json={}, timeout=1)
+        assert llm_client.stats()['errors'] == before + 1
+
+    @allure.title("异步调用共用常驻事件循环上的客户端")
+    def test_apost_from_multiple_loops(self, local_server):
+
+        async def call_many(n):
+            responses = await asyncio.gather(*[
+                llm_client.apost(f"{local_server}/v1/chat/completions", json={"i": i}, timeout=5)
+                for i in range(n)
+            ])
+            return [r.json() for r in responses]
+
+        before = llm_client.stats()['async_calls']
+        # 模拟 Flask async 视图：每个请求都在自己的事件循环里
+        assert asyncio.run(call_many(5)) == [{"ok": True}] * 5
+        assert asyncio.run(call_many(3)) == [{"ok": True}] * 3
+
+        stats = llm_client.stats()
+        assert stats['async_calls'] - before == 8
+        assert stats['async_in_flight'] == 0
+
+    @allure.title("429 按 Retry-After 等待后重试，并计入限流器")
+    def test_post_retries_after_429(self):
+        attempts = []
+
+        class _ThrottleOnceHandler(_EchoHandler):
+            def do_POST(self):
+                attempts.append(1)
+                if len(attempts) == 1:
+                    self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                    self.send_response(429)
+                    self.send_header("Retry-After", "1")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                super().do_POST()
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), _ThrottleOnceHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            before = llm_client.stats()['limiter']
+            response = llm_client.post(f"http://127.0.0.1:{server.server_address[1]}/v1", json={}, timeout=5)
+            assert response.status_code == 200
+            assert len(attempts) == 2
+            after = llm_client.stats()['limiter']
+            assert after['throttled'] == before['throttled'] + 1
+            assert after['retry_after_waits'] == before['retry_after_waits'] + 1
+            assert after['in_flight'] == 0
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    @allure.title("排队等待放行时被取消，放行后名额和半开探测都还回去")
+    def test_apost_cancelled_while_waiting(self):
+        gate = llm_client.Gate()
+        gate.breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.0)
+        gate.breaker.record_failure()  # 立即进入半开，只放行一个探测
+        release, admitted = threading.Event(), threading.Event()
+        admit = gate.admit
+
+        def slow_admit(priority):
+            release.wait(5)
+            probe = admit(priority)
+            admitted.set()
+            return probe
+
+        gate.admit = slow_admit
+
+        async def cancel_while_waiting():
+            task = asyncio.ensure_future(llm_client.apost("http://127.0.0.1:9/v1", gate=gate, json={}, timeout=1))
+            await asyncio.sleep(0.05)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(cancel_while_waiting())
+        release.set()
+        assert admitted.wait(5)
+        for _ in range(100):
+            if gate.limiter.stats()['in_flight'] == 0:
+                break
+            time.sleep(0.01)
+        assert gate.limiter.stats()['in_flight'] == 0
+        assert gate.breaker.before() is True
@@ -0,0 +1,75 @@
+# tests/unit/test_offline_dict.py
+
+import pytest
+import allure
+
+import offline_dict
+from offline_dict import OfflineDictionary, OfflineDictFormatError, build, read_tsv
+
+pytestmark = pytest.mark.unit
+
+
+@allure.epic("工具函数单元测试")
+@allure.feature("离线词典")
+class TestOfflineDictionary:
+
+    @pytest.fixture
+    def dictionary(self, tmp_path):
+        path = str(tmp_path / 'dict.bin')
+        count = build([('apple', '苹果'), ('Banana ', '香蕉'), ('apple', '重复'), ('cat', ''), ('咖啡', 'coffee')], path)
+        assert count == 3
+        dictionary = OfflineDictionary(path)
+        yield dictionary
+        dictionary.close()
+
+    @allure.title("按归一化后的单词二分查找")
+    def test_lookup(self, dictionary):
+        assert len(dictionary) == 3
+        assert dictionary.get('apple') == '苹果'
+        assert dictionary.get(' BANANA') == '香蕉'
+        assert dictionary.get('咖啡') == 'coffee'
+        assert dictionary.get('cat') is None
+        assert dictionary.get('zzz') is None
+        assert dictionary.get('') is None
+        assert 'Apple' in dictionary
+
+        assert dictionary.lookup_many(['Apple', 'dog', 'banana']) == {'Apple': '苹果', 'banana': '香蕉'}
+        stats = dictionary.stats()
+        assert stats['entries'] == 3
+
+    @allure.title("大词典中每个词条都能查到")
+    def test_many_entries(self, tmp_path):
+        path = str(tmp_path / 'big.bin')
+        build(((f'word{i}', f'单词{i}') for i in range(5000)), path)
+        dictionary = OfflineDictionary(path)
+        assert all(dictionary.get(f'word{i}') == f'单词{i}' for i in range(0, 5000, 7))
+        assert dictionary.get('word5000') is None
+        dictionary.close()
+
+    @allure.title("命令行：从 TSV 生成词典文件")
+    def test_build_from_tsv(self, tmp_path, capsys):
+        tsv = tmp_path / 'words.tsv'
+        tsv.write_text('# 注释\napple\t苹果\n\nno-gloss\nbanana\t香蕉\n', encoding='utf-8')
+        assert list(read_tsv(str(tsv))) == [('apple', '苹果'), ('banana', '香蕉')]
+
+        output = str(tmp_path / 'out' / 'dict.bin')
+        offline_dict.main(['build', str(tsv), '-o', output])
+        assert '2 个词条' in capsys.readouterr().out
+        offline_dict.main(['lookup', output, 'banana', 'cat'])
+        assert capsys.readouterr().out.splitlines() == ['banana\t香蕉', 'cat\t-']
+
+    @allure.title("超过 255 字的释义不写入词典")
+    def test_skip_long_gloss(self, tmp_path):
+        path = str(tmp_path / 'dict.bin')
+        assert build([('long', '长' * 256), ('ok', '好' * 255)], path) == 1
+        dictionary = OfflineDictionary(path)
+        assert dictionary.get('long') is None
+        assert dictionary.get('ok') == '好' * 255
+        dictionary.close()
+
+    @allure.title("不是词典文件时报错")
+    def test_invalid_file(self, tmp_path):
+        path = tmp_path / 'bad.bin'
+        path.write_bytes(b'not a dictionary file')
+        with pytest.raises(OfflineDictFormatError):
+            OfflineDictionary(str(path))
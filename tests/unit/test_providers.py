@@ -0,0 +1,173 @@
+# tests/unit/test_providers.py
+
+import asyncio
+import time
+import pytest
+import allure
+from unittest.mock import patch, MagicMock
+
+import services
+import rate_limit
+from providers import (Provider, StubProvider, ProviderRegistry, create_registry,
+                       HEDGE_MIN_SAMPLES, UNHEALTHY_COOLDOWN)
+
+pytestmark = pytest.mark.unit
+
+
+def _warm(provider, latency, n=HEDGE_MIN_SAMPLES):
+    for _ in range(n):
+        provider.record(latency, True)
+
+
+@allure.epic("工具函数单元测试")
+@allure.feature("大模型服务商路由")
+class TestProviderRouting:
+
+    @allure.title("没有记录的服务商先试，之后路由到延迟最低的")
+    def test_routes_to_fastest(self):
+        slow, fast = Provider('slow', 'http://slow'), Provider('fast', 'http://fast')
+        registry = ProviderRegistry([slow, fast])
+        slow.record(0.5, True)
+        assert registry.ranked()[0] is fast
+
+        fast.record(0.1, True)
+        assert registry.ranked()[0] is fast
+        for _ in range(10):
+            fast.record(2.0, True)
+        assert registry.ranked()[0] is slow
+
+    @allure.title("错误率过高的服务商暂时不用，冷却后再试")
+    def test_unhealthy_provider_skipped(self):
+        primary, backup = Provider('primary', 'http://a'), Provider('backup', 'http://b')
+        registry = ProviderRegistry([primary, backup])
+        primary.record(0.1, True)
+        backup.record(0.5, True)
+        for _ in range(5):
+            primary.record(0.1, False)
+        assert not primary.healthy()
+        assert registry.ranked()[0] is backup
+        assert primary.healthy(time.monotonic() + UNHEALTHY_COOLDOWN)
+
+    @allure.title("请求发往服务商自己的地址和模型，失败计入错误率")
+    def test_post_uses_provider_settings(self):
+        provider = Provider('other', 'https://api.example.com/', 'secret', 'other-model')
+        registry = ProviderRegistry([provider])
+        with patch('llm_client.session.post') as mock_post:
+            mock_post.return_value = MagicMock(status_code=200, headers={})
+            registry.post_chat({"model": "deepseek-chat", "messages": []}, timeout=5)
+            url = mock_post.call_args[0][0]
+            kwargs = mock_post.call_args[1]
+            assert url == 'https://api.example.com/v1/chat/completions'
+            assert kwargs['json']['model'] == 'other-model'
+            assert kwargs['headers']['Authorization'] == 'Bearer secret'
+
+            mock_post.side_effect = Exception('connection reset')
+            with pytest.raises(Exception):
+                registry.post_chat({"messages": []}, timeout=5)
+        assert provider.calls == 2 and provider.errors == 1
+
+    @allure.title("按 LLM_PROVIDERS 配置创建，密钥可以从环境变量读取")
+    def test_create_registry(self, monkeypatch):
+        monkeypatch.setenv('OTHER_KEY', 'k2')
+        registry = create_registry(
+            '[{"name": "other", "base_url": "https://other", "api_key_env": "OTHER_KEY"},'
+            ' {"name": "stub", "type": "stub"}]',
+            default={"name": "deepseek", "base_url": "https://api.deepseek.com"}
+        )
+        assert [p.name for p in registry.providers] == ['other', 'stub']
+        assert registry.api_key == 'k2'
+        assert create_registry('', default={"name": "d", "base_url": "https://d"}).providers[0].name == 'd'
+        with pytest.raises(ValueError):
+            create_registry('[{"type": "grpc"}]', default={})
+
+    @allure.title("每个服务商有自己的熔断器：首选熔断时改用备用服务商")
+    def test_failover_when_breaker_open(self):
+        primary, backup = Provider('primary', 'http://a', 'k'), Provider('backup', 'http://b', 'k')
+        registry = ProviderRegistry([primary, backup])
+        primary.record(0.1, True)
+        backup.record(0.5, True)
+        assert primary.gate is not backup.gate
+        for _ in range(primary.gate.breaker.failure_threshold):
+            primary.gate.breaker.record_failure()
+
+        with patch('llm_client.session.post') as mock_post:
+            mock_post.return_value = MagicMock(status_code=200, headers={})
+            registry.post_chat({"messages": []}, timeout=5)
+            assert mock_post.call_args[0][0] == 'http://b/v1/chat/completions'
+        assert registry.ranked()[0] is backup
+        assert registry.stats()['providers'][-1]['breaker']['state'] == 'open'
+
+        # 排序时还没看到熔断（例如并发请求刚把它打开）也会换下一个
+        with patch.object(registry, 'ranked', return_value=[primary, backup]), \
+                patch('llm_client.session.post') as mock_post:
+            mock_post.return_value = MagicMock(status_code=200, headers={})
+            registry.post_chat({"messages": []}, timeout=5)
+            assert [c[0][0] for c in mock_post.call_args_list] == ['http://b/v1/chat/completions']
+        assert primary.errors == 0
+
+
+@allure.epic("工具函数单元测试")
+@allure.feature("大模型服务商路由")
+class TestHedging:
+
+    @allure.title("超过 p95 还没返回时向第二个服务商再发一次，用先返回的结果")
+    def test_sync_hedge(self):
+        slow, fast = StubProvider('slow', delay=0.5), StubProvider('fast', delay=0.02)
+        _warm(slow, 0.01)
+        _warm(fast, 0.05)
+        registry = ProviderRegistry([slow, fast], hedge=True)
+
+        started = time.monotonic()
+        response = registry.post_chat({"messages": [{"content": "x"}, {"content": "apple"}]}, timeout=5)
+        assert time.monotonic() - started < 0.4
+        assert response.json()["choices"][0]["message"]["content"] == "apple的释义"
+        assert registry.stats()['hedged'] == 1
+        assert registry.stats()['hedge_wins'] == 1
+
+    @allure.title("异步对冲：输掉的请求被取消")
+    def test_async_hedge(self):
+        slow, fast = StubProvider('slow', delay=0.5), StubProvider('fast', delay=0.02)
+        _warm(slow, 0.01)
+        _warm(fast, 0.05)
+        registry = ProviderRegistry([slow, fast], hedge=True)
+
+        started = time.monotonic()
+        response = asyncio.run(registry.apost_chat({"messages": [{"content": "apple"}]}, timeout=5))
+        assert time.monotonic() - started < 0.4
+        assert response.status_code == 200
+        assert registry.stats()['hedge_wins'] == 1
+        # 被取消的请求不计入延迟和错误
+        assert slow.calls == HEDGE_MIN_SAMPLES
+
+    @allure.title("后台批量任务和样本不足时不对冲")
+    def test_no_hedge_for_bulk(self):
+        provider = StubProvider('only', delay=0.05)
+        _warm(provider, 0.001)
+        registry = ProviderRegistry([provider], hedge=True)
+        with rate_limit.bulk():
+            registry.post_chat({"messages": [{"content": "a"}]}, timeout=5)
+        assert registry.stats()['hedged'] == 0
+
+        fresh = ProviderRegistry([StubProvider('fresh', delay=0.05)], hedge=True)
+        fresh.post_chat({"messages": [{"content": "a"}]}, timeout=5)
+        assert fresh.stats()['hedged'] == 0
+
+
+@allure.epic("工具函数单元测试")
+@allure.feature("大模型服务商路由")
+class TestStubProvider:
+
+    @allure.title("stub 服务商为各类提示词生成可解析的结果")
+    def test_stub_through_services(self):
+        registry = ProviderRegistry([StubProvider()])
+        # services.API_KEY 在导入时按当时的注册表算好，换了注册表要一起换，否则没设 DEEPSEEK_API_KEY 时会被当作未配置
+        with patch('services.provider_registry', registry), \
+                patch('services.API_KEY', registry.api_key), \
+                patch('llm_client.session.post') as mock_post:
+            assert services.get_translation('apple') == 'apple的释义'
+            assert services.get_translations(['cat', 'dog']) == {'cat': 'cat的释义', 'dog': 'dog的释义'}
+            assert '<b>cat</b>' in services.generate_story(['cat', 'dog'])
+            assert not services.is_sentence_fallback(services.generate_sentence_challenge())
+            assert len(services.generate_sentence_challenges(3)) == 3
+            assert '<b>cat</b>' in ''.join(services.stream_story(['cat']))
+            mock_post.assert_not_called()
@@ -0,0 +1,98 @@
+# tests/unit/test_rate_limit.py
+
+import threading
+import time
+import pytest
+import allure
+
+import rate_limit
+from rate_limit import AdaptiveLimiter, RateLimitTimeout, parse_retry_after, BULK, INTERACTIVE
+
+pytestmark = pytest.mark.unit
+
+
+@allure.epic("工具函数单元测试")
+@allure.feature("客户端限流")
+class TestAdaptiveLimiter:
+
+    @allure.title("令牌桶：突发用完后按速率放行")
+    def test_token_bucket(self):
+        limiter = AdaptiveLimiter(rate=20, burst=2, initial_concurrency=10)
+        started = time.monotonic()
+        for _ in range(3):
+            limiter.acquire()
+            limiter.release(200)
+        # 第三个请求要等约 1/20 秒
+        assert time.monotonic() - started >= 0.04
+
+    @allure.title("AIMD：成功时加性增，429 时减半并按 Retry-After 暂停")
+    def test_aimd(self):
+        limiter = AdaptiveLimiter(rate=0, initial_concurrency=4, max_concurrency=8)
+        for _ in range(8):
+            limiter.acquire()
+            limiter.release(200)
+        assert limiter.limit > 5
+
+        limiter.acquire()
+        limiter.release(429, retry_after='0.2')
+        stats = limiter.stats()
+        assert stats['concurrency_limit'] < 3
+        assert stats['throttled'] == 1
+        assert stats['paused_for'] > 0.1
+
+        # 暂停期间等不到配额
+        with pytest.raises(RateLimitTimeout):
+            limiter.acquire(timeout=0.05)
+        assert limiter.stats()['timeouts'] == 1
+        limiter.acquire(timeout=1)
+        limiter.release(200)
+
+        # 网络错误（没有响应）既不增也不减
+        limit = limiter.limit
+        limiter.acquire()
+        limiter.release()
+        assert limiter.limit == limit
+        assert limiter.in_flight == 0
+
+    @allure.title("交互请求优先于后台批量任务")
+    def test_interactive_first(self):
+        limiter = AdaptiveLimiter(rate=0, initial_concurrency=1, max_concurrency=1)
+        limiter.acquire(INTERACTIVE)
+        order = []
+
+        def worker(priority, name):
+            limiter.acquire(priority, timeout=2)
+            order.append(name)
+            limiter.release(200)
+
+        bulk_thread = threading.Thread(target=worker, args=(BULK, 'bulk'))
+        bulk_thread.start()
+        time.sleep(0.05)
+        interactive_thread = threading.Thread(target=worker, args=(INTERACTIVE, 'interactive'))
+        interactive_thread.start()
+        time.sleep(0.05)
+
+        limiter.release(200)
+        bulk_thread.join(2)
+        interactive_thread.join(2)
+        assert order == ['interactive', 'bulk']
+
+    @allure.title("批量任务最多占用部分并发")
+    def test_bulk_share(self):
+        limiter = AdaptiveLimiter(rate=0, initial_concurrency=4, max_concurrency=4, bulk_share=0.5)
+        with rate_limit.bulk():
+            assert rate_limit.current_priority() == BULK
+            for _ in range(2):
+                limiter.acquire(rate_limit.current_priority())
+            with pytest.raises(RateLimitTimeout):
+                limiter.acquire(rate_limit.current_priority(), timeout=0.05)
+        assert rate_limit.current_priority() == INTERACTIVE
+        limiter.acquire(INTERACTIVE, timeout=0.05)
+
+    @allure.title("解析 Retry-After")
+    def test_parse_retry_after(self):
+        assert parse_retry_after('3') == 3.0
+        assert parse_retry_after('9999') == rate_limit.MAX_RETRY_AFTER
+        assert parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT', now=1445412470.0) == 10.0
+        assert parse_retry_after('soon') is None
+        assert parse_retry_after(None) is None
@@ -1,12 +1,19 @@
 # tests/unit/test_services.py - 修复版
 
+import asyncio
 import pytest
 import json
 import allure
 from unittest.mock import patch, MagicMock, Mock
 
 # 要测试的函数
-from services import get_translation, generate_story, generate_sentence_challenge
+from services import (
+    get_translation, get_translations, generate_story, generate_sentence_challenge,
+    generate_sentence_challenges,
+    aget_translation, agenerate_story, agenerate_sentence_challenge,
+    stream_story, StoryStreamError, bold_story_words,
+    fetch_translations, TranslationUnavailable
+)
 from config import Config
 
 pytestmark = pytest.mark.unit
@@ -59,7 +66,7 @@ class TestTranslation:
     @allure.story("正常翻译流程")
     @allure.title("成功获取单词翻译")
     @allure.severity(BLOCKER)
-    @patch("services.requests.post")
+    @patch("llm_client.session.post")
     def test_get_translation_success(self, mock_post):
         """TC-TR-001: 正常翻译流程"""
         test_word = "apple"
@@ -73,7 +80,7 @@ class TestTranslation:
             assert result == expected_translation
         
         with allure.step("验证AI被正确调用"):
-            # 验证requests.post被调用了一次
+            # 验证共享连接池的 session.post 被调用了一次
             mock_post.assert_called_once()
             call_args = mock_post.call_args[1]  # 获取kwargs
             messages = call_args['json']['messages']
@@ -92,7 +99,7 @@ class TestTranslation:
     @allure.story("异常处理")
     @allure.title("AI服务调用异常处理")
     @allure.severity(CRITICAL)
-    @patch("services.requests.post")  
+    @patch("llm_client.session.post")  
     def test_get_translation_api_exception(self, mock_post):
         """TC-TR-003: AI服务异常"""
         mock_post.side_effect = Exception("翻译服务暂时不可用")
@@ -104,7 +111,7 @@ class TestTranslation:
     @allure.story("异常处理")
     @allure.title("AI返回空内容处理")
     @allure.severity(NORMAL)
-    @patch("services.requests.post")  # 🔥 修改这里
+    @patch("llm_client.session.post")  # 🔥 修改这里
     def test_get_translation_empty_response(self, mock_post):
         """TC-TR-004: AI返回空内容"""
         mock_post.return_value = create_mock_response("")
@@ -116,7 +123,7 @@ class TestTranslation:
     @allure.story("边界测试")
     @allure.title("超长单词翻译")
     @allure.severity(NORMAL)
-    @patch("services.requests.post")  # 🔥 修改这里
+    @patch("llm_client.session.post")  # 🔥 修改这里
     def test_get_translation_long_word(self, mock_post):
         """TC-TR-005: 超长单词边界测试"""
         long_word = "pneumonoultramicroscopicsilicovolcanoconiosis"
@@ -144,7 +151,7 @@ class TestTranslation:
         ("test@example", "测试@示例"),
         ("a&b", "A和B"),
     ])
-    @patch("services.requests.post")
+    @patch("llm_client.session.post")
     def test_get_translation_special_characters(self, mock_post, word, expected):
         """TC-TR-006: 特殊字符处理"""
         mock_post.return_value = create_mock_response(expected)
@@ -170,7 +177,7 @@ class TestSentenceChallenge:
     @allure.story("正常流程")
     @allure.title("成功生成句子挑战")
     @allure.severity(BLOCKER)
-    @patch("services.requests.post")  # 🔥 修改这里
+    @patch("llm_client.session.post")  # 🔥 修改这里
     def test_generate_sentence_challenge_success(self, mock_post):
         """TC-SC-001: 正常生成句子挑战"""
         mock_json_response = '{"chinese": "今天天气真好", "answer": "The weather is really nice today"}'
@@ -192,7 +199,7 @@ class TestSentenceChallenge:
     @allure.story("异常处理")
     @allure.title("非法JSON格式处理")
     @allure.severity(CRITICAL)
-    @patch("services.requests.post")  # 🔥 修改这里
+    @patch("llm_client.session.post")  # 🔥 修改这里
     def test_generate_sentence_challenge_invalid_json(self, mock_post):
         """TC-SC-002: 返回非法JSON"""
         mock_post.return_value = create_mock_response('这是一个非法的JSON字符串')
@@ -208,7 +215,7 @@ class TestSentenceChallenge:
     @allure.story("数据处理")
     @allure.title("Markdown代码块处理")
     @allure.severity(allure.severity_level.NORMAL)
-    @patch("services.requests.post")
+    @patch("llm_client.session.post")
     def test_generate_sentence_challenge_markdown_json(self, mock_post):
         """TC-SC-003: 返回带markdown的JSON"""
         mock_content = '```json\n{"chinese": "测试", "answer": "test"}\n```'
@@ -228,7 +235,7 @@ class TestSentenceChallenge:
     @allure.story("异常处理")
     @allure.title("空内容处理")
     @allure.severity(NORMAL)
-    @patch("services.requests.post")  
+    @patch("llm_client.session.post")  
     def test_generate_sentence_challenge_empty_response(self, mock_post):
        
         """TC-SC-004: 返回空内容"""
@@ -247,7 +254,7 @@ class TestSentenceChallenge:
     @allure.story("业务逻辑")
     @allure.title("排除重复句子功能")
     @allure.severity(NORMAL)
-    @patch('services.requests.post')  # 🔥 修改这里
+    @patch('llm_client.session.post')  # 🔥 修改这里
     def test_generate_sentence_challenge_exclude_logic(self, mock_post):
         """TC-SC-005: 验证排除重复句子逻辑"""
         exclude_list = ["不要生成这个", "这个也不要", "还有这个"]
@@ -268,6 +275,21 @@ class TestSentenceChallenge:
             user_message = call_args['json']['messages'][1]['content']
             assert expected_prompt_contains in user_message
 
+    @allure.story("正常流程")
+    @allure.title("一次请求生成多个句子")
+    @allure.severity(NORMAL)
+    @patch("llm_client.session.post")
+    def test_generate_sentence_challenges_batch(self, mock_post):
+        """TC-SC-006: 批量生成句子，过滤缺字段的条目"""
+        mock_post.return_value = create_mock_response(
+            '```json\n[{"chinese": "一", "answer": "One"}, {"chinese": "二"}, {"chinese": "三", "answer": "Three"}]\n```'
+        )
+
+        result = generate_sentence_challenges(3)
+
+        assert result == [{"chinese": "一", "answer": "One"}, {"chinese": "三", "answer": "Three"}]
+        assert mock_post.call_count == 1
+
 # ==================== 故事生成功能测试 ====================
 @allure.epic("AI服务单元测试")
 @allure.feature(STORY_FEATURE)
@@ -276,7 +298,7 @@ class TestStoryGeneration:
     @allure.story("正常流程")
     @allure.title("成功生成故事")
     @allure.severity(BLOCKER)
-    @patch("services.requests.post")  # 🔥 修改这里
+    @patch("llm_client.session.post")  # 🔥 修改这里
     def test_generate_story_success(self, mock_post):
         """TC-SG-001: 正常生成故事"""
         words_list = ["apple", "banana", "cat"]
@@ -311,7 +333,7 @@ class TestStoryGeneration:
     @allure.story("异常处理")
     @allure.title("AI服务异常处理")
     @allure.severity(CRITICAL)
-    @patch("services.requests.post")  # 🔥 修改这里
+    @patch("llm_client.session.post")  # 🔥 修改这里
     def test_generate_story_api_exception(self, mock_post):
         """TC-SG-003: AI服务异常"""
         mock_post.side_effect = Exception("生成故事出错")
@@ -326,7 +348,7 @@ class TestStoryGeneration:
     @allure.story("输入验证")
     @allure.title("特殊字符处理")
     @allure.severity(NORMAL)
-    @patch('services.requests.post')  # 🔥 修改这里
+    @patch('llm_client.session.post')  # 🔥 修改这里
     def test_generate_story_special_characters(self, mock_post):
         """TC-SG-004: 单词列表包含特殊字符"""
         words_with_special = ["test-word", "don't", "a&b"]
@@ -343,4 +365,213 @@ class TestStoryGeneration:
             call_args = mock_post.call_args[1]
             user_content = call_args['json']['messages'][1]['content']
             for word in words_with_special:
-                assert word in user_content
\ No newline at end of file
+                assert word in user_content
+    @allure.story("正常流程")
+    @allure.title("流式生成故事")
+    @allure.severity(CRITICAL)
+    @patch("llm_client.session.post")
+    def test_stream_story_yields_deltas(self, mock_post):
+        """TC-SG-005: stream: true 时逐段返回内容"""
+        chunks = ["Once ", "an <b>apple</b>", "."]
+        lines = [f"data: {json.dumps({'choices': [{'delta': {'content': c}}]})}" for c in chunks]
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.iter_lines.return_value = [": keep-alive", ""] + lines + ["data: [DONE]", "data: ignored"]
+        mock_post.return_value = mock_response
+
+        result = list(stream_story(["apple"]))
+
+        assert result == chunks
+        assert mock_post.call_args[1]['json']['stream'] is True
+        assert mock_post.call_args[1]['stream'] is True
+        mock_response.close.assert_called_once()
+
+    @allure.story("异常处理")
+    @allure.title("流式生成故事：接口返回错误状态")
+    @allure.severity(NORMAL)
+    @patch("llm_client.session.post")
+    def test_stream_story_http_error(self, mock_post):
+        """TC-SG-006: 非 200 状态返回错误提示"""
+        mock_post.return_value = MagicMock(status_code=503)
+        with pytest.raises(StoryStreamError, match="生成故事出错: 503"):
+            list(stream_story(["apple"]))
+
+    @allure.story("异常处理")
+    @allure.title("流式生成故事：中途断开")
+    @allure.severity(NORMAL)
+    @patch("llm_client.session.post")
+    def test_stream_story_broken_midway(self, mock_post):
+        """TC-SG-006b: 已输出一部分后连接中断，抛出异常而不是把错误提示拼进故事"""
+        def lines():
+            yield f"data: {json.dumps({'choices': [{'delta': {'content': 'Once '}}]})}"
+            raise ConnectionError("connection reset")
+        mock_response = MagicMock(status_code=200)
+        mock_response.iter_lines.return_value = lines()
+        mock_post.return_value = mock_response
+
+        chunks = []
+        with pytest.raises(StoryStreamError, match="connection reset"):
+            for chunk in stream_story(["apple"]):
+                chunks.append(chunk)
+        assert chunks == ["Once "]
+        mock_response.close.assert_called_once()
+
+    @allure.story("正常流程")
+    @allure.title("补上漏掉的加粗")
+    @allure.severity(NORMAL)
+    def test_bold_story_words(self):
+        """TC-SG-007: 只给没加粗的单词补 <b> 标签"""
+        story = "An <b>apple</b> and a Banana met a cat-like dog. Apple pie."
+        result = bold_story_words(story, ["apple", "banana", "cat"])
+        assert result == "An <b>apple</b> and a <b>Banana</b> met a <b>cat</b>-like dog. Apple pie."
+
+# ==================== 批量翻译功能测试 ====================
+@allure.epic("AI服务单元测试")
+@allure.feature(TRANSLATION_FEATURE)
+class TestBatchTranslation:
+
+    @allure.story("正常翻译流程")
+    @allure.title("一次请求翻译多个单词")
+    @allure.severity(BLOCKER)
+    @patch("llm_client.session.post")
+    def test_get_translations_success(self, mock_post):
+        mock_post.return_value = create_mock_response(
+            '```json\n{"apple": "苹果", "Banana": "香蕉", "extra": "多余"}\n```'
+        )
+
+        result = get_translations(["apple", "banana"])
+
+        assert result == {"apple": "苹果", "banana": "香蕉"}
+        mock_post.assert_called_once()
+        user_content = mock_post.call_args[1]['json']['messages'][1]['content']
+        assert json.loads(user_content) == ["apple", "banana"]
+
+    @allure.story("异常处理")
+    @allure.title("接口异常返回空结果")
+    @allure.severity(CRITICAL)
+    @patch("llm_client.session.post")
+    def test_get_translations_http_error(self, mock_post):
+        mock_post.return_value = create_mock_response("", status_code=500)
+        assert get_translations(["apple"]) == {}
+
+    @allure.story("异常处理")
+    @allure.title("服务不可用时 fetch_translations 抛出异常并带上已得到的部分")
+    @allure.severity(CRITICAL)
+    @patch("llm_client.session.post")
+    def test_fetch_translations_unavailable(self, mock_post):
+        mock_post.side_effect = [
+            create_mock_response('{"a": "甲"}'),
+            create_mock_response("", status_code=503),
+        ]
+        with patch("services.MAX_TRANSLATION_BATCH", 1):
+            with pytest.raises(TranslationUnavailable) as excinfo:
+                fetch_translations(["a", "b"])
+        assert excinfo.value.partial == {"a": "甲"}
+
+        with patch("services.API_KEY", ""):
+            with pytest.raises(TranslationUnavailable):
+                fetch_translations(["a"])
+            assert get_translations(["a"]) == {}
+
+    @allure.story("异常处理")
+    @allure.title("截断的JSON被修复")
+    @allure.severity(NORMAL)
+    @patch("llm_client.session.post")
+    def test_get_translations_repairs_truncated_json(self, mock_post):
+        # 第一次响应被截断，cat 缺失；第二次只请求 cat
+        mock_post.side_effect = [
+            create_mock_response('{"apple": "苹果", "banana": "香蕉", "cat": "猫'),
+            create_mock_response('{"cat": "猫"}'),
+        ]
+
+        result = get_translations(["apple", "banana", "cat"])
+
+        assert result == {"apple": "苹果", "banana": "香蕉", "cat": "猫"}
+        assert mock_post.call_count == 2
+        retry_words = json.loads(mock_post.call_args[1]['json']['messages'][1]['content'])
+        assert retry_words == ["cat"]
+
+    @allure.story("异常处理")
+    @allure.title("格式错误时拆分批次重试")
+    @allure.severity(CRITICAL)
+    @patch("llm_client.session.post")
+    def test_get_translations_splits_on_malformed_reply(self, mock_post):
+        def reply(*args, **kwargs):
+            words = json.loads(kwargs['json']['messages'][1]['content'])
+            if len(words) > 1:
+                return create_mock_response("抱歉，我无法完成")
+            # 非中文的翻译不合法
+            if words[0] == "bad":
+                return create_mock_response('{"bad": "bad"}')
+            return create_mock_response(json.dumps({words[0]: f"{words[0]}的意思"}, ensure_ascii=False))
+
+        mock_post.side_effect = reply
+
+        result = get_translations(["a", "b", "c", "bad"])
+
+        assert result == {"a": "a的意思", "b": "b的意思", "c": "c的意思"}
+        # 4 个 -> 2 + 2 -> 1+1+1+1
+        assert mock_post.call_count == 7
+
+    @allure.story("异常处理")
+    @allure.title("请求失败时不拆分重试")
+    @allure.severity(CRITICAL)
+    @patch("llm_client.session.post")
+    def test_get_translations_no_split_on_transport_error(self, mock_post):
+        mock_post.side_effect = Exception("connection reset")
+        assert get_translations(["a", "b", "c", "d"]) == {}
+        assert mock_post.call_count == 1
+
+    @allure.story("边界测试")
+    @allure.title("超过批次上限时分块请求")
+    @allure.severity(NORMAL)
+    @patch("services.MAX_TRANSLATION_BATCH", 2)
+    @patch("llm_client.session.post")
+    def test_get_translations_chunks_large_input(self, mock_post):
+        def reply(*args, **kwargs):
+            words = json.loads(kwargs['json']['messages'][1]['content'])
+            return create_mock_response(json.dumps({w: "词" for w in words}, ensure_ascii=False))
+
+        mock_post.side_effect = reply
+
+        result = get_translations(["a", "b", "c", "a"])
+
+        assert result == {"a": "词", "b": "词", "c": "词"}
+        assert mock_post.call_count == 2
+
+# ==================== 异步接口测试 ====================
+@allure.epic("AI服务单元测试")
+@allure.feature(STORY_FEATURE)
+class TestAsyncServices:
+
+    @allure.story("正常流程")
+    @allure.title("异步生成故事")
+    @allure.severity(CRITICAL)
+    @patch("llm_client.apost")
+    def test_agenerate_story_success(self, mock_apost):
+        mock_apost.return_value = create_mock_response("A <b>cat</b> story.")
+
+        result = asyncio.run(agenerate_story(["cat"]))
+
+        assert result == "A <b>cat</b> story."
+        user_content = mock_apost.call_args[1]['json']['messages'][1]['content']
+        assert "cat" in user_content
+
+    @allure.story("异常处理")
+    @allure.title("异步生成句子异常处理")
+    @allure.severity(CRITICAL)
+    @patch("llm_client.apost")
+    def test_agenerate_sentence_challenge_exception(self, mock_apost):
+        mock_apost.side_effect = Exception("timeout")
+
+        result = asyncio.run(agenerate_sentence_challenge())
+
+        assert result == {"chinese": "生成失败，请重试", "answer": "Error"}
+
+    @allure.story("正常流程")
+    @allure.title("异步翻译")
+    @allure.severity(NORMAL)
+    @patch("llm_client.apost")
+    def test_aget_translation_success(self, mock_apost):
+        mock_apost.return_value = create_mock_response("苹果")
+        assert asyncio.run(aget_translation("apple")) == "苹果"
@@ -0,0 +1,153 @@
+# tests/unit/test_singleflight.py
+
+import asyncio
+import threading
+import time
+import pytest
+import allure
+from unittest.mock import patch, MagicMock
+
+import services
+from singleflight import SingleFlight, SQLiteFlightBackend, create_singleflight
+
+pytestmark = pytest.mark.unit
+
+
+def _run_threads(n, target):
+    results = [None] * n
+    threads = [threading.Thread(target=lambda i=i: results.__setitem__(i, target())) for i in range(n)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    return results
+
+
+def _slow(value, calls, delay=0.2):
+    def fn():
+        calls.append(1)
+        time.sleep(delay)
+        return value
+    return fn
+
+
+@allure.epic("工具函数单元测试")
+@allure.feature("请求合并")
+class TestSingleFlight:
+
+    @allure.title("并发的相同调用只执行一次，共享结果")
+    def test_threads_share_one_call(self):
+        flight = SingleFlight()
+        calls = []
+        results = _run_threads(8, lambda: flight.do('k', _slow('结果', calls)))
+
+        assert results == ['结果'] * 8
+        assert len(calls) == 1
+        stats = flight.stats()
+        assert stats['leaders'] == 1 and stats['shared'] == 7 and stats['in_flight'] == 0
+
+        # 调用结束后键即释放，不做缓存
+        assert flight.do('k', lambda: '新结果') == '新结果'
+
+    @allure.title("领头调用的异常传给所有等待者")
+    def test_error_shared(self):
+        flight = SingleFlight()
+
+        def fail():
+            time.sleep(0.1)
+            raise RuntimeError('boom')
+
+        def call():
+            try:
+                return flight.do('k', fail)
+            except RuntimeError as e:
+                return str(e)
+
+        assert _run_threads(4, call) == ['boom'] * 4
+        assert flight.stats()['in_flight'] == 0
+
+    @allure.title("不同事件循环里的协程也能合并")
+    def test_async_across_loops(self):
+        flight = SingleFlight()
+        calls = []
+
+        async def story():
+            calls.append(1)
+            await asyncio.sleep(0.2)
+            return 'story'
+
+        results = _run_threads(4, lambda: asyncio.run(flight.ado('k', story)))
+        assert results == ['story'] * 4
+        assert len(calls) == 1
+
+    @allure.title("SQLite 后端：不同进程（实例）共享同一个调用")
+    def test_sqlite_backend_across_instances(self, tmp_path):
+        path = str(tmp_path / 'flights.sqlite3')
+        first = SingleFlight(SQLiteFlightBackend(path, poll_interval=0.01))
+        second = SingleFlight(SQLiteFlightBackend(path, poll_interval=0.01))
+        calls = []
+
+        leader = threading.Thread(target=lambda: first.do('k', _slow('结果', calls)))
+        leader.start()
+        time.sleep(0.05)
+        assert second.do('k', _slow('不该执行', calls)) == '结果'
+        leader.join(5)
+        assert len(calls) == 1
+
+    @allure.title("SQLite 后端：等待者读到结果后删除，之后的调用重新执行")
+    def test_sqlite_backend_not_cached(self, tmp_path):
+        path = str(tmp_path / 'flights.sqlite3')
+        first = SingleFlight(SQLiteFlightBackend(path, poll_interval=0.01))
+        second = SingleFlight(SQLiteFlightBackend(path, poll_interval=0.01))
+        calls = []
+
+        leader = threading.Thread(target=lambda: first.do('k', _slow('结果', calls)))
+        leader.start()
+        time.sleep(0.05)
+        assert second.do('k', _slow('不该执行', calls)) == '结果'
+        leader.join(5)
+        assert first.backend._conn.execute('SELECT COUNT(*) FROM flights').fetchone()[0] == 0
+
+        # 没有等待者时领头者直接删除，结果不会被下一次调用拿到
+        assert first.do('k', lambda: '第二次') == '第二次'
+        assert second.do('k', lambda: '第三次') == '第三次'
+        assert first.backend._conn.execute('SELECT COUNT(*) FROM flights').fetchone()[0] == 0
+
+    @allure.title("SQLite 后端：领头者失败后等待者自己执行")
+    def test_sqlite_backend_leader_failure(self, tmp_path):
+        path = str(tmp_path / 'flights.sqlite3')
+        first = SingleFlight(SQLiteFlightBackend(path, poll_interval=0.01))
+        second = SingleFlight(SQLiteFlightBackend(path, poll_interval=0.01))
+
+        def fail():
+            time.sleep(0.1)
+            raise RuntimeError('boom')
+
+        leader = threading.Thread(target=lambda: pytest.raises(RuntimeError, first.do, 'k', fail))
+        leader.start()
+        time.sleep(0.03)
+        assert second.do('k', lambda: '自己算') == '自己算'
+        leader.join(5)
+
+    @allure.title("未知后端报错")
+    def test_unknown_backend(self):
+        with pytest.raises(ValueError):
+            create_singleflight('redis')
+
+    @allure.title("同一个单词（忽略大小写）的并发翻译只请求一次模型")
+    def test_get_translation_coalesced(self):
+        response = MagicMock()
+        response.status_code = 200
+        response.json.return_value = {"choices": [{"message": {"content": "环境"}}]}
+
+        def slow_post(*args, **kwargs):
+            time.sleep(0.2)
+            return response
+
+        with patch('llm_client.session.post', side_effect=slow_post) as mock_post, \
+                patch('services.API_KEY', 'x'):
+            words = ['environment', 'Environment ', 'environment', 'ENVIRONMENT']
+            results = _run_threads(4, lambda: services.get_translation(words.pop()))
+
+        assert results == ['环境'] * 4
+        assert mock_post.call_count == 1
@@ -0,0 +1,146 @@
+# translation_cache.py
+"""
+翻译查找：模型翻译保存在全局词典 lexemes 表里，按归一化单词查找，
+只有由当前配置的某个模型（services.TRANSLATION_MODELS）、用当前提示词版本生成的翻译才算命中，
+命中时不发任何网络请求。
+"""
+import threading
+from datetime import datetime
+from sqlalchemy import bindparam, select, update
+from models import db, Lexeme, insert_ignore, collation_key
+from services import MODEL_NAME, TRANSLATION_MODELS, TRANSLATION_PROMPT_VERSION, normalize_word
+
+_lock = threading.Lock()
+_counters = {'hits': 0, 'misses': 0, 'stores': 0}
+
+
+# 与合并模型请求用的是同一种归一化
+normalize = normalize_word
+
+
+def _count(name, n):
+    if n:
+        with _lock:
+            _counters[name] += n
+
+
+def _group_keys(words):
+    keys = {}
+    for word in words:
+        key = normalize(word)
+        if key:
+            keys.setdefault(key, []).append(word)
+    return keys
+
+
+def _select_lexemes(keys):
+    return db.session.execute(
+        select(Lexeme.id, Lexeme.headword, Lexeme.translation, Lexeme.model, Lexeme.prompt_version)
+        .where(Lexeme.headword.in_(keys))
+    ).all()
+
+
+def _current(row):
+    """词条上的翻译是否由当前配置的模型和当前提示词生成"""
+    return row.translation is not None and row.model in TRANSLATION_MODELS \
+        and row.prompt_version == TRANSLATION_PROMPT_VERSION
+
+
+def resolve(words):
+    """
+    批量取词条，没有的先建出来；返回 {原单词: (lexeme_id, 翻译或 None)}。
+    并发创建同一个词条时忽略冲突。调用方负责 commit
+    """
+    keys = _group_keys(words)
+    if not keys:
+        return {}
+
+    # 数据库按排序规则比较：MySQL 下 "café" 和 "cafe" 是同一行，返回的 headword 未必是请求的那个字符串
+    rows = {collation_key(row.headword): row for row in _select_lexemes(list(keys))}
+    missing = list({collation_key(key): key for key in reversed(list(keys))
+                    if collation_key(key) not in rows}.values())
+    if missing:
+        db.session.execute(insert_ignore(Lexeme), [{'headword': key} for key in missing])
+        rows.update((collation_key(row.headword), row) for row in _select_lexemes(missing))
+
+    result = {}
+    for key, originals in keys.items():
+        row = rows.get(collation_key(key))
+        if row is None:
+            # 理论上不会发生；宁可当作未翻译也不让整批翻译失败
+            print(f"词条创建后仍查不到: {key}")
+            continue
+        translation = row.translation if _current(row) else None
+        for word in originals:
+            result[word] = (row.id, translation)
+    hits = sum(1 for _, translation in result.values() if translation is not None)
+    _count('hits', hits)
+    _count('misses', len(words) - hits)
+    return result
+
+
+def lookup_many(words):
+    """批量查翻译，返回 {原单词: 翻译}，只包含命中的单词；不创建词条"""
+    keys = _group_keys(words)
+    if not keys:
+        return {}
+
+    by_collation = {}
+    for key, originals in keys.items():
+        by_collation.setdefault(collation_key(key), []).extend(originals)
+
+    result = {}
+    for row in _select_lexemes(list(keys)):
+        if _current(row):
+            for word in by_collation.get(collation_key(row.headword), ()):
+                result[word] = row.translation
+    _count('hits', len(result))
+    _count('misses', len(words) - len(result))
+    return result
+
+
+def lookup(word):
+    """查单个单词，未命中返回 None"""
+    return lookup_many([word]).get(word)
+
+
+def store_many(translations):
+    """
+    把 {单词: 翻译} 写到词条上，词条不存在时先创建；记录实际生成翻译的模型：
+    取 translations.models（services.Translations）或翻译文本的 model（services.Translation），都没有时按 MODEL_NAME。
+    同一个词条已有旧模型或旧提示词的翻译时直接覆盖。调用方负责 commit
+    """
+    models = getattr(translations, 'models', {})
+    rows = {}
+    for word, translation in translations.items():
+        key = normalize(word)
+        if key and translation:
+            rows[key] = (translation, models.get(word) or getattr(translation, 'model', MODEL_NAME))
+    if not rows:
+        return
+
+    db.session.execute(insert_ignore(Lexeme), [{'headword': key} for key in rows])
+    now = datetime.utcnow()
+    db.session.execute(
+        update(Lexeme.__table__)
+        .where(Lexeme.headword == bindparam('b_headword'))
+        .values(translation=bindparam('b_translation'), model=bindparam('b_model'),
+                prompt_version=TRANSLATION_PROMPT_VERSION, translated_at=now),
+        [{'b_headword': key, 'b_translation': translation, 'b_model': model}
+         for key, (translation, model) in rows.items()]
+    )
+    _count('stores', len(rows))
+
+
+def stats():
+    with _lock:
+        counters = dict(_counters)
+    total = counters['hits'] + counters['misses']
+    counters['hit_rate'] = round(counters['hits'] / total, 3) if total else 0.0
+    return counters
+
+
+def reset_stats():
+    with _lock:
+        for name in _counters:
+            _counters[name] = 0
@@ -0,0 +1,229 @@
+# translator.py
+"""服务端批量翻译队列：取代浏览器里逐个单词调用 /api/translate_word 的循环"""
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from sqlalchemy import bindparam, func, or_, select, update
+from background import BackgroundWorker
+from models import db, Word
+from services import fetch_translations, TranslationUnavailable
+from versioning import record_changes
+import translation_cache
+import offline_dict
+
+# 吞吐量按最近 60 秒的滑动窗口统计
+THROUGHPUT_WINDOW = 60.0
+# 同一个单词最多自动翻译几次；之后只能通过 /api/translate_word 手动翻译
+MAX_TRANSLATE_ATTEMPTS = 8
+# 失败后的重试间隔：RETRY_BASE * 2^(已失败次数 - 1)，最长 RETRY_MAX
+RETRY_BASE = 60.0
+RETRY_MAX = 6 * 3600.0
+# 翻译服务整体不可用（没有密钥、网络错误、限流、熔断）时整个队列暂停，
+# 暂停时长从 interval 开始按连续失败次数翻倍，最长 OUTAGE_PAUSE_MAX 秒；不计入单词的失败次数
+OUTAGE_PAUSE_MAX = 300.0
+
+
+def retry_delay(attempts):
+    """第 attempts 次失败后等待的秒数"""
+    return min(RETRY_BASE * 2 ** (attempts - 1), RETRY_MAX)
+
+
+def _retry_due(now):
+    """自动翻译的条件：没有超过重试上限，且已过退避时间"""
+    return (Word.translate_attempts < MAX_TRANSLATE_ATTEMPTS,
+            or_(Word.next_attempt_at.is_(None), Word.next_attempt_at <= now))
+
+
+def queue_batch_query(cursor, limit, now):
+    """队列取下一批：id 在 cursor 之后、到了重试时间的待翻译单词"""
+    return (
+        select(Word.id, Word.english, Word.deck_id)
+        .where(Word.pending == True, Word.id > cursor, *_retry_due(now))
+        .order_by(Word.id)
+        .limit(limit)
+    )
+
+
+def queue_depth_query():
+    """还会自动翻译的单词数（包括正在退避等待的）"""
+    return select(func.count()).select_from(Word).where(
+        Word.pending == True, Word.translate_attempts < MAX_TRANSLATE_ATTEMPTS
+    )
+
+
+class TranslationWorker(BackgroundWorker):
+    """
+    按 id 顺序扫描待翻译单词，每批打包成一次模型请求，结果批量写回。
+    模型答复了但漏掉或返回不合法的单词保持“待翻译...”，按指数退避重试，
+    失败 MAX_TRANSLATE_ATTEMPTS 次后不再自动重试（计入 stats 的 failed，可以用 reset_failed 重置）。
+    翻译服务整体不可用时整个队列暂停，单词的失败次数不变。
+    """
+    name = 'translation-worker'
+
+    def __init__(self, app, batch_size=50, interval=5.0):
+        super().__init__(interval)
+        self.app = app
+        self.batch_size = batch_size
+        self._cursor = 0  # 上一批最后一个单词的 id
+        self._lock = threading.Lock()
+        self._recent = deque()  # (完成时间, 翻译数)
+        self.translated_total = 0
+        self.failed_total = 0
+        self.batches = 0
+        self.last_batch_at = None
+        self.outages = 0  # 连续的整体不可用次数
+        self._paused_until = 0.0
+
+    def _next_batch(self):
+        rows = db.session.execute(
+            queue_batch_query(self._cursor, self.batch_size, datetime.utcnow())
+        ).all()
+        if not rows and self._cursor:
+            # 扫到末尾，从头再扫一遍之前失败的单词
+            self._cursor = 0
+            return self._next_batch()
+        return rows
+
+    def run_once(self):
+        """处理一批，返回是否应立即继续下一批"""
+        if time.monotonic() < self._paused_until:
+            return False
+        unavailable = None
+        with self.app.app_context():
+            rows = self._next_batch()
+            if not rows:
+                return False
+            self._cursor = rows[-1].id
+
+            # 队列跨词库；不同词库里的同一个单词只翻译一次
+            words = list(dict.fromkeys(row.english for row in rows))
+            # 先查全局词典（没有词条的顺便建出来），只把还没翻译的单词发给模型
+            lexemes = translation_cache.resolve(words)
+            translations = {w: translation for w, (_, translation) in lexemes.items() if translation is not None}
+            misses = [w for w in words if w not in translations]
+            # 再查离线词典，常用单词不需要调用模型；离线释义不写入词典表，下次仍直接查文件
+            translations.update(offline_dict.lookup_many(misses))
+            misses = [w for w in misses if w not in translations]
+            if misses:
+                try:
+                    fresh = fetch_translations(misses)
+                except TranslationUnavailable as e:
+                    # 服务不可用不是单词的问题：已经拿到的照常写回，其余单词的失败次数不变
+                    unavailable = e
+                    fresh = e.partial
+                translation_cache.store_many(fresh)
+                translations.update(fresh)
+
+            updates = [
+                {'b_id': row.id, 'b_chinese': translations[row.english],
+                 'b_lexeme_id': lexemes[row.english][0] if row.english in lexemes else None,
+                 'deck_id': row.deck_id}
+                for row in rows if row.english in translations
+            ]
+            if updates:
+                # 只覆盖仍处于待翻译状态的行，避免和 /api/translate_word 或其它进程重复写
+                db.session.execute(
+                    update(Word.__table__)
+                    .where(Word.id == bindparam('b_id'), Word.pending == True)
+                    .values(chinese=bindparam('b_chinese'), lexeme_id=bindparam('b_lexeme_id'), pending=False),
+                    updates
+                )
+                by_deck = {}
+                for u in updates:
+                    by_deck.setdefault(u['deck_id'], []).append(u['b_id'])
+                for deck_id, word_ids in by_deck.items():
+                    record_changes('update', word_ids, deck_id)
+            failed = [row.id for row in rows if row.english not in translations]
+            if failed and unavailable is None:
+                self._schedule_retry(failed)
+            db.session.commit()
+
+        self._record_batch(len(updates), len(rows) - len(updates))
+        if unavailable is not None:
+            self._pause(rows[0].id, unavailable)
+            return False
+        self.outages = 0
+        # 整批都失败时等一个周期再试
+        return bool(updates)
+
+    def _pause(self, first_id, error):
+        """整体不可用：从这一批重新开始，暂停的时长随连续失败次数翻倍"""
+        self._cursor = first_id - 1
+        self.outages += 1
+        pause = min(self.interval * 2 ** (self.outages - 1), OUTAGE_PAUSE_MAX)
+        self._paused_until = time.monotonic() + pause
+        self.last_error = f"翻译服务不可用: {error}"
+        print(f"{self.last_error}，队列暂停 {pause:.0f} 秒")
+
+    def _schedule_retry(self, word_ids):
+        """失败次数加一，下次重试时间按失败次数指数退避；只是内部状态，不记入变更日志"""
+        now = datetime.utcnow()
+        attempts = dict(db.session.execute(
+            select(Word.id, Word.translate_attempts).where(Word.id.in_(word_ids))
+        ).all())
+        db.session.execute(
+            update(Word.__table__)
+            .where(Word.id == bindparam('b_id'), Word.pending == True)
+            .values(translate_attempts=bindparam('b_attempts'), next_attempt_at=bindparam('b_next'),
+                    translate_error=bindparam('b_error')),
+            [
+                {'b_id': word_id, 'b_attempts': attempts[word_id] + 1,
+                 'b_next': now + timedelta(seconds=retry_delay(attempts[word_id] + 1)),
+                 'b_error': '模型没有返回有效的翻译'}
+                for word_id in word_ids if word_id in attempts
+            ]
+        )
+
+    def reset_failed(self, deck_id=None):
+        """把待翻译单词的失败次数清零，让队列立即重新翻译；返回重置的单词数。需要调用方提交事务"""
+        query = update(Word.__table__).where(Word.pending == True, Word.translate_attempts > 0)
+        if deck_id is not None:
+            query = query.where(Word.deck_id == deck_id)
+        result = db.session.execute(query.values(translate_attempts=0, next_attempt_at=None, translate_error=None))
+        self._cursor = 0
+        self._paused_until = 0.0
+        return result.rowcount
+
+    def _record_batch(self, translated, failed):
+        now = time.time()
+        with self._lock:
+            self.batches += 1
+            self.translated_total += translated
+            self.failed_total += failed
+            self.last_batch_at = now
+            self._recent.append((now, translated))
+            while self._recent and self._recent[0][0] < now - THROUGHPUT_WINDOW:
+                self._recent.popleft()
+
+    def queue_depth(self):
+        with self.app.app_context():
+            return db.session.execute(queue_depth_query()).scalar()
+
+    def failed_count(self):
+        """失败次数达到上限、不再自动重试的单词数"""
+        with self.app.app_context():
+            return db.session.execute(
+                select(func.count()).select_from(Word)
+                .where(Word.pending == True, Word.translate_attempts >= MAX_TRANSLATE_ATTEMPTS)
+            ).scalar()
+
+    def stats(self):
+        queue_depth = self.queue_depth()
+        failed = self.failed_count()
+        now = time.time()
+        with self._lock:
+            recent = sum(count for at, count in self._recent if at >= now - THROUGHPUT_WINDOW)
+            return {
+                'running': self.running,
+                'queue_depth': queue_depth,
+                'failed': failed,
+                'batch_size': self.batch_size,
+                'batches': self.batches,
+                'translated_total': self.translated_total,
+                'failed_total': self.failed_total,
+                'words_per_minute': round(recent * 60.0 / THROUGHPUT_WINDOW, 1),
+                'last_batch_at': self.last_batch_at,
+                'paused_for': round(max(self._paused_until - time.monotonic(), 0.0), 1),
+                'last_error': self.last_error
+            }
@@ -0,0 +1,85 @@
+# versioning.py
+"""
+词库版本号：只有一行的计数器，和单词的修改放在同一个事务里递增。
+读取只是一次主键查询，/api/words 据此判断列表是否变化，不必扫描单词表。
+
+每次递增同时在 word_changes 里记下改动了哪些单词，/api/words/changes 据此返回增量。
+"""
+from sqlalchemy import delete, func, insert, select, update
+from models import db, VocabVersion, WordChange, insert_ignore, DEFAULT_DECK_ID
+
+VERSION_ROW_ID = 1
+# 变更日志只保留最近这么多个版本，更早的客户端需要全量重新拉取
+CHANGE_LOG_RETENTION = 10000
+
+
+def current_version():
+    version = db.session.execute(
+        select(VocabVersion.version).where(VocabVersion.id == VERSION_ROW_ID)
+    ).scalar()
+    return version or 0
+
+
+def bump_version():
+    """版本号加一并返回新值；需要调用方提交事务"""
+    # 原地自增，并发事务在这一行上排队，不会丢失更新
+    bump = update(VocabVersion).where(VocabVersion.id == VERSION_ROW_ID).values(version=VocabVersion.version + 1)
+    if db.session.execute(bump).rowcount == 0:
+        db.session.execute(insert_ignore(VocabVersion), [{'id': VERSION_ROW_ID, 'version': 0}])
+        db.session.execute(bump)
+    return current_version()
+
+
+def record_changes(op, word_ids, deck_id=DEFAULT_DECK_ID):
+    """
+    版本号加一，并把本次改动的单词（同属 deck_id 词库）写入变更日志；返回新版本号。
+    op 为 insert / update / delete，需要调用方提交事务。
+    版本号是全局的，各词库共用一个计数器。
+    """
+    version = bump_version()
+    rows = [{'version': version, 'deck_id': deck_id, 'word_id': word_id, 'op': op} for word_id in word_ids]
+    if rows:
+        db.session.execute(insert(WordChange), rows)
+    # 偶尔清理一次过期的日志
+    if version % 100 == 0:
+        db.session.execute(delete(WordChange).where(WordChange.version <= version - CHANGE_LOG_RETENTION))
+    return version
+
+
+def changes_since(since, deck_id=None):
+    """
+    返回 since 之后 deck_id 词库（None 表示全部词库）的改动：
+    {'version', 'full_resync', 'upserted': {id: op}, 'deleted': [id]}。
+    同一个单词多次改动时按最后一次计算；先新增后修改的仍算新增。
+    since 早于日志保留范围时 full_resync 为 True，客户端应重新拉取全量列表。
+    """
+    version = current_version()
+    result = {'version': version, 'full_resync': False, 'upserted': {}, 'deleted': []}
+    if since == version:
+        return result
+
+    oldest = db.session.execute(select(func.min(WordChange.version))).scalar()
+    # since 比当前版本还新，说明数据库被重建过
+    if oldest is None or since < oldest - 1 or since > version:
+        result['full_resync'] = True
+        return result
+
+    query = select(WordChange.word_id, WordChange.op).where(
+        WordChange.version > since, WordChange.version <= version
+    )
+    if deck_id is not None:
+        query = query.where(WordChange.deck_id == deck_id)
+    rows = db.session.execute(query.order_by(WordChange.id)).all()
+    upserted = {}
+    deleted = set()
+    for row in rows:
+        if row.op == 'delete':
+            upserted.pop(row.word_id, None)
+            deleted.add(row.word_id)
+        else:
+            deleted.discard(row.word_id)
+            if upserted.get(row.word_id) != 'insert':
+                upserted[row.word_id] = row.op
+    result['upserted'] = upserted
+    result['deleted'] = sorted(deleted)
+    return result
@@ -0,0 +1,82 @@
+# word_query.py
+"""
+/api/words 的分页查询：按 id 做 keyset 分页，只查询需要的列，
+直接把结果行转成字典，不构造 ORM 对象。
+"""
+from sqlalchemy import select
+from models import db, Word, DEFAULT_DECK_ID
+
+# 可以通过 fields= 选择返回的列
+WORD_FIELDS = ('id', 'english', 'chinese', 'status')
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 1000
+
+
+def parse_fields(value):
+    """解析 fields=english,chinese；为空时返回全部列"""
+    if not value:
+        return list(WORD_FIELDS)
+    fields = []
+    for name in value.split(','):
+        name = name.strip()
+        if not name:
+            continue
+        if name not in WORD_FIELDS:
+            raise ValueError(f"未知的字段: {name}")
+        if name not in fields:
+            fields.append(name)
+    if not fields:
+        raise ValueError("fields 不能为空")
+    return fields
+
+
+def parse_statuses(value):
+    """解析 status=0 或 status=0,1"""
+    if not value:
+        return None
+    try:
+        return [int(s) for s in value.split(',') if s.strip()]
+    except ValueError:
+        raise ValueError(f"无效的 status: {value}")
+
+
+def list_words(after_id=0, limit=DEFAULT_PAGE_SIZE, fields=WORD_FIELDS, statuses=None, pending=None,
+               deck_id=DEFAULT_DECK_ID):
+    """
+    返回 deck_id 词库的 (单词列表, 下一页游标)。最后一页的游标为 None。
+    limit=None 不分页，返回 after_id 之后的全部单词（兼容不带分页参数的旧客户端）。
+    pending=True 只返回待翻译的单词，False 只返回已翻译的单词。
+    """
+    # id 始终要查出来，作为下一页的游标
+    columns = [Word.id] + [getattr(Word, name) for name in fields if name != 'id']
+    query = select(*columns).where(Word.deck_id == deck_id, Word.id > after_id)
+    if statuses:
+        query = query.where(Word.status.in_(statuses))
+    if pending is not None:
+        query = query.where(Word.pending == pending)
+
+    query = query.order_by(Word.id)
+    if limit is None:
+        rows = db.session.execute(query).all()
+        return [{name: getattr(row, name) for name in fields} for row in rows], None
+
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    # 多取一行判断是否还有下一页
+    rows = db.session.execute(query.limit(limit + 1)).all()
+    next_after_id = rows[limit - 1].id if len(rows) > limit else None
+    words = [{name: getattr(row, name) for name in fields} for row in rows[:limit]]
+    return words, next_after_id
+
+
+def words_by_ids(ids, fields=WORD_FIELDS, deck_id=None):
+    """按 id 批量取单词（同样只查需要的列），不存在或不属于 deck_id 词库的 id 直接跳过"""
+    columns = [Word.id] + [getattr(Word, name) for name in fields if name != 'id']
+    deck_filter = [Word.deck_id == deck_id] if deck_id is not None else []
+    words = []
+    ids = sorted(ids)
+    for start in range(0, len(ids), MAX_PAGE_SIZE):
+        rows = db.session.execute(
+            select(*columns).where(Word.id.in_(ids[start:start + MAX_PAGE_SIZE]), *deck_filter).order_by(Word.id)
+        ).all()
+        words.extend({name: getattr(row, name) for name in fields} for row in rows)
+    return words